@@ -2,6 +2,8 @@ import SwiftUI
 
 struct BloodRainView: View {
     @State private var particles: [BloodParticle] = []
+    /// Current music intensity; the rain falls faster when the song is loud. Nil keeps the normal speed.
+    var intensity: (() -> IntensitySample?)? = nil
     let timer = Timer.publish(every: 0.08, on: .main, in: .common).autoconnect()
     
     var body: some View {
@@ -41,8 +43,9 @@ struct BloodRainView: View {
     }
     
     private func updateParticles(in size: CGSize) {
+        let speedScale = intensity?().map { 0.6 + 0.8 * CGFloat($0.loudness) } ?? 1
         for index in particles.indices {
-            particles[index].y += particles[index].speed
+            particles[index].y += particles[index].speed * speedScale
             // Slight horizontal drift
             particles[index].x += CGFloat.random(in: -0.5...0.5)
             // Fade as it falls
@@ -57,7 +57,7 @@ struct ContentView: View {
             overlay
             
             // Blood rain effect
-            BloodRainView()
+            BloodRainView(intensity: { scene?.musicIntensity })
                 .allowsHitTesting(false)
             
             if isPaused {
@@ -9,10 +9,15 @@ final class GameScene: SKScene {
     private var notes: [Note] = []
     private var noteLookup: [String: Note] = [:]
     private var nextNoteIndex: Int = 0
+    private var noteIndex = NoteIndex(notes: [])
+    private var intensityCurves: IntensityCurves?
+    /// Music intensity at the current song time, for effects outside the scene (nil without curves).
+    private(set) var musicIntensity: IntensitySample?
     private var activeNotes: [String: SKNode] = [:]
     private var audio = GameAudioEngine(song: SongMetadata.default)
     private var didBuildLanes: Bool = false
     private var particleCache: [String: SKEmitterNode] = [:]
+    private let noteAtlas = SpriteAtlas.named("notes")
     private var isPausedState: Bool = false
     private var song: SongMetadata = .default
     
@@ -153,7 +158,15 @@ final class GameScene: SKScene {
             notes = chart.notes.sorted { $0.time < $1.time }
         }
         noteLookup = Dictionary(uniqueKeysWithValues: notes.map { ($0.id, $0) })
+        // Written by the chart generators; user beatmaps and older charts build it here.
+        if let index = chart.noteIndex, index.matches(notes) {
+            noteIndex = index
+        } else {
+            noteIndex = NoteIndex(notes: notes)
+        }
         lastNoteEndTime = notes.map { $0.time + ($0.duration ?? 0) }.max() ?? 0
+        intensityCurves = IntensityCurves.load(for: song)
+        musicIntensity = nil
         nextNoteIndex = 0
         activeNotes.removeAll()
         activeHolds.removeAll()
@@ -195,12 +208,17 @@ final class GameScene: SKScene {
         }
     }
     
+    /// Notes within `window` seconds of `time`, found through the bucket index instead of a scan.
+    private func notesNear(_ time: Double, within window: Double) -> ArraySlice<Note> {
+        notes[noteIndex.range(from: time - window, through: time + window, in: notes)]
+    }
+
     private func handleShakeDetected() {
         guard songStartTime != nil else { return }
         let songTime = latestSongTime
         
         // Find all active shake notes near current time
-        let candidates = notes.filter {
+        let candidates = notesNear(songTime, within: hitWindow).filter {
             $0.type == .shake &&
             activeNotes[$0.id] != nil &&
             abs($0.time - songTime) <= hitWindow
@@ -559,6 +577,7 @@ final class GameScene: SKScene {
         guard let songStartTime else { return }
         let songTime = max(0, currentTime - songStartTime)
         latestSongTime = songTime
+        updateMusicIntensity(songTime: songTime)
         
         // Update revenge mode
         gameState?.updateRevengeMode(currentTime: songTime)
@@ -636,24 +655,11 @@ final class GameScene: SKScene {
                 let laneIndex = note.lane % laneImages.count
                 let candidates = [metalLaneImages[laneIndex], "note_metal", laneImages[laneIndex]]
 
-                var selectedImage: UIImage?
-                for name in candidates {
-                    if let img = UIImage(named: name) {
-                        selectedImage = img
-                        break
-                    } else if let path = Bundle.main.path(forResource: name.replacingOccurrences(of: ".png", with: ""), ofType: "png"),
-                              let img = UIImage(contentsOfFile: path) {
-                        selectedImage = img
-                        break
-                    }
-                }
-
-                if let noteImage = selectedImage {
-                    let spriteNode = SKSpriteNode(texture: SKTexture(image: noteImage))
-                    spriteNode.size = CGSize(width: 69, height: 69)  // 25% larger
+                if let atlas = noteAtlas,
+                   let name = candidates.first(where: atlas.contains),
+                   let spriteNode = atlas.spriteNode(named: name, size: CGSize(width: 69, height: 69)) {
                     spriteNode.zPosition = 6
-                    // If using a generic metal texture, tint per lane for clarity
-                    if candidates.first == "note_metal" || noteImage.accessibilityIdentifier == "note_metal" {
+                    if name == "note_metal" {
                         spriteNode.color = laneColors[laneIndex]
                         spriteNode.colorBlendFactor = 0.6
                     }
@@ -686,9 +692,7 @@ final class GameScene: SKScene {
                 }
                 
                 if !noteImageName.isEmpty,
-                   let noteImage = UIImage(named: noteImageName) ?? UIImage(contentsOfFile: Bundle.main.path(forResource: noteImageName, ofType: "png") ?? "") {
-                    let spriteNode = SKSpriteNode(texture: SKTexture(image: noteImage))
-                    spriteNode.size = CGSize(width: 58, height: 58)
+                   let spriteNode = noteAtlas?.spriteNode(named: noteImageName, size: CGSize(width: 58, height: 58)) {
                     spriteNode.zPosition = 6
                     node = spriteNode
                 } else {
@@ -1047,7 +1051,7 @@ final class GameScene: SKScene {
         guard lane >= 0 && lane < chart.lanes else { return }
 
         // Always check for tap/shake notes on any tap, regardless of previous holds/taps
-        let tapCandidates = notes.filter {
+        let tapCandidates = notesNear(songTime, within: hitWindow).filter {
             ($0.type == .tap || $0.type == .shake) &&
             $0.lane == lane &&
             activeNotes[$0.id] != nil &&
@@ -1061,7 +1065,7 @@ final class GameScene: SKScene {
             }
         } else {
             // Only count as a bad tap if there are no future notes in this lane within a reasonable window (e.g., 2x hitWindow)
-            let futureNote = notes.first(where: {
+            let futureNote = notesNear(songTime, within: hitWindow * 2).first(where: {
                 ($0.type == .tap || $0.type == .shake) &&
                 $0.lane == lane &&
                 $0.time > songTime &&
@@ -1077,7 +1081,7 @@ final class GameScene: SKScene {
         case .began:
             touchedLanes.insert(lane)
             // Check for hold notes
-            let holdCandidates = notes.filter {
+            let holdCandidates = notesNear(songTime, within: hitWindow).filter {
                 $0.type == .hold &&
                 $0.lane == lane &&
                 activeNotes[$0.id] != nil &&
@@ -1170,6 +1174,16 @@ final class GameScene: SKScene {
         label.run(sequence)
     }
     
+    private func updateMusicIntensity(songTime: Double) {
+        guard let intensityCurves else { return }
+        let sample = intensityCurves.sample(at: songTime)
+        musicIntensity = sample
+        guard !isRevengeAnimating else { return }
+        // Background breathes with the bass; dimmest between beats of quiet passages.
+        let pulse = CGFloat(sample.low) * (1 - CGFloat(sample.beatPhase) * 0.5)
+        laneBackgroundNode?.alpha = 0.8 + 0.2 * pulse
+    }
+
     private func flashLaneGlow(lane: Int, judgement: Judgement) {
         guard lane >= 0 && lane < laneGlowNodes.count else { return }
         let glowNode = laneGlowNodes[lane]
@@ -1242,7 +1256,8 @@ final class GameScene: SKScene {
     private func animateRevengeBackground() {
         guard isRevengeAnimating else { return }
         
-        let delay: TimeInterval = 0.3  // Fast animation for intense effect
+        // Fast animation for intense effect, faster still in busy passages
+        let delay: TimeInterval = 0.3 - 0.15 * Double(musicIntensity?.onsets ?? 0)
         
         DispatchQueue.main.asyncAfter(deadline: .now() + delay) { [weak self] in
             guard let self = self, self.isRevengeAnimating else { return }
@@ -52,6 +52,63 @@ struct Note: Codable, Identifiable {
     }
 }
 
+/// Time-bucket lookup written next to the notes by the chart generators (chart_io.py).
+/// Notes are stored sorted by time and `buckets[k]` is the first note at or after
+/// `k * bucketSeconds`, so the notes around any song time are found without a scan.
+struct NoteIndex: Codable {
+    static let defaultBucketSeconds: Double = 0.25
+
+    let bucketSeconds: Double
+    let buckets: [Int]
+
+    /// Index of time-sorted `notes`, for charts that don't carry one (user beatmaps, older charts).
+    init(notes: [Note], bucketSeconds: Double = NoteIndex.defaultBucketSeconds) {
+        self.bucketSeconds = bucketSeconds
+        guard let last = notes.last, last.time >= 0 else {
+            buckets = []
+            return
+        }
+        var buckets: [Int] = []
+        var index = 0
+        for bucket in 0...Int(last.time / bucketSeconds) {
+            let start = Double(bucket) * bucketSeconds
+            while index < notes.count && notes[index].time < start {
+                index += 1
+            }
+            buckets.append(index)
+        }
+        self.buckets = buckets
+    }
+
+    /// Whether the index spans `notes` (one bucket per `bucketSeconds` up to the last note).
+    func matches(_ notes: [Note]) -> Bool {
+        guard let last = notes.last, last.time >= 0 else { return buckets.isEmpty }
+        return bucketSeconds > 0 && buckets.count == Int(last.time / bucketSeconds) + 1
+    }
+
+    /// Index of the first note at or after `time` in the chart's time-sorted notes.
+    func firstNote(atOrAfter time: Double, in notes: [Note]) -> Int {
+        guard time > 0, !buckets.isEmpty else { return 0 }
+        let bucket = Int(time / bucketSeconds)
+        guard bucket < buckets.count else { return notes.count }
+        var index = buckets[bucket]
+        while index < notes.count && notes[index].time < time {
+            index += 1
+        }
+        return index
+    }
+
+    /// Indices of the notes with `start <= time <= end`.
+    func range(from start: Double, through end: Double, in notes: [Note]) -> Range<Int> {
+        let first = firstNote(atOrAfter: start, in: notes)
+        var last = first
+        while last < notes.count && notes[last].time <= end {
+            last += 1
+        }
+        return first..<last
+    }
+}
+
 struct Chart: Codable {
     let version: Int?
     let difficulty: Difficulty?
@@ -60,6 +117,7 @@ struct Chart: Codable {
     let offset: Double
     let lanes: Int
     let notes: [Note]
+    var noteIndex: NoteIndex? = nil
 }
 
 enum ChartLoader {
@@ -0,0 +1,68 @@
+import Foundation
+
+/// Music intensity at one moment, every channel in 0...1.
+struct IntensitySample {
+    var loudness: Float
+    var low: Float
+    var mid: Float
+    var high: Float
+    var onsets: Float
+    /// Position within the current beat (0 on the beat).
+    var beatPhase: Float
+
+    static let silent = IntensitySample(loudness: 0, low: 0, mid: 0, high: 0, onsets: 0, beatPhase: 0)
+}
+
+/// Per-song curves precomputed by build_intensity_curves.py (`<audioName>.intensity`):
+/// a 16-byte header ("TTIC", u16 version, u16 channel count, f32 frame rate,
+/// u32 frame count) followed by one byte per channel per frame. Effects look up
+/// the frame for the current song time instead of analysing audio on the device.
+struct IntensityCurves {
+    static let version: UInt16 = 1
+    private static let headerSize = 16
+
+    let frameRate: Double
+    let frameCount: Int
+    private let channelCount: Int
+    private let values: [UInt8]
+
+    init?(data: Data) {
+        guard data.count >= Self.headerSize, data.prefix(4) == Data("TTIC".utf8) else { return nil }
+        let (version, channels, rate, frames) = data.withUnsafeBytes { raw in
+            (
+                UInt16(littleEndian: raw.loadUnaligned(fromByteOffset: 4, as: UInt16.self)),
+                Int(UInt16(littleEndian: raw.loadUnaligned(fromByteOffset: 6, as: UInt16.self))),
+                Float(bitPattern: UInt32(littleEndian: raw.loadUnaligned(fromByteOffset: 8, as: UInt32.self))),
+                Int(UInt32(littleEndian: raw.loadUnaligned(fromByteOffset: 12, as: UInt32.self)))
+            )
+        }
+        guard version == Self.version, channels >= 6, rate > 0,
+              data.count >= Self.headerSize + frames * channels else { return nil }
+        frameRate = Double(rate)
+        frameCount = frames
+        channelCount = channels
+        values = [UInt8](data[Self.headerSize..<(Self.headerSize + frames * channels)])
+    }
+
+    /// The frame covering `time` (seconds of song audio); clamped to the first/last frame.
+    func sample(at time: Double) -> IntensitySample {
+        guard frameCount > 0 else { return .silent }
+        let base = min(max(Int(time * frameRate), 0), frameCount - 1) * channelCount
+        func channel(_ index: Int) -> Float { Float(values[base + index]) / 255 }
+        return IntensitySample(
+            loudness: channel(0),
+            low: channel(1),
+            mid: channel(2),
+            high: channel(3),
+            onsets: channel(4),
+            beatPhase: channel(5)
+        )
+    }
+
+    static func load(for song: SongMetadata) -> IntensityCurves? {
+        let url = Bundle.main.url(forResource: song.audioName, withExtension: "intensity")
+            ?? Bundle.main.url(forResource: song.audioName, withExtension: "intensity", subdirectory: "Intensity")
+        guard let url, let data = try? Data(contentsOf: url) else { return nil }
+        return IntensityCurves(data: data)
+    }
+}
@@ -13,3 +13,86 @@ extension SKTexture {
         self.init(image: image)
     }
 }
+
+/// Sprite sheets packed by build_texture_atlas.py (`Atlases/<name>.json` + `<name>_<n>.png`).
+/// Each sheet is decoded once; every sprite is a sub-texture of its sheet.
+final class SpriteAtlas {
+    private struct Frame: Decodable {
+        let sheet: Int
+        let x: Int
+        let y: Int
+        let w: Int
+        let h: Int
+        let sourceW: Int
+        let sourceH: Int
+        let offsetX: Int
+        let offsetY: Int
+    }
+
+    private struct Metadata: Decodable {
+        let sheets: [String]
+        let frames: [String: Frame]
+    }
+
+    private static var cache: [String: SpriteAtlas] = [:]
+
+    private let frames: [String: Frame]
+    private let textures: [String: SKTexture]
+
+    private init(frames: [String: Frame], textures: [String: SKTexture]) {
+        self.frames = frames
+        self.textures = textures
+    }
+
+    static func named(_ name: String) -> SpriteAtlas? {
+        if let atlas = cache[name] { return atlas }
+        guard let url = Bundle.main.url(forResource: name, withExtension: "json"),
+              let data = try? Data(contentsOf: url),
+              let metadata = try? JSONDecoder().decode(Metadata.self, from: data) else { return nil }
+
+        let sheets: [(texture: SKTexture, pixels: CGSize)?] = metadata.sheets.map { file in
+            let base = (file as NSString).deletingPathExtension
+            guard let path = Bundle.main.path(forResource: base, ofType: "png"),
+                  let image = UIImage(contentsOfFile: path) else { return nil }
+            let pixels = CGSize(width: image.size.width * image.scale, height: image.size.height * image.scale)
+            return (SKTexture(image: image), pixels)
+        }
+
+        var textures: [String: SKTexture] = [:]
+        for (spriteName, frame) in metadata.frames {
+            guard frame.sheet < sheets.count, let sheet = sheets[frame.sheet] else { continue }
+            // Frames are top-left pixel rects; SpriteKit wants unit rects from the bottom-left.
+            let rect = CGRect(
+                x: CGFloat(frame.x) / sheet.pixels.width,
+                y: 1 - CGFloat(frame.y + frame.h) / sheet.pixels.height,
+                width: CGFloat(frame.w) / sheet.pixels.width,
+                height: CGFloat(frame.h) / sheet.pixels.height
+            )
+            textures[spriteName] = SKTexture(rect: rect, in: sheet.texture)
+        }
+        guard !textures.isEmpty else { return nil }
+
+        let atlas = SpriteAtlas(frames: metadata.frames, textures: textures)
+        cache[name] = atlas
+        return atlas
+    }
+
+    func contains(_ name: String) -> Bool {
+        textures[name] != nil
+    }
+
+    /// Sprite whose untrimmed source image would fill `size`, centred on the node position.
+    func spriteNode(named name: String, size: CGSize) -> SKSpriteNode? {
+        guard let frame = frames[name], let texture = textures[name] else { return nil }
+        let scaleX = size.width / CGFloat(frame.sourceW)
+        let scaleY = size.height / CGFloat(frame.sourceH)
+        let node = SKSpriteNode(texture: texture)
+        node.size = CGSize(width: CGFloat(frame.w) * scaleX, height: CGFloat(frame.h) * scaleY)
+        let bottom = frame.sourceH - frame.offsetY - frame.h
+        node.anchorPoint = CGPoint(
+            x: (CGFloat(frame.sourceW) / 2 - CGFloat(frame.offsetX)) / CGFloat(frame.w),
+            y: (CGFloat(frame.sourceH) / 2 - CGFloat(bottom)) / CGFloat(frame.h)
+        )
+        return node
+    }
+}
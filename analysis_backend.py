@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""Analysis backends for the chart pipeline: librosa or pure NumPy/SciPy.
+
+The chart tools (audio_features, tempo_map, regenerate_charts) only need a small
+set of analysis functions: decoding, STFT magnitudes, the mel spectral-flux onset
+envelope, peak picking with backtracking, the autocorrelation tempogram, the
+dynamic-programming beat tracker, spectral centroid and RMS. `Backend` names them;
+`LibrosaBackend` forwards to librosa and `NumpyBackend` reimplements them with
+librosa's defaults, so charts come out the same without librosa's import cost,
+numba JIT warm-up or dependency tree.
+
+Select the backend with `TAPTAP_ANALYSIS_BACKEND=numpy` (default: librosa).
+`compare_backends.py` checks parity and measures the speed difference.
+"""
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+BACKEND_ENV = "TAPTAP_ANALYSIS_BACKEND"
+DEFAULT_BACKEND = "librosa"
+N_MELS = 128
+TOP_DB = 80.0
+# Frames per STFT block; bounds the windowed-frame buffer to ~16 MB.
+STFT_BLOCK = 2048
+
+
+class Backend(ABC):
+    """Analysis functions used by the chart pipeline (librosa signatures and defaults)."""
+
+    name = ""
+
+    @abstractmethod
+    def load(self, path: Path, sr: int) -> Tuple[np.ndarray, int]:
+        """Mono float32 samples resampled to `sr`."""
+
+    @abstractmethod
+    def stft_magnitude(self, y: np.ndarray, n_fft: int, hop_length: int) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def onset_strength(self, y: np.ndarray, sr: int, hop_length: int, n_fft: int = 2048) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def onset_detect(self, onset_env: np.ndarray, sr: int, hop_length: int, backtrack: bool = False) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def tempogram(self, onset_env: np.ndarray, sr: int, hop_length: int, win_length: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(tempogram, BPM of each lag bin)."""
+
+    @abstractmethod
+    def beat_track(self, onset_env: np.ndarray, sr: int, hop_length: int, bpm: np.ndarray) -> np.ndarray:
+        """Beat frames for a per-frame (or scalar) tempo."""
+
+    @abstractmethod
+    def spectral_centroid(self, magnitude: np.ndarray, sr: int, n_fft: int) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def rms(self, y: np.ndarray, hop_length: int, frame_length: int = 2048) -> np.ndarray:
+        ...
+
+    def frames_to_time(self, frames: np.ndarray, sr: int, hop_length: int) -> np.ndarray:
+        return np.asanyarray(frames) * hop_length / float(sr)
+
+
+class LibrosaBackend(Backend):
+    name = "librosa"
+
+    def __init__(self) -> None:
+        import librosa
+
+        self.librosa = librosa
+
+    def load(self, path: Path, sr: int) -> Tuple[np.ndarray, int]:
+        return self.librosa.load(Path(path).as_posix(), sr=sr)
+
+    def stft_magnitude(self, y: np.ndarray, n_fft: int, hop_length: int) -> np.ndarray:
+        return np.abs(self.librosa.stft(y, n_fft=n_fft, hop_length=hop_length))
+
+    def onset_strength(self, y: np.ndarray, sr: int, hop_length: int, n_fft: int = 2048) -> np.ndarray:
+        return self.librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length, n_fft=n_fft)
+
+    def onset_detect(self, onset_env: np.ndarray, sr: int, hop_length: int, backtrack: bool = False) -> np.ndarray:
+        return self.librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, hop_length=hop_length, backtrack=backtrack)
+
+    def tempogram(self, onset_env: np.ndarray, sr: int, hop_length: int, win_length: int) -> Tuple[np.ndarray, np.ndarray]:
+        tgram = self.librosa.feature.tempogram(onset_envelope=onset_env, sr=sr, hop_length=hop_length, win_length=win_length)
+        return tgram, self.librosa.tempo_frequencies(tgram.shape[0], sr=sr, hop_length=hop_length)
+
+    def beat_track(self, onset_env: np.ndarray, sr: int, hop_length: int, bpm: np.ndarray) -> np.ndarray:
+        _, beats = self.librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length, bpm=bpm)
+        return beats
+
+    def spectral_centroid(self, magnitude: np.ndarray, sr: int, n_fft: int) -> np.ndarray:
+        return self.librosa.feature.spectral_centroid(S=magnitude, sr=sr, n_fft=n_fft)[0]
+
+    def rms(self, y: np.ndarray, hop_length: int, frame_length: int = 2048) -> np.ndarray:
+        return self.librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+
+
+# -- NumPy implementation ----------------------------------------------------------
+
+
+def hann(n: int) -> np.ndarray:
+    """Periodic Hann window (scipy `get_window("hann", n, fftbins=True)`)."""
+    return 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n) / n)
+
+
+def hz_to_mel(freqs: np.ndarray) -> np.ndarray:
+    """Slaney mel scale: linear below 1 kHz, logarithmic above."""
+    freqs = np.asanyarray(freqs, dtype=float)
+    f_sp, min_log_hz = 200.0 / 3, 1000.0
+    min_log_mel, logstep = min_log_hz / f_sp, np.log(6.4) / 27.0
+    mels = freqs / f_sp
+    high = freqs >= min_log_hz
+    mels[high] = min_log_mel + np.log(freqs[high] / min_log_hz) / logstep
+    return mels
+
+
+def mel_to_hz(mels: np.ndarray) -> np.ndarray:
+    mels = np.asanyarray(mels, dtype=float)
+    f_sp, min_log_hz = 200.0 / 3, 1000.0
+    min_log_mel, logstep = min_log_hz / f_sp, np.log(6.4) / 27.0
+    freqs = f_sp * mels
+    high = mels >= min_log_mel
+    freqs[high] = min_log_hz * np.exp(logstep * (mels[high] - min_log_mel))
+    return freqs
+
+
+def mel_filters(sr: int, n_fft: int, n_mels: int = N_MELS, fmax: float | None = None) -> np.ndarray:
+    """Slaney-normalised triangular mel filterbank, (n_mels, 1 + n_fft // 2)."""
+    fmax = sr / 2.0 if fmax is None else fmax
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(np.array([0.0]))[0], hz_to_mel(np.array([fmax]))[0], n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = mel_f[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:] - mel_f[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+def power_to_db(power: np.ndarray, amin: float = 1e-10, top_db: float = TOP_DB) -> np.ndarray:
+    db = 10.0 * np.log10(np.maximum(amin, power))
+    return np.maximum(db, db.max() - top_db)
+
+
+def peak_pick(x: np.ndarray, pre_max: int, post_max: int, pre_avg: int, post_avg: int, delta: float, wait: int) -> np.ndarray:
+    """librosa.util.peak_pick: local maxima above the local mean + delta, `wait` frames apart."""
+    n = x.size
+    idx = np.arange(n)
+    padded = np.concatenate((np.full(pre_max, -np.inf), x, np.full(max(post_max - 1, 0), -np.inf)))
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, pre_max + post_max).max(axis=1)[:n]
+    csum = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    lo, hi = np.maximum(idx - pre_avg, 0), np.minimum(idx + post_avg, n)
+    local_avg = (csum[hi] - csum[lo]) / (hi - lo)
+    candidates = np.flatnonzero((x == local_max) & (x >= local_avg + delta))
+
+    peaks = []
+    next_allowed = 0
+    for c in candidates:
+        if c >= next_allowed:
+            peaks.append(c)
+            next_allowed = c + wait + 1
+    return np.array(peaks, dtype=int)
+
+
+def onset_backtrack(events: np.ndarray, energy: np.ndarray) -> np.ndarray:
+    """Move each event back to the preceding local minimum of `energy`."""
+    minima = np.flatnonzero((energy[1:-1] <= energy[:-2]) & (energy[1:-1] < energy[2:])) + 1
+    minima = np.unique(np.concatenate(([0], minima)))
+    return minima[np.searchsorted(minima, events, side="right") - 1]
+
+
+def autocorrelate(frames: np.ndarray, axis: int = 0) -> np.ndarray:
+    from scipy.fft import irfft, next_fast_len, rfft
+
+    n = frames.shape[axis]
+    n_pad = next_fast_len(2 * n - 1, real=True)
+    spectrum = rfft(frames, n=n_pad, axis=axis)
+    corr = irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_pad, axis=axis)
+    return np.take(corr, np.arange(n), axis=axis)
+
+
+def beat_local_score(onset_env: np.ndarray, frames_per_beat: np.ndarray) -> np.ndarray:
+    """Onsets smoothed by a Gaussian one beat wide (per frame when the tempo varies).
+
+    Accumulates tap by tap at the envelope's precision, like librosa's loop, so
+    near-tied beat candidates resolve the same way.
+    """
+    n = onset_env.size
+    fpb = np.broadcast_to(frames_per_beat, (n,))
+    score = np.zeros(n, dtype=onset_env.dtype)
+    for value in np.unique(fpb):
+        half = int(value)
+        window = np.exp(-0.5 * (np.arange(-half, half + 1) * 32.0 / value) ** 2)
+        rows = np.flatnonzero(fpb == value)
+        acc = np.zeros(rows.size, dtype=onset_env.dtype)
+        for k, weight in enumerate(window):
+            # librosa's kernel loop never reaches the first frame.
+            src = rows + half - k
+            valid = (src >= 1) & (src < n)
+            acc[valid] = acc[valid] + weight * onset_env[src[valid]]
+        score[rows] = acc
+    return score
+
+
+def beat_track_dp(localscore: np.ndarray, frames_per_beat: np.ndarray, tightness: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Ellis' beat DP, vectorized over blocks of frames whose predecessors are all final."""
+    n = localscore.size
+    fpb = np.broadcast_to(frames_per_beat, (n,)).astype(np.float64)
+    nearest = np.round(fpb / 2).astype(int)    # closest predecessor offset
+    farthest = (2 * fpb).astype(int)           # farthest predecessor offset
+    offsets = np.arange(int((farthest - nearest).max()) + 1)
+    lookahead = int(nearest.max()) + 1
+    # librosa takes this log at the score precision.
+    log_fpb = np.log(fpb.astype(localscore.dtype)).astype(np.float64)
+
+    cumscore = np.zeros(n, dtype=localscore.dtype)
+    backlink = np.full(n, -1, dtype=np.int32)
+    start = 0
+    while start < n:
+        # Grow the block while each frame's nearest predecessor is already final.
+        rows = np.arange(start, min(n, start + lookahead))
+        ready = rows - nearest[rows] < start
+        rows = rows[: rows.size if ready.all() else max(int(np.argmin(ready)), 1)]
+
+        locs = rows[:, None] - nearest[rows, None] - offsets[None, :]    # nearest candidate first
+        valid = (locs >= 0) & (locs >= (rows - farthest[rows])[:, None])
+        locs = np.where(valid, locs, 0)
+        with np.errstate(divide="ignore"):
+            penalty = tightness * (np.log(rows[:, None] - locs) - log_fpb[rows, None]) ** 2
+        scores = np.where(valid, cumscore[locs] - penalty, -np.inf)
+        best = np.argmax(scores, axis=1)    # first maximum: the nearest candidate wins ties
+        picked = np.arange(rows.size), best
+        has_prev = valid[picked]
+        cumscore[rows] = np.where(has_prev, localscore[rows] + scores[picked], localscore[rows])
+        backlink[rows] = np.where(has_prev, locs[picked], -1)
+        start = rows[-1] + 1
+
+    # Frames before the first strong onset never link back.
+    strong = np.flatnonzero(localscore >= 0.01 * localscore.max())
+    backlink[: strong[0] if strong.size else n] = -1
+    return backlink, cumscore
+
+
+def last_beat(cumscore: np.ndarray) -> int:
+    local_max = np.zeros(cumscore.size, dtype=bool)
+    local_max[1:-1] = (cumscore[1:-1] > cumscore[:-2]) & (cumscore[1:-1] >= cumscore[2:])
+    local_max[-1] = cumscore[-1] > cumscore[-2]
+    threshold = 0.5 * np.median(cumscore[local_max]) if local_max.any() else 0.0
+    candidates = np.flatnonzero(local_max & (cumscore >= threshold))
+    return int(candidates[-1]) if candidates.size else cumscore.size - 1
+
+
+def trim_beats(localscore: np.ndarray, beats: np.ndarray) -> np.ndarray:
+    """Drop beats in the weak lead-in and tail (librosa's `trim=True`)."""
+    w = np.hanning(5)
+    smooth = np.convolve(localscore[beats], w)[len(w) // 2 : len(localscore) + len(w) // 2]
+    threshold = 0.5 * np.sqrt(np.mean(smooth ** 2))
+    trimmed = beats.copy()
+    above = np.flatnonzero(localscore > threshold)
+    if above.size == 0:
+        return np.zeros_like(beats)
+    trimmed[: above[0]] = False
+    trimmed[above[-1] + 1 :] = False
+    return trimmed
+
+
+def decode_with_audioread(path: Path, backend: str) -> Tuple[np.ndarray, int]:
+    """(samples, channels) float32 and the native rate, decoded by audioread."""
+    try:
+        import audioread
+    except ImportError:
+        raise RuntimeError(f"{backend} backend cannot decode {path}: libsndfile does not read it and audioread is not installed") from None
+    try:
+        with audioread.audio_open(path.as_posix()) as f:
+            channels, native_sr = f.channels, f.samplerate
+            pcm = np.concatenate([np.frombuffer(block, dtype="<i2") for block in f] or [np.zeros(0, dtype="<i2")])
+    except audioread.NoBackendError:
+        raise RuntimeError(f"{backend} backend cannot decode {path}: neither libsndfile nor an audioread backend (ffmpeg) reads it") from None
+    return (pcm.reshape(-1, channels) / 32768.0).astype(np.float32), native_sr
+
+
+class NumpyBackend(Backend):
+    name = "numpy"
+
+    def load(self, path: Path, sr: int) -> Tuple[np.ndarray, int]:
+        import soundfile as sf
+        from scipy.signal import resample_poly
+
+        try:
+            data, native_sr = sf.read(Path(path).as_posix(), dtype="float32", always_2d=True)
+        except sf.SoundFileError:
+            # libsndfile has no AAC (m4a) decoder; those go through audioread (ffmpeg/Core Audio).
+            data, native_sr = decode_with_audioread(Path(path), self.name)
+        y = data.mean(axis=1, dtype=np.float32)
+        if native_sr != sr:
+            ratio = Fraction(sr, native_sr)
+            y = resample_poly(y, ratio.numerator, ratio.denominator).astype(np.float32)
+        return y, sr
+
+    def stft_magnitude(self, y: np.ndarray, n_fft: int, hop_length: int) -> np.ndarray:
+        from scipy.fft import rfft
+
+        padded = np.pad(y, n_fft // 2)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+        window = hann(n_fft).astype(np.float32)
+        out = np.empty((1 + n_fft // 2, frames.shape[0]), dtype=np.float32)
+        for start in range(0, frames.shape[0], STFT_BLOCK):
+            block = frames[start : start + STFT_BLOCK] * window
+            out[:, start : start + STFT_BLOCK] = np.abs(rfft(block, axis=1)).T
+        return out
+
+    def onset_strength(self, y: np.ndarray, sr: int, hop_length: int, n_fft: int = 2048) -> np.ndarray:
+        power = self.stft_magnitude(y, n_fft, hop_length) ** 2
+        mel = power_to_db(mel_filters(sr, n_fft) @ power)
+        flux = np.maximum(0.0, mel[:, 1:] - mel[:, :-1]).mean(axis=0)
+        # One frame for the difference lag plus half a window for the centred frames.
+        pad = 1 + n_fft // (2 * hop_length)
+        return np.concatenate((np.zeros(pad, dtype=flux.dtype), flux))[: mel.shape[1]]
+
+    def onset_detect(self, onset_env: np.ndarray, sr: int, hop_length: int, backtrack: bool = False) -> np.ndarray:
+        env = onset_env - onset_env.min()
+        env = env / (env.max() + np.finfo(env.dtype).tiny)
+        if not env.any() or not np.all(np.isfinite(env)):
+            return np.array([], dtype=int)
+        frames_per = lambda seconds: seconds * sr // hop_length
+        peaks = peak_pick(
+            env,
+            pre_max=int(np.ceil(frames_per(0.03))),
+            post_max=int(np.ceil(frames_per(0.0) + 1)),
+            pre_avg=int(np.ceil(frames_per(0.10))),
+            post_avg=int(np.ceil(frames_per(0.10) + 1)),
+            delta=0.07,
+            wait=int(np.ceil(frames_per(0.03))),
+        )
+        return onset_backtrack(peaks, env) if backtrack else peaks
+
+    def tempogram(self, onset_env: np.ndarray, sr: int, hop_length: int, win_length: int) -> Tuple[np.ndarray, np.ndarray]:
+        n = onset_env.size
+        half = win_length // 2
+        padded = np.pad(onset_env, half, mode="linear_ramp", end_values=(0, 0))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, win_length)[:n].T
+        tgram = autocorrelate(frames * hann(win_length)[:, None], axis=0)
+        scale = np.abs(tgram).max(axis=0, keepdims=True)
+        tgram = tgram / np.where(scale < np.finfo(tgram.dtype).tiny, 1.0, scale)
+        bpms = np.full(win_length, np.inf)
+        bpms[1:] = 60.0 * sr / (hop_length * np.arange(1.0, win_length))
+        return tgram, bpms
+
+    def beat_track(self, onset_env: np.ndarray, sr: int, hop_length: int, bpm: np.ndarray) -> np.ndarray:
+        if not onset_env.any():
+            return np.array([], dtype=int)
+        frames_per_beat = np.round(sr / hop_length * 60.0 / np.atleast_1d(bpm))
+        env = onset_env / (onset_env.std(ddof=1) + np.finfo(onset_env.dtype).tiny)
+        # librosa's kernels run at the common precision of the envelope and the tempo.
+        env = env.astype(np.result_type(env, frames_per_beat))
+        localscore = beat_local_score(env, frames_per_beat)
+        backlink, cumscore = beat_track_dp(localscore, frames_per_beat, tightness=100.0)
+        beats = np.zeros(onset_env.size, dtype=bool)
+        n = last_beat(cumscore)
+        while n >= 0:
+            beats[n] = True
+            n = backlink[n]
+        return np.flatnonzero(trim_beats(localscore, beats))
+
+    def spectral_centroid(self, magnitude: np.ndarray, sr: int, n_fft: int) -> np.ndarray:
+        freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+        total = magnitude.sum(axis=0)
+        safe = np.where(total < np.finfo(magnitude.dtype).tiny, 1.0, total)
+        return (freqs @ magnitude) / safe
+
+    def rms(self, y: np.ndarray, hop_length: int, frame_length: int = 2048) -> np.ndarray:
+        padded = np.pad(y, frame_length // 2)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+        power = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame_length
+        return np.sqrt(power).astype(y.dtype)
+
+
+BACKENDS = {"librosa": LibrosaBackend, "numpy": NumpyBackend}
+_instances: Dict[str, Backend] = {}
+
+
+def get_backend(name: str | None = None) -> Backend:
+    """The named backend, else $TAPTAP_ANALYSIS_BACKEND, else librosa (instances are shared)."""
+    name = name or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown analysis backend {name!r} (choose from {', '.join(BACKENDS)})")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
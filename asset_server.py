@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+"""Serve charts, audio, preview clips, waveform and intensity data from Resources over HTTP.
+
+A regenerated chart reaches a test device or the beatmap editor without an Xcode
+rebuild: point the client at http://<this machine>:8765 and fetch
+
+    /catalog                  songs with the URLs of their charts, audio, preview
+                              waveform peaks and intensity curves, plus the
+                              store version
+    /charts/<name>.json       any chart in Resources/
+    /audio/<name>             song audio            (Range requests supported)
+    /previews/<name>          Resources/Previews/   (Range requests supported)
+    /waveforms/<name>.peaks   Resources/Waveforms/
+    /intensity/<name>.intensity  Resources/Intensity/
+    /events                   Server-Sent Events: one `change` event per batch of
+                              changed files (Last-Event-ID replays missed batches)
+
+Responses carry a content-hash ETag and honour If-None-Match (304). Files up to
+MEMORY_LIMIT are held in memory, gzipped once per change and sent compressed to
+clients that accept gzip; larger files are streamed with sendfile. The server is
+a single asyncio loop with HTTP/1.1 keep-alive, so many clients share one
+process; files are re-statted every --poll seconds to invalidate the cache and
+push events. `--self-test` starts a server on a temporary copy of a few files and
+exercises every feature from concurrent localhost clients.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from song_registry import ALL_SONGS, DIFFICULTIES, RESOURCES
+
+DEFAULT_PORT = 8765
+POLL_INTERVAL = 0.5
+HEARTBEAT_SECONDS = 15.0
+IDLE_TIMEOUT = 30.0
+# Files up to this size are kept in memory (and pre-compressed when compressible).
+MEMORY_LIMIT = 2 << 20
+MIN_GZIP_BYTES = 1024
+HISTORY_LENGTH = 256
+AUDIO_EXTENSIONS = {".mp3", ".m4a", ".wav", ".caf"}
+CONTENT_TYPES = {
+    ".json": "application/json",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".wav": "audio/wav",
+    ".caf": "audio/x-caf",
+    ".peaks": "application/octet-stream",
+    ".intensity": "application/octet-stream",
+}
+COMPRESSIBLE = {"application/json", "application/octet-stream"}
+REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+Fingerprint = Tuple[int, int]
+
+
+def fingerprint(path: Path) -> Optional[Fingerprint]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def url_for(prefix: str, path: Path) -> str:
+    """Route of a file; routes are unquoted paths, clients get them through `quote`."""
+    return f"/{prefix}/{path.name}"
+
+
+@dataclass
+class Asset:
+    content_type: str
+    etag: str
+    size: int
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+    gzipped: Optional[bytes] = None
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gz"'
+
+
+def load_asset(path: Path, size: int) -> Asset:
+    """Hash (and for small files read and compress) a file; runs in a worker thread."""
+    content_type = CONTENT_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    if size > MEMORY_LIMIT:
+        digest = hashlib.sha1()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return Asset(content_type, f'"{digest.hexdigest()[:20]}"', size, path=path)
+    return memory_asset(path.read_bytes(), content_type, path)
+
+
+def memory_asset(data: bytes, content_type: str, path: Optional[Path] = None) -> Asset:
+    etag = f'"{hashlib.sha1(data).hexdigest()[:20]}"'
+    gzipped = None
+    if content_type in COMPRESSIBLE and len(data) >= MIN_GZIP_BYTES:
+        gzipped = gzip.compress(data, compresslevel=6, mtime=0)
+    return Asset(content_type, etag, len(data), path=path, data=data, gzipped=gzipped)
+
+
+class AssetStore:
+    """URL table over a Resources tree with a content cache and a change history."""
+
+    def __init__(self, resources: Path = RESOURCES) -> None:
+        self.resources = resources
+        self.routes: Dict[str, Path] = {}
+        self.fingerprints: Dict[str, Fingerprint] = {}
+        self.cache: Dict[str, Tuple[Fingerprint, Asset]] = {}
+        self.version = 0
+        self.history: Deque[Tuple[int, List[str]]] = deque(maxlen=HISTORY_LENGTH)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.catalog: Optional[Asset] = None
+
+    def scan(self) -> Dict[str, Tuple[Path, Fingerprint]]:
+        """Every servable file with its fingerprint (blocking; called from a worker thread)."""
+        sources = [
+            ("charts", self.resources.glob("*.json")),
+            ("audio", (p for p in self.resources.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)),
+            ("previews", (self.resources / "Previews").glob("*")),
+            ("waveforms", (self.resources / "Waveforms").glob("*.peaks")),
+            ("intensity", (self.resources / "Intensity").glob("*.intensity")),
+        ]
+        found = {}
+        for prefix, paths in sources:
+            for path in paths:
+                stamp = fingerprint(path) if path.is_file() else None
+                if stamp is not None:
+                    found[url_for(prefix, path)] = (path, stamp)
+        return found
+
+    def apply(self, found: Dict[str, Tuple[Path, Fingerprint]]) -> List[str]:
+        """Swap in a new scan; returns the routes that appeared, changed or vanished."""
+        initial = self.catalog is None
+        stamps = {url: stamp for url, (_, stamp) in found.items()}
+        changed = sorted(url for url in stamps.keys() | self.fingerprints.keys() if stamps.get(url) != self.fingerprints.get(url))
+        self.routes = {url: path for url, (path, _) in found.items()}
+        self.fingerprints = stamps
+        for url in changed:
+            self.cache.pop(url, None)
+        if changed or initial:
+            self.version += 1
+            self.catalog = memory_asset(json.dumps(self.build_catalog(), indent=2).encode(), "application/json")
+        if changed and not initial:
+            urls = [quote(url) for url in changed]
+            self.history.append((self.version, urls))
+            for queue in self.subscribers:
+                queue.put_nowait((self.version, urls))
+        return changed
+
+    def build_catalog(self) -> dict:
+        songs = []
+        for song in ALL_SONGS:
+            charts = {}
+            for key, name in [("default", f"{song.chart_name}.json")] + [(d, f"{song.chart_name}_{d}.json") for d in DIFFICULTIES]:
+                if f"/charts/{name}" in self.routes:
+                    charts[key] = quote(f"/charts/{name}")
+            audio = f"/audio/{song.audio_name}.{song.audio_ext}"
+            previews = sorted(url for url in self.routes if url.startswith(f"/previews/{song.id}_preview."))
+            waveform = f"/waveforms/{song.audio_name}.peaks"
+            intensity = f"/intensity/{song.audio_name}.intensity"
+            songs.append({
+                "id": song.id,
+                "title": song.title,
+                "artist": song.artist,
+                "lanes": song.lanes,
+                "bpm": song.bpm,
+                "offset": song.offset,
+                "charts": charts,
+                "audio": quote(audio) if audio in self.routes else None,
+                "preview": quote(previews[0]) if previews else None,
+                "waveform": quote(waveform) if waveform in self.routes else None,
+                "intensity": quote(intensity) if intensity in self.routes else None,
+            })
+        charts = sorted(quote(url) for url in self.routes if url.startswith("/charts/"))
+        return {"version": self.version, "songs": songs, "charts": charts}
+
+    async def asset(self, url: str) -> Optional[Asset]:
+        if url in ("/", "/catalog"):
+            return self.catalog
+        path, stamp = self.routes.get(url), self.fingerprints.get(url)
+        if path is None or stamp is None:
+            return None
+        cached = self.cache.get(url)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            asset = await asyncio.get_running_loop().run_in_executor(None, load_asset, path, stamp[1])
+        except OSError:
+            return None
+        if self.fingerprints.get(url) == stamp:
+            self.cache[url] = (stamp, asset)
+        return asset
+
+    def close(self) -> None:
+        """End every event stream."""
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    def changes_since(self, version: int) -> Optional[List[Tuple[int, List[str]]]]:
+        """Batches newer than `version`, or None when the history no longer reaches back that far."""
+        if version >= self.version:
+            return []
+        if not self.history or self.history[0][0] > version + 1:
+            return None
+        return [(v, urls) for v, urls in self.history if v > version]
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    version: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3:
+        raise ValueError(f"bad request line: {lines[0]!r}")
+    method, target, version = parts
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0") or 0)
+    if length:
+        await reader.readexactly(length)
+    url = urlsplit(target)
+    return Request(method.upper(), unquote(url.path), parse_qs(url.query), version, headers)
+
+
+def etag_matches(header: str, etags: Tuple[str, ...]) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored."""
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(tag in candidates for tag in etags)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) of a single `bytes=` range; (-1, -1) when unsatisfiable.
+
+    Malformed and multi-range headers return None, and the whole file is sent.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return -1, -1
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return -1, -1
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def accepts_gzip(header: str) -> bool:
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            name, _, value = params.replace(" ", "").partition("=")
+            try:
+                return name != "q" or float(value) > 0
+            except ValueError:
+                return False
+    return False
+
+
+class AssetServer:
+    def __init__(self, store: AssetStore, poll_interval: float = POLL_INTERVAL) -> None:
+        self.store = store
+        self.poll_interval = poll_interval
+        self.clients = 0
+        self.requests = 0
+
+    async def poll(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            found = await loop.run_in_executor(None, self.store.scan)
+            changed = self.store.apply(found)
+            if changed:
+                print(f"🔁 v{self.store.version}: {', '.join(changed[:5])}{' …' if len(changed) > 5 else ''}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.clients += 1
+        try:
+            while True:
+                request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                if request is None:
+                    break
+                self.requests += 1
+                if not await self.respond(request, reader, writer):
+                    break
+        except ValueError:
+            with suppress(OSError):
+                await self.send(writer, 400, {}, b"bad request\n", keep_alive=False)
+        except (asyncio.TimeoutError, asyncio.LimitOverrunError, OSError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+            with suppress(OSError):
+                await writer.wait_closed()
+
+    async def send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes = b"",
+        keep_alive: bool = True,
+        head_only: bool = False,
+        length: Optional[int] = None,
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Date: {formatdate(usegmt=True)}", "Server: TapTapAssets"]
+        if status != 304:
+            lines.append(f"Content-Length: {len(body) if length is None else length}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if body and not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    async def respond(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        keep_alive = request.keep_alive
+        if request.method not in ("GET", "HEAD"):
+            await self.send(writer, 405, {"Allow": "GET, HEAD"}, keep_alive=keep_alive)
+            return keep_alive
+        if request.path == "/events":
+            await self.events(request, reader, writer)
+            return False
+        asset = await self.store.asset(request.path)
+        if asset is None:
+            await self.send(writer, 404, {"Content-Type": "text/plain"}, b"not found\n", keep_alive, request.method == "HEAD")
+            return keep_alive
+        await self.serve(request, writer, asset, keep_alive)
+        return keep_alive
+
+    async def serve(self, request: Request, writer: asyncio.StreamWriter, asset: Asset, keep_alive: bool) -> None:
+        head_only = request.method == "HEAD"
+        headers = {"Content-Type": asset.content_type, "Cache-Control": "no-cache", "Accept-Ranges": "bytes"}
+        if asset.gzipped is not None:
+            headers["Vary"] = "Accept-Encoding"
+        use_gzip = asset.gzipped is not None and accepts_gzip(request.headers.get("accept-encoding", ""))
+        headers["ETag"] = asset.gzip_etag if use_gzip else asset.etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, (asset.etag, asset.gzip_etag)):
+            await self.send(writer, 304, headers, keep_alive=keep_alive)
+            return
+
+        span = None
+        range_header = request.headers.get("range")
+        if range_header and request.headers.get("if-range", asset.etag) == asset.etag:
+            span = parse_range(range_header, asset.size)
+        if span == (-1, -1):
+            headers["Content-Range"] = f"bytes */{asset.size}"
+            await self.send(writer, 416, headers, keep_alive=keep_alive, head_only=head_only)
+            return
+        if span is not None:
+            # Ranges address the identity encoding.
+            start, end = span
+            headers["ETag"] = asset.etag
+            headers["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+            status, use_gzip = 206, False
+        else:
+            start, end, status = 0, asset.size - 1, 200
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            await self.send(writer, status, headers, asset.gzipped, keep_alive, head_only)
+            return
+        if asset.data is not None:
+            await self.send(writer, status, headers, asset.data[start : end + 1], keep_alive, head_only)
+            return
+
+        count = end - start + 1
+        await self.send(writer, status, headers, keep_alive=keep_alive, head_only=head_only, length=count)
+        if head_only or count <= 0:
+            return
+        with asset.path.open("rb") as f:
+            await asyncio.get_running_loop().sendfile(writer.transport, f, start, count)
+
+    async def events(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lines = [
+            "HTTP/1.1 200 OK",
+            f"Date: {formatdate(usegmt=True)}",
+            "Server: TapTapAssets",
+            "Connection: keep-alive",
+            "Content-Type: text/event-stream",
+            "Cache-Control: no-cache",
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if request.method == "HEAD":
+            await writer.drain()
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self.store.subscribers.add(queue)
+        # Clients send nothing after the request, so a completed read means they hung up.
+        hangup = asyncio.ensure_future(reader.read(1))
+        try:
+            since = request.headers.get("last-event-id") or (request.query.get("since") or [None])[0]
+            writer.write(b"retry: 2000\n\n")
+            if since is not None and since.isdigit():
+                missed = self.store.changes_since(int(since))
+                if missed is None:
+                    writer.write(event_bytes("reset", self.store.version, {"version": self.store.version}))
+                for version, urls in missed or []:
+                    writer.write(event_bytes("change", version, {"version": version, "changed": urls}))
+            else:
+                writer.write(event_bytes("hello", self.store.version, {"version": self.store.version}))
+            await writer.drain()
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, hangup}, timeout=HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    if hangup in done:
+                        return
+                    writer.write(b": keep-alive\n\n")
+                elif getter.result() is None:
+                    return
+                else:
+                    version, urls = getter.result()
+                    writer.write(event_bytes("change", version, {"version": version, "changed": urls}))
+                await writer.drain()
+        finally:
+            hangup.cancel()
+            self.store.subscribers.discard(queue)
+
+
+def event_bytes(event: str, version: int, data: dict) -> bytes:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def start_server(store: AssetStore, host: str, port: int, poll_interval: float) -> Tuple[asyncio.AbstractServer, AssetServer, asyncio.Task]:
+    app = AssetServer(store, poll_interval)
+    store.apply(await asyncio.get_running_loop().run_in_executor(None, store.scan))
+    server = await asyncio.start_server(app.handle, host, port, backlog=1024)
+    return server, app, asyncio.create_task(app.poll())
+
+
+# -- self-test -------------------------------------------------------------------------
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+async def fetch(port: int, path: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        await send_request(writer, path, {**(headers or {}), "Connection": "close"})
+        return await read_response(reader)
+    finally:
+        writer.close()
+
+
+async def send_request(writer: asyncio.StreamWriter, path: str, headers: Dict[str, str], method: str = "GET") -> None:
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost"] + [f"{k}: {v}" for k, v in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+
+async def read_response(reader: asyncio.StreamReader, method: str = "GET") -> Response:
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(head[0].split()[1])
+    headers = {}
+    for line in head[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0"))
+    body = await reader.readexactly(length) if method != "HEAD" and status != 304 else b""
+    return status, headers, body
+
+
+def self_test_resources(directory: Path) -> Tuple[str, str, str]:
+    """A small Resources tree: two real charts, fake audio and waveform files."""
+    song = next(s for s in ALL_SONGS if s.chart_paths())
+    charts = list(song.chart_paths().values())[:2]
+    for chart in charts:
+        shutil.copy(chart, directory / chart.name)
+    audio = directory / f"{song.audio_name}.{song.audio_ext}"
+    audio.write_bytes(bytes(range(256)) * (MEMORY_LIMIT // 256 + 1000))
+    (directory / "Waveforms").mkdir()
+    (directory / "Waveforms" / f"{song.audio_name}.peaks").write_bytes(b"TTPK" + bytes(4096))
+    return song.id, quote(url_for("charts", charts[0])), quote(url_for("audio", audio))
+
+
+async def self_test(clients: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        resources = Path(tmp)
+        song_id, chart_url, audio_url = self_test_resources(resources)
+        store = AssetStore(resources)
+        server, app, poller = await start_server(store, "127.0.0.1", 0, poll_interval=0.05)
+        port = server.sockets[0].getsockname()[1]
+        results: List[Tuple[str, bool]] = []
+
+        async def check(name: str, test: Callable[[], Awaitable[bool]]) -> None:
+            try:
+                ok = await asyncio.wait_for(test(), 10.0)
+            except Exception as exc:
+                ok, name = False, f"{name} ({exc!r})"
+            results.append((name, ok))
+            print(f"  {'✓' if ok else '✗'} {name}")
+
+        async def catalog() -> bool:
+            status, headers, body = await fetch(port, "/catalog")
+            entry = next(s for s in json.loads(body)["songs"] if s["id"] == song_id)
+            return status == 200 and entry["audio"] == audio_url and chart_url in entry["charts"].values() and entry["waveform"] is not None
+
+        async def not_modified() -> bool:
+            _, headers, _ = await fetch(port, chart_url)
+            status, _, body = await fetch(port, chart_url, {"If-None-Match": headers["etag"]})
+            return status == 304 and body == b""
+
+        async def compressed() -> bool:
+            _, _, plain = await fetch(port, chart_url)
+            status, headers, body = await fetch(port, chart_url, {"Accept-Encoding": "gzip, deflate"})
+            return status == 200 and headers.get("content-encoding") == "gzip" and gzip.decompress(body) == plain
+
+        async def ranges() -> bool:
+            full = (resources / unquote(audio_url.rsplit("/", 1)[1])).read_bytes()
+            s1, h1, b1 = await fetch(port, audio_url, {"Range": "bytes=1000-1999"})
+            s2, _, b2 = await fetch(port, audio_url, {"Range": "bytes=-300"})
+            s3, h3, _ = await fetch(port, audio_url, {"Range": f"bytes={len(full)}-"})
+            s4, _, b4 = await fetch(port, audio_url)
+            return (
+                (s1, b1, h1["content-range"]) == (206, full[1000:2000], f"bytes 1000-1999/{len(full)}")
+                and (s2, b2) == (206, full[-300:])
+                and (s3, h3["content-range"]) == (416, f"bytes */{len(full)}")
+                and (s4, b4) == (200, full)
+            )
+
+        async def keep_alive() -> bool:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                await send_request(writer, "/catalog", {})
+                first = await read_response(reader)
+                await send_request(writer, chart_url, {}, method="HEAD")
+                second = await read_response(reader, method="HEAD")
+                return first[0] == 200 and second[0] == 200 and int(second[1]["content-length"]) > 0
+            finally:
+                writer.close()
+
+        async def confined() -> bool:
+            statuses = [(await fetch(port, path))[0] for path in ("/charts/..%2FInfo.plist", "/charts/../song_registry.py", "/nope")]
+            return statuses == [404, 404, 404]
+
+        async def push() -> bool:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                await send_request(writer, "/events", {"Accept": "text/event-stream"})
+                await reader.readuntil(b"\r\n\r\n")
+                await reader.readuntil(b"event: hello")
+                _, before, _ = await fetch(port, chart_url)
+                path = resources / unquote(chart_url.rsplit("/", 1)[1])
+                chart = json.loads(path.read_text())
+                chart["notes"] = chart["notes"][:-1]
+                path.write_text(json.dumps(chart, indent=2))
+                await reader.readuntil(b"event: change")
+                data = json.loads((await reader.readuntil(b"\n\n")).decode().split("data: ", 1)[1])
+                status, after, _ = await fetch(port, chart_url, {"If-None-Match": before["etag"]})
+                return chart_url in data["changed"] and status == 200 and after["etag"] != before["etag"]
+            finally:
+                writer.close()
+
+        async def replay() -> bool:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                await send_request(writer, "/events", {"Last-Event-ID": str(store.version - 1)})
+                await reader.readuntil(b"event: change")
+                return True
+            finally:
+                writer.close()
+
+        async def concurrent() -> bool:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(fetch(port, chart_url if i % 2 else "/catalog") for i in range(clients)))
+            elapsed = time.perf_counter() - start
+            print(f"    {clients} concurrent clients in {elapsed:.2f} s")
+            return all(status == 200 for status, _, _ in responses)
+
+        print(f"🧪 Self-test on http://127.0.0.1:{port}")
+        for name, test in [
+            ("catalog lists charts, audio and waveform", catalog),
+            ("If-None-Match answers 304", not_modified),
+            ("gzip body decodes to the plain body", compressed),
+            ("audio range requests", ranges),
+            ("keep-alive serves several requests per connection", keep_alive),
+            ("paths outside the served folders are not found", confined),
+            ("a chart edit is pushed over /events and changes the ETag", push),
+            ("Last-Event-ID replays missed changes", replay),
+            (f"{clients} concurrent clients", concurrent),
+        ]:
+            await check(name, test)
+
+        poller.cancel()
+        store.close()
+        await asyncio.sleep(0.05)
+        server.close()
+        await server.wait_closed()
+    failed = [name for name, ok in results if not ok]
+    print(f"\n{'❌ Failed: ' + ', '.join(failed) if failed else '✅ All checks passed'}")
+    return not failed
+
+
+async def serve_forever(host: str, port: int, poll_interval: float) -> None:
+    store = AssetStore()
+    server, _, poller = await start_server(store, host, port, poll_interval)
+    print(f"🌐 Serving {len(store.routes)} files from {RESOURCES.name}/ on http://{host}:{port} (Ctrl-C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        poller.cancel()
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve charts and song assets from Resources for device testing.")
+    parser.add_argument("--host", default="0.0.0.0", help="interface to listen on (default: all, so devices can connect)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="seconds between change scans")
+    parser.add_argument("--self-test", action="store_true", help="run the localhost checks and exit")
+    parser.add_argument("--clients", type=int, default=500, help="concurrent clients in the self-test")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if asyncio.run(self_test(args.clients)) else 1)
+    try:
+        asyncio.run(serve_forever(args.host, args.port, args.poll))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Per-song audio features with an on-disk cache keyed by the audio content hash.
+
+Decoding and analysing a full track is the slow part of every chart tool, so the
+features are computed once and stored under `.cache/features/`. A cache entry is
+reused as long as the audio bytes and `FEATURE_VERSION` are unchanged. Features
+come from the analysis backend (see analysis_backend.py); non-default backends
+get their own cache entries.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+import numpy as np
+
+from analysis_backend import DEFAULT_BACKEND, Backend, get_backend
+from song_registry import ROOT, Song
+
+SAMPLE_RATE = 44100
+HOP_LENGTH = 512
+FEATURE_VERSION = 3
+CACHE_DIR = ROOT / ".cache" / "features"
+
+N_FFT = 2048
+# Edges (Hz) of the energy bands: low (kick/bass), low-mid, high-mid, high (cymbals).
+BAND_EDGES = (20.0, 250.0, 2000.0, 6000.0, 16000.0)
+
+
+@dataclass
+class Features:
+    sr: int
+    hop_length: int
+    duration: float
+    onset_env: np.ndarray
+    centroid: np.ndarray
+    rms: np.ndarray
+    band_energy: np.ndarray
+
+    def band_energy_db(self) -> np.ndarray:
+        return 10.0 * np.log10(np.maximum(self.band_energy, 1e-10))
+
+    @property
+    def frame_rate(self) -> float:
+        return self.sr / self.hop_length
+
+    def frame_times(self) -> np.ndarray:
+        return np.arange(self.onset_env.size, dtype=float) / self.frame_rate
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(audio_path: Path, digest: str, backend: str = DEFAULT_BACKEND) -> Path:
+    suffix = "" if backend == DEFAULT_BACKEND else f"-{backend}"
+    return CACHE_DIR / f"{audio_path.stem}-{digest[:16]}-v{FEATURE_VERSION}{suffix}.npz"
+
+
+def band_energy(power: np.ndarray, sr: int, n_fft: int = N_FFT) -> np.ndarray:
+    """Sum an STFT power spectrogram into the BAND_EDGES bands -> (n_bands, frames)."""
+    freqs = np.linspace(0.0, sr / 2.0, power.shape[0])
+    band_index = np.digitize(freqs, BAND_EDGES) - 1
+    n_bands = len(BAND_EDGES) - 1
+    inside = (band_index >= 0) & (band_index < n_bands)
+    summed = np.zeros((n_bands, power.shape[1]), dtype=np.float64)
+    np.add.at(summed, band_index[inside], power[inside])
+    return summed
+
+
+def compute_band_energy(y: np.ndarray, sr: int, hop_length: int = HOP_LENGTH, backend: Backend | None = None) -> np.ndarray:
+    power = (backend or get_backend()).stft_magnitude(y, N_FFT, hop_length) ** 2
+    return band_energy(power, sr).astype(np.float32)
+
+
+def compute_features(audio_path: Path, backend: Backend | None = None) -> Features:
+    backend = backend or get_backend()
+    y, sr = backend.load(audio_path, SAMPLE_RATE)
+    return signal_features(y, sr, backend)
+
+
+def signal_features(y: np.ndarray, sr: int, backend: Backend | None = None) -> Features:
+    backend = backend or get_backend()
+    onset_env = backend.onset_strength(y, sr, HOP_LENGTH)
+    # One STFT shared by the centroid and the band energies.
+    magnitude = backend.stft_magnitude(y, N_FFT, HOP_LENGTH)
+    centroid = backend.spectral_centroid(magnitude, sr, N_FFT)
+    rms = backend.rms(y, HOP_LENGTH)
+    return Features(
+        sr=sr,
+        hop_length=HOP_LENGTH,
+        duration=len(y) / sr,
+        onset_env=onset_env.astype(np.float32),
+        centroid=centroid.astype(np.float32),
+        rms=rms.astype(np.float32),
+        band_energy=band_energy(magnitude**2, sr).astype(np.float32),
+    )
+
+
+def load_features(song: Song, use_cache: bool = True, backend: Backend | None = None) -> Features:
+    """Return cached features for `song`, computing and storing them on a miss."""
+    audio_path = song.audio_path
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Missing audio for {song.title}: {audio_path}")
+
+    backend = backend or get_backend()
+    path = cache_path(audio_path, file_digest(audio_path), backend.name)
+    if use_cache and path.exists():
+        with np.load(path) as data:
+            values = {f.name: data[f.name] for f in fields(Features)}
+        return Features(**{k: v.item() if v.ndim == 0 else v for k, v in values.items()})
+
+    features = compute_features(audio_path, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **asdict(features))
+    return features
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Find duplicate and orphaned files in Resources and print a pruning plan.
+
+- Duplicates: files are bucketed by size first; only buckets with two or more
+  files are hashed (in parallel), so unique sizes are never read.
+- Orphans: files whose name is not referenced by the song registry, any Swift
+  source (string literals, including SongLibrary.swift), Info.plist or the
+  launch storyboard. An extensionless literal only covers files the app can
+  load by bare name: images (`UIImage(named:)`, `SKTexture(imageNamed:)`) and
+  the extensions passed to `forResource:withExtension:`/`ofType:`. Asset
+  catalogs are compiled as a whole and only checked for duplicates.
+- Copies: `name 2.ext` files next to a `name.ext` original (Finder duplicates).
+
+The plan removes the unreferenced copies in each duplicate group and every
+orphan (a group nothing refers to goes entirely). Orphans inside import folders (song.ini, .chart,
+Beat Saber .dat files) are read by the converter scripts, so they are listed for
+exclusion from the app target instead. The plan is written to
+reports/resource_audit.json.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+from song_registry import ALL_SONGS, DIFFICULTIES, RESOURCES, ROOT
+
+REPORT_PATH = ROOT / "reports" / "resource_audit.json"
+SWIFT_SOURCES = [ROOT / "Sources", ROOT / "SettingsView.swift"]
+ALWAYS_KEPT = {"Info.plist", "LaunchScreen.storyboard"}
+IGNORED_NAMES = {".DS_Store"}
+COPY_SUFFIX = re.compile(r"^(?P<base>.+) \d+$")
+STRING_LITERAL = re.compile(r'"((?:[^"\\\n]|\\.)*)"')
+RESOURCE_EXTENSION = re.compile(r'(?:withExtension|ofType):\s*"(\w+)"')
+# UIImage(named:) and SKTexture(imageNamed:) find these without an extension.
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg"}
+
+
+def resource_files(resources: Path = RESOURCES) -> List[Path]:
+    return sorted(p for p in resources.rglob("*") if p.is_file() and p.name not in IGNORED_NAMES)
+
+
+def full_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def duplicate_groups(files: Iterable[Path], workers: int = 8) -> List[List[Path]]:
+    by_size: Dict[int, List[Path]] = defaultdict(list)
+    for path in files:
+        by_size[path.stat().st_size].append(path)
+    candidates = [p for size, group in by_size.items() if len(group) > 1 and size > 0 for p in group]
+
+    # hashlib releases the GIL on large buffers, so threads hash files concurrently.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = dict(zip(candidates, pool.map(full_hash, candidates)))
+    by_hash: Dict[str, List[Path]] = defaultdict(list)
+    for path, digest in hashes.items():
+        by_hash[digest].append(path)
+    return sorted((sorted(g) for g in by_hash.values() if len(g) > 1), key=lambda g: -g[0].stat().st_size)
+
+
+def swift_files() -> List[Path]:
+    files = []
+    for source in SWIFT_SOURCES:
+        files.extend([source] if source.is_file() else sorted(source.rglob("*.swift")))
+    return files
+
+
+def referenced_names(resources: Path = RESOURCES) -> Set[str]:
+    """Every file name or stem the app or the registry refers to."""
+    names: Set[str] = set(ALWAYS_KEPT)
+    for path in swift_files():
+        names.update(STRING_LITERAL.findall(path.read_text(errors="ignore")))
+    for song in ALL_SONGS:
+        names.update({song.audio_path.name, song.chart_path.name})
+        names.update(song.difficulty_chart_path(d).name for d in DIFFICULTIES)
+    for text_file in (resources / "Info.plist", resources / "LaunchScreen.storyboard"):
+        if text_file.exists():
+            names.update(re.findall(r"[\w .\-\[\]]+\.\w+", text_file.read_text(errors="ignore")))
+    # Texture atlases reference their sheet images from the metadata file.
+    for atlas in (resources / "Atlases").glob("*.json"):
+        names.update(json.loads(atlas.read_text()).get("sheets", []))
+    return {n.strip() for n in names if n.strip()}
+
+
+def bare_name_extensions() -> Set[str]:
+    """Extensions the app loads by extensionless name (images and `forResource:` lookups)."""
+    extensions = set(IMAGE_EXTENSIONS)
+    for path in swift_files():
+        extensions.update(RESOURCE_EXTENSION.findall(path.read_text(errors="ignore")))
+    return extensions
+
+
+def is_referenced(path: Path, names: Set[str], extensions: Set[str]) -> bool:
+    if path.name in names:
+        return True
+    return path.stem in names and path.suffix.lstrip(".").lower() in extensions
+
+
+def orphans(files: Iterable[Path], names: Set[str], resources: Path = RESOURCES) -> List[Path]:
+    extensions = bare_name_extensions()
+    result = []
+    for path in files:
+        relative = path.relative_to(resources)
+        if any(part.endswith(".xcassets") for part in relative.parts):
+            continue
+        if not is_referenced(path, names, extensions):
+            result.append(path)
+    return result
+
+
+def finder_copies(files: Iterable[Path]) -> List[Path]:
+    files = list(files)
+    existing = set(files)
+    copies = []
+    for path in files:
+        match = COPY_SUFFIX.match(path.stem)
+        if match and path.with_name(f"{match['base']}{path.suffix}") in existing:
+            copies.append(path)
+    return copies
+
+
+def pruning_plan(resources: Path = RESOURCES, workers: int = 8) -> dict:
+    files = resource_files(resources)
+    names = referenced_names(resources)
+    extensions = bare_name_extensions()
+    groups = duplicate_groups(files, workers)
+    orphan_files = orphans(files, names, resources)
+
+    remove: Dict[Path, str] = {}
+    exclude: Dict[Path, str] = {}
+    duplicate_report = []
+    for group in groups:
+        # Referenced copies are always kept; unreferenced groups are left to the orphan pass.
+        keep = [p for p in group if is_referenced(p, names, extensions)]
+        for path in group:
+            if keep and path not in keep:
+                remove[path] = f"duplicate of {keep[0].relative_to(resources)}"
+        duplicate_report.append({
+            "keep": [str(p.relative_to(resources)) for p in keep],
+            "remove": [str(p.relative_to(resources)) for p in group if p not in keep],
+            "bytes": group[0].stat().st_size * (len(group) - len(keep)),
+        })
+    copies = set(finder_copies(files))
+    for path in orphan_files:
+        if len(path.relative_to(resources).parts) > 1:
+            exclude[path] = "import source, not loaded by the app"
+        else:
+            remove.setdefault(path, "Finder copy, unreferenced" if path in copies else "unreferenced")
+
+    def entries(paths: Dict[Path, str]) -> List[dict]:
+        return [
+            {"path": str(p.relative_to(resources)), "bytes": p.stat().st_size, "reason": reason}
+            for p, reason in sorted(paths.items(), key=lambda item: -item[0].stat().st_size)
+        ]
+
+    removed, excluded = entries(remove), entries(exclude)
+    return {
+        "files": len(files),
+        "bytes": sum(p.stat().st_size for p in files),
+        "duplicates": duplicate_report,
+        "remove": removed,
+        "exclude": excluded,
+        "bytesSaved": sum(e["bytes"] for e in removed + excluded),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audit Resources for duplicate and unreferenced files.")
+    parser.add_argument("--workers", type=int, default=8, help="threads used for hashing")
+    parser.add_argument("--output", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    plan = pruning_plan(workers=args.workers)
+    print(f"📦 {plan['files']} files, {plan['bytes'] / 1e6:.1f} MB in {RESOURCES.relative_to(ROOT)}/")
+    print(f"\nDuplicate groups: {len(plan['duplicates'])}")
+    for group in plan["duplicates"]:
+        print(f"  keep {', '.join(group['keep']) or '(none)'}  (remove {len(group['remove'])}, {group['bytes'] / 1024:.0f} KB)")
+    for title, key in (("Remove", "remove"), ("Exclude from the app target", "exclude")):
+        print(f"\n{title} ({len(plan[key])} files):")
+        for entry in plan[key]:
+            print(f"  {entry['bytes'] / 1024:>8.0f} KB  {entry['path']}  [{entry['reason']}]")
+    print(f"\nBundle shrinks by {plan['bytesSaved'] / 1e6:.1f} MB")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(plan, indent=2))
+    print(f"Report -> {args.output.relative_to(ROOT) if args.output.is_relative_to(ROOT) else args.output}")
+
+
+if __name__ == "__main__":
+    main()
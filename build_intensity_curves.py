@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Precompute per-song music-intensity curves that drive the game's visual effects.
+
+Each song gets `Resources/Intensity/<audio_name>.intensity`, a little-endian
+binary file the game reads once and then indexes with `Int(songTime * frameRate)`
+every frame:
+
+    header   magic "TTIC", u16 version, u16 channel count, f32 frame rate,
+             u32 frame count
+    data     frame count x channel count u8, frame-major (one frame's channels
+             are adjacent)
+
+Channels, in order, are all scaled to 0...255:
+- loudness: RMS level in dB;
+- low, mid, high: band energy in dB, 20-250 Hz, 250-2000 Hz and 2-16 kHz;
+- onsets: detected onsets per second in a ONSET_WINDOW-second window, relative to
+  the song's busy passages (its ONSET_PERCENTILE);
+- beat phase: position within the current beat of the tempo map (0 on the beat).
+
+Level channels are log-compressed and stretched between the song's
+LEVEL_PERCENTILES, so quiet songs still drive the effects. Everything comes from
+the cached features (see audio_features.py): the curves are reduced from feature
+frames to FRAME_RATE by taking each output frame's maximum, so short hits survive.
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from analysis_backend import get_backend
+from audio_features import Features, load_features
+from song_registry import ALL_SONGS, RESOURCES, Song, find_song
+
+INTENSITY_DIR = RESOURCES / "Intensity"
+MAGIC = b"TTIC"
+VERSION = 1
+FRAME_RATE = 60.0
+CHANNELS = ("loudness", "low", "mid", "high", "onsets", "beatPhase")
+HEADER = struct.Struct("<4sHHfI")
+LEVEL_PERCENTILES = (5.0, 99.5)
+ONSET_WINDOW = 1.0
+ONSET_PERCENTILE = 95.0
+
+
+@dataclass
+class IntensityCurves:
+    frame_rate: float
+    values: np.ndarray  # (frames, len(CHANNELS)) uint8
+
+    def channel(self, name: str) -> np.ndarray:
+        return self.values[:, CHANNELS.index(name)]
+
+
+def normalize_level(power: np.ndarray) -> np.ndarray:
+    """Power -> dB -> 0..1 between the song's LEVEL_PERCENTILES."""
+    db = 10.0 * np.log10(np.maximum(power, 1e-10))
+    low, high = np.percentile(db, LEVEL_PERCENTILES)
+    return np.clip((db - low) / max(high - low, 1e-6), 0.0, 1.0)
+
+
+def reduce_max(values: np.ndarray, source_rate: float, n_frames: int) -> np.ndarray:
+    """Maximum of the source frames that fall into each output frame."""
+    bucket = np.minimum((np.arange(values.size) / source_rate * FRAME_RATE).astype(int), n_frames - 1)
+    out = np.zeros(n_frames)
+    np.maximum.at(out, bucket, values)
+    # Output frames without a source frame (never at feature rates above 60 Hz) hold the previous value.
+    filled = np.zeros(n_frames, dtype=bool)
+    filled[bucket] = True
+    return out[np.maximum.accumulate(np.where(filled, np.arange(n_frames), 0))]
+
+
+def onset_density(onset_times: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Onsets within ONSET_WINDOW centred on each time, 1 at the song's ONSET_PERCENTILE."""
+    half = ONSET_WINDOW / 2.0
+    counts = np.searchsorted(onset_times, times + half) - np.searchsorted(onset_times, times - half)
+    return np.clip(counts / max(float(np.percentile(counts, ONSET_PERCENTILE)), 1.0), 0.0, 1.0)
+
+
+def beat_phase(beats: np.ndarray, times: np.ndarray) -> np.ndarray:
+    idx = np.clip(np.searchsorted(beats, times, side="right") - 1, 0, beats.size - 2)
+    return np.clip((times - beats[idx]) / (beats[idx + 1] - beats[idx]), 0.0, 1.0 - 1e-9)
+
+
+def intensity_curves(song: Song, features: Features) -> IntensityCurves:
+    import regenerate_charts
+
+    n_frames = int(np.ceil(features.duration * FRAME_RATE))
+    times = np.arange(n_frames) / FRAME_RATE
+    rate = features.frame_rate
+    bands = features.band_energy.astype(np.float64)
+    channels = {
+        "loudness": reduce_max(normalize_level(features.rms.astype(np.float64) ** 2), rate, n_frames),
+        "low": reduce_max(normalize_level(bands[0]), rate, n_frames),
+        "mid": reduce_max(normalize_level(bands[1]), rate, n_frames),
+        "high": reduce_max(normalize_level(bands[2] + bands[3]), rate, n_frames),
+    }
+
+    backend = get_backend()
+    frames = backend.onset_detect(features.onset_env, features.sr, features.hop_length)
+    channels["onsets"] = onset_density(backend.frames_to_time(frames, features.sr, features.hop_length), times)
+
+    tempo = regenerate_charts.extract_song_tempo(song, features)
+    if tempo.beat_times.size >= 2:
+        channels["beatPhase"] = beat_phase(tempo.extended_beats(features.duration), times)
+    else:
+        channels["beatPhase"] = (times * song.bpm / 60.0) % 1.0
+
+    values = np.stack([channels[name] for name in CHANNELS], axis=1)
+    return IntensityCurves(FRAME_RATE, np.floor(values * 255.0 + 0.5).clip(0, 255).astype(np.uint8))
+
+
+def write_curves(path: Path, curves: IntensityCurves) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(CHANNELS), curves.frame_rate, curves.values.shape[0]))
+        f.write(np.ascontiguousarray(curves.values).tobytes())
+
+
+def load_curves(path: Path) -> IntensityCurves:
+    data = path.read_bytes()
+    magic, version, n_channels, frame_rate, n_frames = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a v{VERSION} intensity file: {path}")
+    values = np.frombuffer(data, dtype=np.uint8, count=n_frames * n_channels, offset=HEADER.size)
+    return IntensityCurves(frame_rate, values.reshape(n_frames, n_channels))
+
+
+def curves_path(song: Song) -> Path:
+    return INTENSITY_DIR / f"{song.audio_name}.intensity"
+
+
+def build_song(song: Song, force: bool = False) -> str:
+    output = curves_path(song)
+    if not force and output.exists() and output.stat().st_mtime >= song.audio_path.stat().st_mtime:
+        return f"  ✓ {song.title} (up to date)"
+    curves = intensity_curves(song, load_features(song))
+    write_curves(output, curves)
+    seconds = curves.values.shape[0] / curves.frame_rate
+    return f"  ✓ {song.title}: {seconds:.0f} s, {output.stat().st_size / 1024:.0f} KB -> {output.name}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build per-song intensity curves for the game's visual effects.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild files that are up to date")
+    args = parser.parse_args()
+
+    songs = [find_song(s) for s in args.song] if args.song else ALL_SONGS
+    songs = [s for s in songs if s.audio_path.exists()]
+    print(f"🌊 Building intensity curves for {len(songs)} songs...")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for line in pool.map(build_song, songs, [args.force] * len(songs)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Build short song-select preview clips for every song.
+
+The clip start comes from `preview_start_time` (ms) in a matching `song.ini` when
+there is one (moved by the song's chart offset onto the bundled audio), otherwise
+from the song's loudest repeated section (usually the chorus, see
+song_sections.py), and failing that from the loudest PREVIEW_SECONDS stretch of
+the cached features, nudged onto the strongest nearby onset. Only the clip window
+is decoded (seek + partial decode through `offset`/`duration`), fades are applied
+and the clips are written to `Resources/Previews/` in parallel. A clip is up to
+date when the song's audio and its chosen window are unchanged (recorded under
+`.cache/previews/`).
+"""
+from __future__ import annotations
+
+import argparse
+import configparser
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from song_registry import ALL_SONGS, RESOURCES, ROOT, Song, find_song
+
+PREVIEW_DIR = RESOURCES / "Previews"
+# Clip window each preview was cut with, so a moved start rebuilds it.
+MANIFEST_DIR = ROOT / ".cache" / "previews"
+PREVIEW_SECONDS = 15.0
+FADE_IN_SECONDS = 0.5
+FADE_OUT_SECONDS = 1.5
+# The chorus search ignores intros and outros.
+SEARCH_START, SEARCH_END = 0.1, 0.8
+# How far (seconds) the start may move to land on a strong onset.
+ONSET_SNAP_SECONDS = 1.0
+
+
+def preview_path(song: Song) -> Path:
+    from normalize_audio import output_extension
+
+    return PREVIEW_DIR / f"{song.id}_preview.{output_extension()}"
+
+
+def words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def metadata_start(song: Song) -> Optional[float]:
+    """`preview_start_time` from the song.ini of a matching imported song folder.
+
+    The time is on the pack audio's timeline; charts converted from the pack were
+    moved by `song.offset` onto the bundled audio, and so is the preview start.
+    """
+    for ini_path in RESOURCES.glob("*/song.ini"):
+        ini = configparser.ConfigParser(interpolation=None, strict=False)
+        try:
+            ini.read(ini_path, encoding="utf-8")
+        except configparser.Error:
+            continue
+        if not ini.has_section("song"):
+            continue
+        meta = ini["song"]
+        same_artist = words(meta.get("artist", "")) == words(song.artist)
+        if same_artist and words(song.title) <= words(meta.get("name", "")) and "preview_start_time" in meta:
+            return float(meta["preview_start_time"]) / 1000.0 + song.offset
+    return None
+
+
+def loudest_start(song: Song, seconds: float = PREVIEW_SECONDS) -> float:
+    """Start of the highest-energy window in the song's cached features."""
+    from audio_features import load_features
+
+    features = load_features(song)
+    frame_rate = features.frame_rate
+    window = max(int(seconds * frame_rate), 1)
+    energy = features.rms.astype(float) ** 2
+    if energy.size <= window:
+        return 0.0
+    cumulative = np.concatenate(([0.0], np.cumsum(energy)))
+    window_energy = cumulative[window:] - cumulative[:-window]
+    lo = int(SEARCH_START * window_energy.size)
+    hi = max(int(SEARCH_END * window_energy.size), lo + 1)
+    start = lo + int(np.argmax(window_energy[lo:hi]))
+
+    snap = int(ONSET_SNAP_SECONDS * frame_rate)
+    a, b = max(start - snap, 0), min(start + snap + 1, features.onset_env.size)
+    start = a + int(np.argmax(features.onset_env[a:b]))
+    return start / frame_rate
+
+
+def section_start(song: Song) -> Optional[float]:
+    """Start of the loudest repeated section, if one starts in the search range."""
+    from audio_features import load_features
+    from song_sections import preview_section, song_sections
+
+    section = preview_section(song_sections(song), load_features(song).duration, (SEARCH_START, SEARCH_END))
+    return section.start if section is not None else None
+
+
+def choose_start(song: Song) -> Tuple[float, str]:
+    start = metadata_start(song)
+    if start is not None:
+        return start, "song.ini"
+    start = section_start(song)
+    if start is not None:
+        return start, "sections"
+    return loudest_start(song), "energy"
+
+
+def apply_fades(y: np.ndarray, sr: int) -> np.ndarray:
+    """Equal-power fade in/out on a (channels, samples) clip."""
+    y = y.copy()
+    n = y.shape[-1]
+    fade_in = min(int(FADE_IN_SECONDS * sr), n)
+    fade_out = min(int(FADE_OUT_SECONDS * sr), n)
+    y[:, :fade_in] *= np.sin(0.5 * np.pi * np.linspace(0.0, 1.0, fade_in))
+    y[:, n - fade_out:] *= np.cos(0.5 * np.pi * np.linspace(0.0, 1.0, fade_out))
+    return y
+
+
+def build_preview(song: Song, seconds: float = PREVIEW_SECONDS, force: bool = False) -> str:
+    import librosa
+    import soundfile as sf
+
+    output = preview_path(song)
+    start, source = choose_start(song)
+    manifest_path = MANIFEST_DIR / f"{song.id}.json"
+    window = {"start": round(start, 3), "seconds": seconds, "audioMtime": song.audio_path.stat().st_mtime}
+    if not force and output.exists() and manifest_path.exists() and json.loads(manifest_path.read_text()) == window:
+        return f"  ✓ {song.title} (up to date)"
+
+    # Only the clip window is decoded.
+    y, sr = librosa.load(song.audio_path.as_posix(), sr=None, mono=False, offset=start, duration=seconds)
+    y = apply_fades(np.atleast_2d(y), sr)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(output.as_posix(), y.T, sr)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(window, indent=2))
+    return f"  ✓ {song.title}: {start:.1f}s-{start + y.shape[-1] / sr:.1f}s ({source}) -> {output.name}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build song-select preview clips.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    parser.add_argument("--seconds", type=float, default=PREVIEW_SECONDS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild clips that are up to date")
+    args = parser.parse_args()
+
+    songs: List[Song] = [find_song(s) for s in args.song] if args.song else ALL_SONGS
+    songs = [s for s in songs if s.audio_path.exists()]
+    print(f"🎧 Building {len(songs)} preview clips...")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for line in pool.map(build_preview, songs, [args.seconds] * len(songs), [args.force] * len(songs)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Tiled mel spectrogram cache for chart QA and editing.
+
+The log-magnitude mel spectrogram of each song is computed once, quantized to
+uint8 (DB_RANGE dB below the song's peak maps to 0) and cut into PNG tiles of
+TILE_COLUMNS columns. Level 0 has one column per analysis hop; every further
+level halves the time resolution (max over column pairs, so transients survive).
+Tiles live under `.cache/spectrograms/<audio>-<hash>/` next to an `index.json`
+describing the levels and an `index.html` that pages through the song with the
+chart notes drawn on top. Nothing is recomputed while the audio is unchanged.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from audio_features import HOP_LENGTH, N_FFT, SAMPLE_RATE, file_digest
+from chart_io import load_chart
+from song_registry import ALL_SONGS, ROOT, Song, find_song
+
+CACHE_DIR = ROOT / ".cache" / "spectrograms"
+TILE_VERSION = 1
+N_MELS = 128
+FMAX = 16000.0
+DB_RANGE = 80.0
+TILE_COLUMNS = 256
+ZOOM_LEVELS = 5
+
+
+def tile_dir(song: Song, digest: str) -> Path:
+    return CACHE_DIR / f"{song.audio_path.stem}-{digest[:16]}-v{TILE_VERSION}"
+
+
+def mel_uint8(y: np.ndarray, sr: int) -> np.ndarray:
+    """(n_mels, frames) uint8 log-mel spectrogram, low frequencies first."""
+    import librosa
+
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, fmax=FMAX)
+    db = librosa.power_to_db(mel, ref=np.max, top_db=DB_RANGE)
+    return np.round((db + DB_RANGE) / DB_RANGE * 255.0).astype(np.uint8)
+
+
+def zoom_levels(spec: np.ndarray, n_levels: int = ZOOM_LEVELS) -> List[np.ndarray]:
+    levels = [spec]
+    for _ in range(1, n_levels):
+        prev = levels[-1]
+        if prev.shape[1] % 2:
+            prev = np.pad(prev, ((0, 0), (0, 1)), mode="edge")
+        levels.append(prev.reshape(prev.shape[0], -1, 2).max(axis=2))
+    return levels
+
+
+def write_tiles(spec: np.ndarray, out_dir: Path, sr: int) -> dict:
+    from PIL import Image
+
+    frame_rate = sr / HOP_LENGTH
+    index = {
+        "version": TILE_VERSION,
+        "sampleRate": sr,
+        "hopLength": HOP_LENGTH,
+        "nMels": N_MELS,
+        "fmax": FMAX,
+        "dbRange": DB_RANGE,
+        "frames": int(spec.shape[1]),
+        "duration": round(spec.shape[1] / frame_rate, 3),
+        "tileColumns": TILE_COLUMNS,
+        "levels": [],
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for level, data in enumerate(zoom_levels(spec)):
+        # High frequencies at the top of the image.
+        image = data[::-1]
+        tiles = []
+        for i, start in enumerate(range(0, image.shape[1], TILE_COLUMNS)):
+            name = f"L{level}_{i:04d}.png"
+            Image.fromarray(np.ascontiguousarray(image[:, start : start + TILE_COLUMNS])).save(out_dir / name, optimize=True)
+            tiles.append(name)
+        seconds_per_column = (2 ** level) / frame_rate
+        index["levels"].append({
+            "level": level,
+            "secondsPerColumn": seconds_per_column,
+            "tileSeconds": seconds_per_column * TILE_COLUMNS,
+            "tiles": tiles,
+        })
+    return index
+
+
+def chart_overlays(song: Song) -> dict:
+    charts = {"base": song.chart_path} if song.chart_path.exists() else {}
+    charts.update(song.chart_paths())
+    overlays = {}
+    for name, path in charts.items():
+        chart = load_chart(path)
+        overlays[name] = {
+            "lanes": int(chart.get("lanes", 3)),
+            "notes": [[round(float(n["time"]), 3), int(n["lane"]), n.get("type", "tap"), n.get("duration") or 0] for n in chart["notes"]],
+        }
+    return overlays
+
+
+HTML_TEMPLATE = """<!doctype html>
+<meta charset="utf-8">
+<title>__TITLE__ spectrogram</title>
+<style>
+body { background: #111; color: #ddd; font: 13px sans-serif; margin: 0; }
+#bar { padding: 8px; position: sticky; top: 0; background: #222; z-index: 2; }
+#view { position: relative; overflow-x: auto; height: 300px; }
+#view img { position: absolute; top: 0; height: 256px; image-rendering: pixelated; }
+svg { position: absolute; top: 0; left: 0; height: 300px; pointer-events: none; }
+</style>
+<div id="bar">__TITLE__ &nbsp; zoom <select id="level"></select> chart <select id="chart"></select> <span id="pos"></span></div>
+<div id="view"></div>
+<script>
+const index = __INDEX__, charts = __CHARTS__;
+const colors = ["#ff4fa3", "#3fa9ff", "#3fdc7f", "#ffd23f"];
+const view = document.getElementById("view"), levelSel = document.getElementById("level"), chartSel = document.getElementById("chart");
+index.levels.forEach(l => levelSel.add(new Option(`${l.level} (${l.tileSeconds.toFixed(1)} s/tile)`, l.level)));
+Object.keys(charts).forEach(c => chartSel.add(new Option(c, c)));
+levelSel.value = 1;
+function render() {
+  const level = index.levels[+levelSel.value], scale = 256 / index.nMels;
+  const pxPerSecond = scale / level.secondsPerColumn, width = index.duration * pxPerSecond;
+  view.innerHTML = "";
+  level.tiles.forEach((name, i) => {
+    const img = new Image(); img.loading = "lazy"; img.src = name;
+    img.style.left = (i * index.tileColumns * scale) + "px"; img.style.width = (index.tileColumns * scale) + "px";
+    view.appendChild(img);
+  });
+  const chart = charts[chartSel.value];
+  if (!chart) return;
+  const laneH = 40 / chart.lanes;
+  let svg = `<svg width="${width}" viewBox="0 0 ${width} 300">`;
+  for (const [t, lane, type, dur] of chart.notes) {
+    const x = t * pxPerSecond, c = colors[lane % colors.length];
+    svg += `<line x1="${x}" x2="${x}" y1="0" y2="256" stroke="${c}" stroke-opacity="0.35"/>`;
+    svg += `<rect x="${x - 2}" y="${260 + lane * laneH}" width="${Math.max(4, dur * pxPerSecond)}" height="${laneH - 2}" fill="${c}"${type === "shake" ? ' stroke="#fff"' : ""}/>`;
+  }
+  view.insertAdjacentHTML("beforeend", svg + "</svg>");
+}
+view.addEventListener("scroll", () => {
+  const level = index.levels[+levelSel.value];
+  document.getElementById("pos").textContent = (view.scrollLeft * level.secondsPerColumn * index.nMels / 256).toFixed(2) + " s";
+});
+levelSel.onchange = chartSel.onchange = render;
+render();
+</script>
+"""
+
+
+def write_html(out_dir: Path, song: Song, index: dict) -> None:
+    html = (
+        HTML_TEMPLATE.replace("__TITLE__", song.title)
+        .replace("__INDEX__", json.dumps(index))
+        .replace("__CHARTS__", json.dumps(chart_overlays(song)))
+    )
+    (out_dir / "index.html").write_text(html)
+
+
+def build_song(song: Song, force: bool = False) -> Path:
+    out_dir = tile_dir(song, file_digest(song.audio_path))
+    index_path = out_dir / "index.json"
+    if force or not index_path.exists():
+        import librosa
+
+        y, sr = librosa.load(song.audio_path.as_posix(), sr=SAMPLE_RATE)
+        index = write_tiles(mel_uint8(y, sr), out_dir, sr)
+        index.update({"song": song.id, "title": song.title})
+        index_path.write_text(json.dumps(index, indent=2))
+    else:
+        index = json.loads(index_path.read_text())
+    # Charts change more often than audio, so the overlay page is always refreshed.
+    write_html(out_dir, song, index)
+    return out_dir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build tiled mel spectrograms with chart overlays.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    parser.add_argument("--force", action="store_true", help="recompute tiles even if cached")
+    args = parser.parse_args()
+
+    songs = [find_song(s) for s in args.song] if args.song else [s for s in ALL_SONGS if s.audio_path.exists()]
+    for song in songs:
+        out_dir = build_song(song, args.force)
+        print(f"  ✓ {song.title}: {out_dir.relative_to(ROOT) / 'index.html'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Pack sprites into power-of-two texture atlases.
+
+Sprite sources live in `Sprites/`, outside the app bundle; only the packed
+sheets ship, so no image is bundled twice.
+
+- Transparent borders are trimmed; the original size and trim offset are kept in
+  the frame metadata so sprites still draw centred at their designed size.
+- Sprites are placed with MaxRects (best short-side fit), trying power-of-two
+  sheet sizes from small to MAX_SHEET_SIZE and keeping the smallest that fits;
+  whatever doesn't fit spills onto another sheet.
+- Each atlas writes `Resources/Atlases/<name>_<sheet>.png` plus `<name>.json`,
+  which `SpriteAtlas` (SKTextureExtension.swift) loads with one texture per sheet.
+- Repacking is skipped while the input files and settings hash the same.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from song_registry import RESOURCES, ROOT
+
+SPRITES_DIR = ROOT / "Sprites"
+ATLAS_DIR = RESOURCES / "Atlases"
+ATLAS_VERSION = 1
+MAX_SHEET_SIZE = 2048
+MIN_SHEET_SIZE = 64
+# Transparent gap between sprites so linear filtering never bleeds neighbours.
+PADDING = 2
+
+ATLASES: Dict[str, List[str]] = {
+    # Missing files are skipped, so optional metal variants can be dropped in later.
+    "notes": [
+        "note_metal_blue", "note_metal_pink", "note_metal_green", "note_metal",
+        "note_blue", "note_pink", "note_green",
+        "note_blue_4lane", "note_green_4lane", "note_orange_4lane", "note_red_4lane",
+    ],
+    # Full-screen overlays; kept apart so the note sheet stays small.
+    "effects": ["particles_layer", "revenge_overlay"],
+}
+
+
+@dataclass
+class Sprite:
+    name: str
+    image: Image.Image          # trimmed
+    source_size: Tuple[int, int]
+    offset: Tuple[int, int]     # top-left of the trimmed box in the source image
+
+
+@dataclass
+class Rect:
+    x: int
+    y: int
+    w: int
+    h: int
+
+    def contains(self, other: "Rect") -> bool:
+        return (
+            self.x <= other.x and self.y <= other.y
+            and self.x + self.w >= other.x + other.w and self.y + self.h >= other.y + other.h
+        )
+
+    def intersects(self, other: "Rect") -> bool:
+        return not (
+            other.x >= self.x + self.w or other.x + other.w <= self.x
+            or other.y >= self.y + self.h or other.y + other.h <= self.y
+        )
+
+
+def load_sprite(path: Path) -> Sprite:
+    image = Image.open(path).convert("RGBA")
+    box = image.getchannel("A").getbbox() or (0, 0, 1, 1)
+    return Sprite(path.stem, image.crop(box), image.size, (box[0], box[1]))
+
+
+class MaxRects:
+    """MaxRects bin packer with the best short-side-fit heuristic."""
+
+    def __init__(self, width: int, height: int):
+        self.free = [Rect(0, 0, width, height)]
+
+    def insert(self, w: int, h: int) -> Optional[Rect]:
+        best: Optional[Rect] = None
+        best_fit = (float("inf"), float("inf"))
+        for free in self.free:
+            if w <= free.w and h <= free.h:
+                leftovers = sorted((free.w - w, free.h - h))
+                if tuple(leftovers) < best_fit:
+                    best, best_fit = Rect(free.x, free.y, w, h), tuple(leftovers)
+        if best is not None:
+            self._split(best)
+        return best
+
+    def _split(self, used: Rect) -> None:
+        pieces = []
+        for free in self.free:
+            if not free.intersects(used):
+                pieces.append(free)
+                continue
+            if used.x > free.x:
+                pieces.append(Rect(free.x, free.y, used.x - free.x, free.h))
+            if used.x + used.w < free.x + free.w:
+                pieces.append(Rect(used.x + used.w, free.y, free.x + free.w - used.x - used.w, free.h))
+            if used.y > free.y:
+                pieces.append(Rect(free.x, free.y, free.w, used.y - free.y))
+            if used.y + used.h < free.y + free.h:
+                pieces.append(Rect(free.x, used.y + used.h, free.w, free.y + free.h - used.y - used.h))
+        # Drop free rectangles contained in another one.
+        self.free = [
+            r for i, r in enumerate(pieces)
+            if not any(j != i and o.contains(r) and (o != r or j < i) for j, o in enumerate(pieces))
+        ]
+
+
+def pack(sprites: List[Sprite], width: int, height: int) -> Tuple[Dict[str, Rect], List[Sprite]]:
+    """Place as many sprites as fit (largest first); returns placements and leftovers."""
+    # Gaps only go between sprites: every sprite reserves PADDING on its right and
+    # bottom, and the bin grows by the same amount so sprites may touch the far edges.
+    packer = MaxRects(width + PADDING, height + PADDING)
+    placed, leftover = {}, []
+    for sprite in sorted(sprites, key=lambda s: (max(s.image.size), s.image.size[0] * s.image.size[1]), reverse=True):
+        w, h = sprite.image.size
+        rect = packer.insert(w + PADDING, h + PADDING)
+        if rect is None:
+            leftover.append(sprite)
+        else:
+            placed[sprite.name] = Rect(rect.x, rect.y, w, h)
+    return placed, leftover
+
+
+def sheet_sizes(max_size: int) -> List[Tuple[int, int]]:
+    """Power-of-two sheet sizes ordered by area (square first on ties)."""
+    sides = []
+    side = MIN_SHEET_SIZE
+    while side <= max_size:
+        sides.append(side)
+        side *= 2
+    sizes = [(w, h) for w in sides for h in sides if max(w, h) <= 2 * min(w, h)]
+    return sorted(sizes, key=lambda s: (s[0] * s[1], s[0] != s[1], -s[0]))
+
+
+def pack_sheets(sprites: List[Sprite], max_size: int = MAX_SHEET_SIZE) -> List[Tuple[Tuple[int, int], Dict[str, Rect]]]:
+    sheets = []
+    remaining = list(sprites)
+    while remaining:
+        too_big = [s for s in remaining if max(s.image.size) > max_size]
+        if too_big:
+            raise ValueError(f"{too_big[0].name} is larger than a {max_size}px sheet")
+        # Smallest sheet that takes everything, or else the fullest max-size sheet.
+        for size in sheet_sizes(max_size):
+            placed, leftover = pack(remaining, *size)
+            if not leftover:
+                break
+        sheets.append((size, placed))
+        remaining = leftover
+    return sheets
+
+
+def input_digest(names: List[str], max_size: int) -> str:
+    digest = hashlib.sha1(f"v{ATLAS_VERSION}-{max_size}-{PADDING}".encode())
+    for name in names:
+        digest.update(name.encode())
+        digest.update((SPRITES_DIR / f"{name}.png").read_bytes())
+    return digest.hexdigest()
+
+
+def build_atlas(name: str, sprite_names: List[str], max_size: int = MAX_SHEET_SIZE, force: bool = False) -> str:
+    names = [n for n in sprite_names if (SPRITES_DIR / f"{n}.png").exists()]
+    metadata_path = ATLAS_DIR / f"{name}.json"
+    digest = input_digest(names, max_size)
+    if not force and metadata_path.exists():
+        previous = json.loads(metadata_path.read_text())
+        if previous.get("inputHash") == digest and all((ATLAS_DIR / s).exists() for s in previous["sheets"]):
+            return f"  ✓ {name} (unchanged)"
+
+    sprites = {s.name: s for s in map(load_sprite, (SPRITES_DIR / f"{n}.png" for n in names))}
+    ATLAS_DIR.mkdir(parents=True, exist_ok=True)
+    for old in ATLAS_DIR.glob(f"{name}_*.png"):
+        old.unlink()
+
+    sheets, frames = [], {}
+    for index, (size, placed) in enumerate(pack_sheets(list(sprites.values()), max_size)):
+        sheet_name = f"{name}_{index}.png"
+        sheet = Image.new("RGBA", size, (0, 0, 0, 0))
+        for sprite_name, rect in placed.items():
+            sprite = sprites[sprite_name]
+            sheet.paste(sprite.image, (rect.x, rect.y))
+            frames[sprite_name] = {
+                "sheet": index,
+                "x": rect.x, "y": rect.y, "w": rect.w, "h": rect.h,
+                "sourceW": sprite.source_size[0], "sourceH": sprite.source_size[1],
+                "offsetX": sprite.offset[0], "offsetY": sprite.offset[1],
+            }
+        sheet.save(ATLAS_DIR / sheet_name, optimize=True)
+        sheets.append(sheet_name)
+
+    metadata = {"version": ATLAS_VERSION, "inputHash": digest, "sheets": sheets, "frames": frames}
+    metadata_path.write_text(json.dumps(metadata, indent=2))
+    used = sum(f["w"] * f["h"] for f in frames.values())
+    area = sum(Image.open(ATLAS_DIR / s).size[0] * Image.open(ATLAS_DIR / s).size[1] for s in sheets)
+    return f"  ✓ {name}: {len(frames)} sprites on {len(sheets)} sheet(s), {used / area:.0%} filled"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pack sprites into texture atlases.")
+    parser.add_argument("--atlas", action="append", choices=sorted(ATLASES), help="atlas to build (default: all)")
+    parser.add_argument("--max-size", type=int, default=MAX_SHEET_SIZE, help="largest sheet side in pixels")
+    parser.add_argument("--force", action="store_true", help="repack even if inputs are unchanged")
+    args = parser.parse_args()
+
+    print("🧩 Packing texture atlases...")
+    for name in args.atlas or sorted(ATLASES):
+        print(build_atlas(name, ATLASES[name], args.max_size, args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Precompute min/max/RMS waveform peak pyramids for the beatmap editor.
+
+Each song gets `Resources/Waveforms/<audio_name>.peaks`, a little-endian binary
+file meant to be memory-mapped:
+
+    header   magic "TTPK", u16 version, u16 level count, u32 sample rate,
+             u64 total samples
+    levels   per level: u32 samples per bucket, u32 bucket count, u64 byte offset
+    data     per level: bucket count x (i16 min, i16 max, i16 rms), 8-byte aligned
+
+Sample values are scaled by 32767. The finest level is reduced from the samples in
+one reshape; every coarser level is reduced from the level below, so the audio is
+scanned once and any zoom renders from a small slice of one level.
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from song_registry import ALL_SONGS, RESOURCES, Song, find_song
+
+WAVEFORM_DIR = RESOURCES / "Waveforms"
+MAGIC = b"TTPK"
+VERSION = 1
+LEVELS = (64, 256, 1024, 4096)
+HEADER = struct.Struct("<4sHHIQ")
+LEVEL_ENTRY = struct.Struct("<IIQ")
+BUCKET_DTYPE = np.dtype([("min", "<i2"), ("max", "<i2"), ("rms", "<i2")])
+
+
+@dataclass
+class PeakLevel:
+    samples_per_bucket: int
+    buckets: np.ndarray  # BUCKET_DTYPE records
+
+
+def peak_pyramid(y: np.ndarray, levels: Sequence[int] = LEVELS) -> List[PeakLevel]:
+    """Min/max/RMS buckets at each size in `levels` (each a multiple of the previous)."""
+    base = levels[0]
+    n_buckets = -(-y.size // base)
+    padded = np.zeros(n_buckets * base, dtype=np.float32)
+    padded[: y.size] = y
+    frames = padded.reshape(n_buckets, base)
+    lows, highs = frames.min(axis=1), frames.max(axis=1)
+    energy = np.square(frames, dtype=np.float64).sum(axis=1)
+    # The last bucket's RMS only covers the real samples.
+    counts = np.full(n_buckets, base, dtype=np.float64)
+    counts[-1] = y.size - (n_buckets - 1) * base
+
+    pyramid = []
+    size = base
+    for target in levels:
+        factor = target // size
+        if factor > 1:
+            n = -(-lows.size // factor)
+            pad = n * factor - lows.size
+            lows = np.pad(lows, (0, pad), constant_values=np.inf).reshape(n, factor).min(axis=1)
+            highs = np.pad(highs, (0, pad), constant_values=-np.inf).reshape(n, factor).max(axis=1)
+            energy = np.pad(energy, (0, pad)).reshape(n, factor).sum(axis=1)
+            counts = np.pad(counts, (0, pad)).reshape(n, factor).sum(axis=1)
+            size = target
+        buckets = np.empty(lows.size, dtype=BUCKET_DTYPE)
+        buckets["min"] = to_int16(lows)
+        buckets["max"] = to_int16(highs)
+        buckets["rms"] = to_int16(np.sqrt(energy / np.maximum(counts, 1)))
+        pyramid.append(PeakLevel(target, buckets))
+    return pyramid
+
+
+def to_int16(values: np.ndarray) -> np.ndarray:
+    return np.round(np.clip(values, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def write_peaks(path: Path, pyramid: List[PeakLevel], sample_rate: int, total_samples: int) -> None:
+    offset = HEADER.size + LEVEL_ENTRY.size * len(pyramid)
+    entries, blobs = [], []
+    for level in pyramid:
+        offset += -offset % 8
+        entries.append(LEVEL_ENTRY.pack(level.samples_per_bucket, level.buckets.size, offset))
+        blobs.append((offset, level.buckets.tobytes()))
+        offset += level.buckets.nbytes
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(pyramid), sample_rate, total_samples))
+        f.write(b"".join(entries))
+        for start, blob in blobs:
+            f.write(b"\0" * (start - f.tell()))
+            f.write(blob)
+
+
+def load_peaks(path: Path) -> List[PeakLevel]:
+    """Memory-map every level of a `.peaks` file (no data is read up front)."""
+    with path.open("rb") as f:
+        magic, version, n_levels, _, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} peaks file: {path}")
+        entries = [LEVEL_ENTRY.unpack(f.read(LEVEL_ENTRY.size)) for _ in range(n_levels)]
+    return [
+        PeakLevel(size, np.memmap(path, dtype=BUCKET_DTYPE, mode="r", offset=offset, shape=(count,)))
+        for size, count, offset in entries
+    ]
+
+
+def peaks_path(song: Song) -> Path:
+    return WAVEFORM_DIR / f"{song.audio_name}.peaks"
+
+
+def build_song(song: Song, force: bool = False) -> str:
+    import librosa
+
+    output = peaks_path(song)
+    if not force and output.exists() and output.stat().st_mtime >= song.audio_path.stat().st_mtime:
+        return f"  ✓ {song.title} (up to date)"
+    y, sr = librosa.load(song.audio_path.as_posix(), sr=None, mono=True)
+    write_peaks(output, peak_pyramid(y), sr, y.size)
+    return f"  ✓ {song.title}: {output.stat().st_size / 1024:.0f} KB -> {output.name}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build waveform peak pyramids for the beatmap editor.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild files that are up to date")
+    args = parser.parse_args()
+
+    songs = [find_song(s) for s in args.song] if args.song else ALL_SONGS
+    songs = [s for s in songs if s.audio_path.exists()]
+    print(f"〰️  Building waveform peaks for {len(songs)} songs...")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for line in pool.map(build_song, songs, [args.force] * len(songs)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
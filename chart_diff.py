@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Diff two versions of a chart by note position, ignoring the random note IDs.
+
+Notes are sorted by (time, lane) and aligned with merge-joins over the sorted
+lists, so a diff is linear in the number of notes:
+
+1. same lane, times within --tolerance: unchanged, or *retyped* when the type or
+   hold duration differs;
+2. remaining notes at the same time on another lane: *moved* (re-laned);
+3. remaining notes on the same lane within MOVE_WINDOW: *moved* (re-timed);
+4. anything left is *removed* (old chart) or *added* (new chart).
+
+Density is compared per SECTION_SECONDS window. Without file arguments every
+chart in Resources/ is diffed against its version at --rev (default HEAD), with
+all old versions read through a single `git cat-file --batch` process.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chart_io import NOTE_TYPES, NoteArrays, chart_files, load_chart, note_arrays
+from song_registry import RESOURCES, ROOT
+
+REPORT_PATH = ROOT / "reports" / "chart_diff.json"
+TIME_TOLERANCE = 0.01
+# Widest judgement window in GameScene; a note shifted further counts as removed + added.
+MOVE_WINDOW = 0.16
+SECTION_SECONDS = 4.0
+MIN_DENSITY_CHANGE = 2
+
+
+@dataclass
+class ChartDiff:
+    name: str
+    old_count: int
+    new_count: int
+    unchanged: int = 0
+    added: List[dict] = field(default_factory=list)
+    removed: List[dict] = field(default_factory=list)
+    moved: List[dict] = field(default_factory=list)
+    retyped: List[dict] = field(default_factory=list)
+    density: List[dict] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.moved or self.retyped)
+
+    def summary(self) -> str:
+        return (
+            f"{self.old_count} -> {self.new_count} notes: {self.unchanged} same, +{len(self.added)} "
+            f"-{len(self.removed)}, {len(self.moved)} moved, {len(self.retyped)} retyped"
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "chart": self.name,
+            "oldNotes": self.old_count,
+            "newNotes": self.new_count,
+            "unchanged": self.unchanged,
+            "added": self.added,
+            "removed": self.removed,
+            "moved": self.moved,
+            "retyped": self.retyped,
+            "density": self.density,
+        }
+
+
+def merge_join(a_times: np.ndarray, b_times: np.ndarray, a_idx: Sequence[int], b_idx: Sequence[int], tolerance: float) -> List[Tuple[int, int]]:
+    """Pair time-sorted index lists whose times are within `tolerance` (nearest first, one pass)."""
+    pairs = []
+    i = j = 0
+    while i < len(a_idx) and j < len(b_idx):
+        ta, tb = a_times[a_idx[i]], b_times[b_idx[j]]
+        if abs(ta - tb) <= tolerance + 1e-9:
+            # Prefer the next candidate on either side if it is a closer match.
+            if j + 1 < len(b_idx) and abs(ta - b_times[b_idx[j + 1]]) < abs(ta - tb):
+                j += 1
+                continue
+            if i + 1 < len(a_idx) and abs(a_times[a_idx[i + 1]] - tb) < abs(ta - tb):
+                i += 1
+                continue
+            pairs.append((a_idx[i], b_idx[j]))
+            i += 1
+            j += 1
+        elif ta < tb:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def by_lane(lanes: np.ndarray, indices: Iterable[int]) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = {}
+    for i in indices:
+        groups.setdefault(int(lanes[i]), []).append(i)
+    return groups
+
+
+def note_json(notes: NoteArrays, i: int) -> dict:
+    entry = {"time": round(float(notes.times[i]), 3), "lane": int(notes.lanes[i]), "type": NOTE_TYPES[notes.types[i]]}
+    if notes.durations[i] > 0:
+        entry["duration"] = round(float(notes.durations[i]), 3)
+    return entry
+
+
+def density_changes(old: NoteArrays, new: NoteArrays) -> List[dict]:
+    end = max(old.times[-1] if len(old) else 0.0, new.times[-1] if len(new) else 0.0)
+    bins = np.arange(0.0, end + SECTION_SECONDS, SECTION_SECONDS)
+    if bins.size < 2:
+        return []
+    old_counts, _ = np.histogram(old.times, bins)
+    new_counts, _ = np.histogram(new.times, bins)
+    changes = []
+    for k in np.flatnonzero(np.abs(new_counts - old_counts) >= MIN_DENSITY_CHANGE):
+        changes.append({
+            "start": round(float(bins[k]), 2),
+            "end": round(float(bins[k + 1]), 2),
+            "oldNps": round(float(old_counts[k] / SECTION_SECONDS), 2),
+            "newNps": round(float(new_counts[k] / SECTION_SECONDS), 2),
+        })
+    return changes
+
+
+def diff_charts(old_chart: dict, new_chart: dict, name: str = "", tolerance: float = TIME_TOLERANCE) -> ChartDiff:
+    old, new = note_arrays(old_chart), note_arrays(new_chart)
+    diff = ChartDiff(name, len(old), len(new))
+    old_left, new_left = set(range(len(old))), set(range(len(new)))
+
+    def take(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        for i, j in pairs:
+            old_left.discard(i)
+            new_left.discard(j)
+        return pairs
+
+    # 1. Same lane, same time.
+    old_lanes, new_lanes = by_lane(old.lanes, range(len(old))), by_lane(new.lanes, range(len(new)))
+    for lane, old_idx in old_lanes.items():
+        for i, j in take(merge_join(old.times, new.times, old_idx, new_lanes.get(lane, []), tolerance)):
+            if old.types[i] != new.types[j] or abs(old.durations[i] - new.durations[j]) > tolerance:
+                diff.retyped.append({"old": note_json(old, i), "new": note_json(new, j)})
+            else:
+                diff.unchanged += 1
+
+    # 2. Same time, another lane.
+    for i, j in take(merge_join(old.times, new.times, sorted(old_left), sorted(new_left), tolerance)):
+        diff.moved.append({"old": note_json(old, i), "new": note_json(new, j), "change": "lane"})
+
+    # 3. Same lane, shifted in time.
+    old_lanes, new_lanes = by_lane(old.lanes, sorted(old_left)), by_lane(new.lanes, sorted(new_left))
+    for lane, old_idx in old_lanes.items():
+        for i, j in take(merge_join(old.times, new.times, old_idx, new_lanes.get(lane, []), MOVE_WINDOW)):
+            diff.moved.append({
+                "old": note_json(old, i),
+                "new": note_json(new, j),
+                "change": "time",
+                "shift": round(float(new.times[j] - old.times[i]), 3),
+            })
+
+    diff.removed = [note_json(old, i) for i in sorted(old_left)]
+    diff.added = [note_json(new, j) for j in sorted(new_left)]
+    diff.moved.sort(key=lambda m: m["old"]["time"])
+    diff.density = density_changes(old, new)
+    return diff
+
+
+def git_blobs(rev: str, paths: List[Path]) -> Dict[Path, Optional[bytes]]:
+    """Contents of `paths` at `rev` (None when missing) from one `git cat-file --batch`."""
+    specs = "".join(f"{rev}:{p.relative_to(ROOT).as_posix()}\n" for p in paths)
+    out = subprocess.run(["git", "cat-file", "--batch"], input=specs.encode(), cwd=ROOT, capture_output=True, check=True).stdout
+    blobs: Dict[Path, Optional[bytes]] = {}
+    pos = 0
+    for path in paths:
+        header_end = out.index(b"\n", pos)
+        header = out[pos:header_end].split()
+        if header[-1] == b"missing":
+            blobs[path] = None
+            pos = header_end + 1
+            continue
+        size = int(header[2])
+        blobs[path] = out[header_end + 1 : header_end + 1 + size]
+        pos = header_end + 1 + size + 1
+    return blobs
+
+
+def diff_library(rev: str, paths: List[Path], tolerance: float) -> List[ChartDiff]:
+    diffs = []
+    for path, blob in git_blobs(rev, paths).items():
+        data = path.read_bytes()
+        if blob == data:
+            continue
+        old_chart = json.loads(blob) if blob is not None else {"notes": []}
+        diffs.append(diff_charts(old_chart, json.loads(data), path.name, tolerance))
+    return diffs
+
+
+def print_diff(diff: ChartDiff, verbose: bool) -> None:
+    print(f"{'~' if diff.changed else '='} {diff.name}: {diff.summary()}")
+    for section in diff.density:
+        print(f"    {section['start']:>6.1f}-{section['end']:<6.1f}s  {section['oldNps']:.2f} -> {section['newNps']:.2f} nps")
+    if not verbose:
+        return
+    for note in diff.removed:
+        print(f"    - {note}")
+    for note in diff.added:
+        print(f"    + {note}")
+    for move in diff.moved:
+        print(f"    > {move['old']} -> lane {move['new']['lane']} @ {move['new']['time']}")
+    for change in diff.retyped:
+        print(f"    * {change['old']} -> {change['new']['type']} {change['new'].get('duration', '')}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Diff chart versions by note position, ignoring note IDs.")
+    parser.add_argument("charts", nargs="*", type=Path, help="OLD NEW chart files (default: every chart vs --rev)")
+    parser.add_argument("--rev", default="HEAD", help="git revision to compare the working tree against")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="seconds two notes may differ and still match")
+    parser.add_argument("--verbose", "-v", action="store_true", help="list every changed note")
+    args = parser.parse_args()
+
+    if args.charts:
+        if len(args.charts) != 2:
+            parser.error("pass exactly two charts (OLD NEW), or none to diff the library")
+        old_path, new_path = args.charts
+        diffs = [diff_charts(load_chart(old_path), load_chart(new_path), new_path.name, args.tolerance)]
+    else:
+        diffs = diff_library(args.rev, chart_files(RESOURCES), args.tolerance)
+        if not diffs:
+            print(f"No chart changes against {args.rev}")
+
+    for diff in diffs:
+        print_diff(diff, args.verbose)
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps([d.to_json() for d in diffs], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Chart JSON helpers shared by the analysis tools.
+
+Charts are the game-format files in `Resources/` (`songName`, `bpm`, `offset`,
+`lanes`, `notes`). Tools that only read charts import this module instead of the
+generators so they don't pull in librosa.
+
+Chart writers also emit a `noteIndex` (see `note_index`) so the game can find the
+notes around any song time without scanning: notes are stored sorted by time and
+`buckets[k]` is the first note at or after `k * bucketSeconds`. Spawn times are
+derived from the note times when the game loads a chart. The index is written
+on one line (see `dump_chart`) so it adds little to the file.
+
+normalize_audio trims leading silence from bundled audio and records the trim
+per audio file in `audio_trims.json`. Charts written for that audio are stamped
+with it (`audioTrim`), so `normalize_audio.shift_chart` only shifts charts that
+were timed against the untrimmed file.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from song_registry import DIFFICULTIES, RESOURCES, ROOT
+
+NOTE_TYPES = ("tap", "hold", "shake")
+TAP, HOLD, SHAKE = range(len(NOTE_TYPES))
+
+BUCKET_SECONDS = 0.25
+# Lead silence (seconds) normalize_audio trimmed from each audio file, keyed by audio name.
+AUDIO_TRIMS_PATH = ROOT / "audio_trims.json"
+
+
+@dataclass
+class NoteArrays:
+    """Column view of a chart's notes, sorted by (time, lane)."""
+
+    times: np.ndarray
+    lanes: np.ndarray
+    types: np.ndarray
+    durations: np.ndarray
+    ids: List[str]
+
+    def __len__(self) -> int:
+        return self.times.size
+
+
+def load_chart(path: Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def dump_chart(chart: dict) -> str:
+    """Chart JSON indented like the other generated files, with `noteIndex` on one line."""
+    body = {key: value for key, value in chart.items() if key != "noteIndex"}
+    text = json.dumps(body, indent=2)
+    if "noteIndex" not in chart:
+        return text
+    return f'{text[:-2]},\n  "noteIndex": {json.dumps(chart["noteIndex"], separators=(",", ":"))}\n}}'
+
+
+def audio_trims() -> Dict[str, float]:
+    return json.loads(AUDIO_TRIMS_PATH.read_text()) if AUDIO_TRIMS_PATH.exists() else {}
+
+
+def record_audio_trims(trims: Dict[str, float]) -> None:
+    """Merge `{audio name: lead trim}` into the record charts are stamped from."""
+    merged = {**audio_trims(), **{name: round(trim, 4) for name, trim in trims.items()}}
+    AUDIO_TRIMS_PATH.write_text(json.dumps(dict(sorted(merged.items())), indent=2))
+
+
+def write_chart(path: Path, chart: dict, audio_name: Optional[str] = None) -> None:
+    """Write `chart` with its note index.
+
+    A chart timed against the bundled audio `audio_name` gets that file's recorded
+    trim as `audioTrim` unless it already carries one.
+    """
+    if audio_name is not None and "audioTrim" not in chart:
+        trim = audio_trims().get(audio_name)
+        if trim:
+            chart["audioTrim"] = trim
+    Path(path).write_text(dump_chart(add_note_index(chart)))
+
+
+def is_chart(data: object) -> bool:
+    return isinstance(data, dict) and isinstance(data.get("notes"), list)
+
+
+def chart_files(resources: Path = RESOURCES) -> List[Path]:
+    """Every game-format chart in `resources` (other JSON such as asset catalogs is skipped)."""
+    paths = []
+    for path in sorted(resources.glob("*.json")):
+        try:
+            if is_chart(load_chart(path)):
+                paths.append(path)
+        except (OSError, ValueError):
+            continue
+    return paths
+
+
+def difficulty_of(path: Path, default: str = "medium") -> str:
+    """Difficulty from a `<chart>_<difficulty>.json` name; base charts count as `default`."""
+    stem = Path(path).stem
+    for difficulty in DIFFICULTIES:
+        if stem.endswith(f"_{difficulty}") or stem.endswith(f"_{difficulty} 2"):
+            return difficulty
+    return default
+
+
+def note_arrays(chart: dict) -> NoteArrays:
+    notes = chart.get("notes", [])
+    times = np.array([float(n["time"]) for n in notes], dtype=float)
+    lanes = np.array([int(n["lane"]) for n in notes], dtype=int)
+    type_codes = {name: code for code, name in enumerate(NOTE_TYPES)}
+    types = np.array([type_codes.get(n.get("type", "tap"), TAP) for n in notes], dtype=int)
+    durations = np.array([float(n.get("duration") or 0.0) for n in notes], dtype=float)
+    order = np.lexsort((lanes, times))
+    ids = [str(notes[i].get("id", "")) for i in order]
+    return NoteArrays(times[order], lanes[order], types[order], durations[order], ids)
+
+
+def note_index(notes: List[dict], bucket_seconds: float = BUCKET_SECONDS) -> dict:
+    """Time-bucket index for time-sorted `notes`."""
+    times = np.array([float(n["time"]) for n in notes], dtype=float)
+    count = int(times[-1] // bucket_seconds) + 1 if times.size else 0
+    buckets = np.searchsorted(times, np.arange(count) * bucket_seconds, side="left")
+    return {"bucketSeconds": bucket_seconds, "buckets": buckets.tolist()}
+
+
+def add_note_index(chart: dict) -> dict:
+    """Sort the notes by time (stable, so same-time notes keep their order) and index them."""
+    chart["notes"] = sorted(chart.get("notes", []), key=lambda n: float(n["time"]))
+    chart["noteIndex"] = note_index(chart["notes"])
+    return chart
+
+
+def check_note_index(chart: dict) -> List[str]:
+    """Problems with the chart's `noteIndex`; empty when it matches the notes."""
+    index = chart.get("noteIndex")
+    if index is None:
+        return ["no noteIndex"]
+    notes = chart.get("notes", [])
+    times = np.array([float(n["time"]) for n in notes], dtype=float)
+    problems = []
+    if np.any(np.diff(times) < 0):
+        problems.append("notes are not sorted by time")
+    expected = note_index(notes, float(index.get("bucketSeconds", BUCKET_SECONDS)))
+    buckets = index.get("buckets", [])
+    if len(buckets) != len(expected["buckets"]):
+        problems.append(f"{len(buckets)} buckets, expected {len(expected['buckets'])}")
+    else:
+        wrong = [k for k, (a, b) in enumerate(zip(buckets, expected["buckets"])) if a != b]
+        if wrong:
+            problems.append(f"{len(wrong)} buckets point at the wrong note (first: bucket {wrong[0]})")
+    stale = sorted(set(index) - set(expected))
+    if stale:
+        problems.append(f"unused fields {', '.join(stale)}")
+    return problems
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Parity check and benchmark of the librosa and NumPy analysis backends.
+
+Parity runs on synthetic tracks (click trains at a fixed tempo and over a tempo
+ramp, plus a seeded melodic pattern) and on every song whose audio is present.
+Both backends analyze the same samples (librosa's decode) and must agree on:
+- onset envelope, centroid, RMS and band energies (max error relative to the
+  signal's peak),
+- onset frames (F-measure within one frame),
+- the notes `regenerate_charts.build_notes` places (via chart_diff).
+Beat identity and the difference between the two decoders are reported too;
+they differ only for audio that is resampled (soxr vs polyphase filtering).
+
+Benchmarks time a cold start (fresh interpreter: imports, JIT, first song) and
+the warm per-song analysis for each backend. Results go to
+reports/backend_parity.json; the exit status is 1 when a parity check fails.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from analysis_backend import BACKEND_ENV, get_backend
+from audio_features import SAMPLE_RATE, signal_features
+from chart_diff import diff_charts
+from song_registry import ALL_SONGS, ROOT, Song
+
+REPORT_PATH = ROOT / "reports" / "backend_parity.json"
+BACKEND_NAMES = ("librosa", "numpy")
+FEATURE_TOLERANCE = 1e-3
+MIN_ONSET_F1 = 0.99
+MIN_CHART_MATCH = 0.99
+
+
+@contextmanager
+def backend_env(name: str) -> Iterator[None]:
+    """Route get_backend() calls inside the pipeline to `name`."""
+    previous = os.environ.get(BACKEND_ENV)
+    os.environ[BACKEND_ENV] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(BACKEND_ENV, None)
+        else:
+            os.environ[BACKEND_ENV] = previous
+
+
+def click(sr: int, freq: float, length: float = 0.05) -> np.ndarray:
+    t = np.arange(int(length * sr)) / sr
+    return np.sin(2 * np.pi * freq * t) * np.exp(-t * 60.0)
+
+
+def place(y: np.ndarray, times: np.ndarray, sound: np.ndarray, gain: float = 1.0) -> None:
+    for t in times:
+        start = int(t * SAMPLE_RATE)
+        end = min(y.size, start + sound.size)
+        y[start:end] += gain * sound[: end - start]
+
+
+def synthetic_tracks(seconds: float = 30.0) -> List[Tuple[str, float, np.ndarray]]:
+    """(name, nominal BPM, float32 samples at SAMPLE_RATE)."""
+    sr = SAMPLE_RATE
+    rng = np.random.default_rng(7)
+    tracks = []
+
+    y = np.zeros(int(seconds * sr))
+    beats = np.arange(0.5, seconds - 0.5, 60.0 / 120.0)
+    place(y, beats[::2], click(sr, 80.0, 0.15))
+    place(y, beats[1::2], rng.standard_normal(int(0.08 * sr)) * np.exp(-np.arange(int(0.08 * sr)) / sr * 40), 0.5)
+    place(y, beats[:-1] + 0.25, click(sr, 6000.0, 0.03), 0.3)
+    tracks.append(("click_120", 120.0, y))
+
+    # Tempo ramp 90 -> 140 BPM: beat phase is the integral of the tempo.
+    y = np.zeros(int(seconds * sr))
+    t = np.arange(0.0, seconds, 0.001)
+    phase = np.cumsum((90.0 + 50.0 * t / seconds) / 60.0) * 0.001
+    ramp_beats = np.interp(np.arange(1, int(phase[-1])), phase, t)
+    place(y, ramp_beats, click(sr, 100.0, 0.12))
+    place(y, ramp_beats[1::2], click(sr, 3000.0, 0.04), 0.4)
+    tracks.append(("ramp_90_140", 90.0, y))
+
+    y = np.zeros(int(seconds * sr))
+    eighths = np.arange(0.5, seconds - 1.0, 60.0 / 100.0 / 2)
+    for start in eighths[rng.random(eighths.size) > 0.3]:
+        freq = 220.0 * 2 ** (rng.integers(0, 24) / 12)
+        place(y, [start], click(sr, freq, 0.3), 0.4)
+    tracks.append(("melody_100", 100.0, y))
+
+    return [(name, bpm, (y / np.abs(y).max() * 0.8).astype(np.float32)) for name, bpm, y in tracks]
+
+
+def relative_error(a: np.ndarray, b: np.ndarray) -> float:
+    n = min(a.shape[-1], b.shape[-1])
+    a, b = a[..., :n].astype(np.float64), b[..., :n].astype(np.float64)
+    return float(np.abs(a - b).max() / max(np.abs(a).max(), 1e-12))
+
+
+def f_measure(reference: np.ndarray, estimate: np.ndarray, tolerance: int = 1) -> float:
+    if reference.size == 0 and estimate.size == 0:
+        return 1.0
+    if reference.size == 0 or estimate.size == 0:
+        return 0.0
+    idx = np.clip(np.searchsorted(estimate, reference), 1, estimate.size - 1)
+    nearest = np.minimum(np.abs(estimate[idx - 1] - reference), np.abs(estimate[idx] - reference))
+    hits = int(np.sum(nearest <= tolerance))
+    return 2.0 * hits / (reference.size + estimate.size)
+
+
+def analyze(song: Song, y: np.ndarray, sr: int, backend_name: str) -> dict:
+    """Full chart analysis of one track with one backend."""
+    import regenerate_charts
+
+    with backend_env(backend_name):
+        backend = get_backend()
+        features = signal_features(y, sr, backend)
+        onsets = backend.onset_detect(features.onset_env, sr, features.hop_length, backtrack=True)
+        tempo = regenerate_charts.extract_song_tempo(song, features)
+        notes = regenerate_charts.build_notes(song, features, tempo)
+    return {"features": features, "onsets": onsets, "tempo": tempo, "notes": notes}
+
+
+def compare_track(name: str, song: Song, y: np.ndarray, sr: int, decode_error: float = 0.0) -> dict:
+    results = {b: analyze(song, y, sr, b) for b in BACKEND_NAMES}
+    ref, est = results["librosa"], results["numpy"]
+    errors = {
+        field: relative_error(getattr(ref["features"], field), getattr(est["features"], field))
+        for field in ("onset_env", "centroid", "rms", "band_energy")
+    }
+    ref_beats, est_beats = ref["tempo"].beat_times, est["tempo"].beat_times
+    chart = diff_charts({"notes": ref["notes"]}, {"notes": est["notes"]}, name)
+    matched = chart.unchanged / max(chart.old_count, chart.new_count, 1)
+    row = {
+        "track": name,
+        "maxRelativeError": {k: float(f"{v:.3g}") for k, v in errors.items()},
+        "decodeError": float(f"{decode_error:.3g}"),
+        "onsets": [int(ref["onsets"].size), int(est["onsets"].size)],
+        "onsetF1": round(f_measure(ref["onsets"], est["onsets"]), 4),
+        "beats": [int(ref_beats.size), int(est_beats.size)],
+        "beatsIdentical": bool(ref_beats.size == est_beats.size and np.allclose(ref_beats, est_beats)),
+        "notes": [chart.old_count, chart.new_count],
+        "notesMatched": round(matched, 4),
+    }
+    row["pass"] = bool(
+        max(errors.values()) <= FEATURE_TOLERANCE
+        and row["onsetF1"] >= MIN_ONSET_F1
+        and matched >= MIN_CHART_MATCH
+    )
+    return row
+
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+from analysis_backend import get_backend
+from audio_features import compute_features
+import regenerate_charts
+from song_registry import find_song
+song = find_song(sys.argv[1]) if sys.argv[1] != "-" else None
+imported = time.perf_counter()
+if song is not None:
+    features = compute_features(song.audio_path)
+    tempo = regenerate_charts.extract_song_tempo(song, features)
+    regenerate_charts.build_notes(song, features, tempo)
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def cold_start(backend_name: str, song: Optional[Song]) -> dict:
+    env = {**os.environ, BACKEND_ENV: backend_name}
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", COLD_START, song.id if song else "-"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return {
+        "importSeconds": round(float(out[0]), 3),
+        "firstSongSeconds": round(float(out[1]), 3),
+        "processSeconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def warm_timings(songs: List[Song]) -> List[dict]:
+    rows = []
+    for song in songs:
+        row = {"song": song.id}
+        for backend_name in BACKEND_NAMES:
+            backend = get_backend(backend_name)
+            start = time.perf_counter()
+            y, sr = backend.load(song.audio_path, SAMPLE_RATE)
+            analyze(song, y, sr, backend_name)
+            row[backend_name] = round(time.perf_counter() - start, 3)
+        row["speedup"] = round(row["librosa"] / row["numpy"], 2)
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the librosa and NumPy analysis backends.")
+    parser.add_argument("--no-real", action="store_true", help="only use synthetic tracks")
+    parser.add_argument("--no-bench", action="store_true", help="skip the timing runs")
+    args = parser.parse_args()
+
+    songs = [] if args.no_real else [s for s in ALL_SONGS if s.audio_path.exists()]
+    rows = []
+    print(f"{'track':<28} {'onset_env':>9} {'centroid':>9} {'rms':>9} {'bands':>9}  {'onsetF1':>7} {'beats':>9} {'notes':>7} {'decode':>9}")
+    tracks = [(name, Song(name, name, "synthetic", name, "wav", name, 4, bpm), y, 0.0) for name, bpm, y in synthetic_tracks()]
+    for song in songs:
+        decoded = [get_backend(b).load(song.audio_path, SAMPLE_RATE)[0] for b in BACKEND_NAMES]
+        tracks.append((song.id, song, decoded[0], relative_error(*decoded)))
+    for name, song, y, decode_error in tracks:
+        row = compare_track(name, song, y, SAMPLE_RATE, decode_error)
+        rows.append(row)
+        err = row["maxRelativeError"]
+        beats = "same" if row["beatsIdentical"] else f"{row['beats'][0]}/{row['beats'][1]}"
+        print(
+            f"{'✓' if row['pass'] else '✗'} {name:<26} {err['onset_env']:>9.1e} {err['centroid']:>9.1e} {err['rms']:>9.1e} "
+            f"{err['band_energy']:>9.1e}  {row['onsetF1']:>7.3f} {beats:>9} {row['notesMatched']:>7.1%} {row['decodeError']:>9.1e}"
+        )
+
+    report: dict = {"parity": rows}
+    if not args.no_bench:
+        bench_song = min(songs, key=lambda s: s.audio_path.stat().st_size) if songs else None
+        report["coldStart"] = {b: cold_start(b, bench_song) for b in BACKEND_NAMES}
+        print("\nCold start (fresh interpreter" + (f", {bench_song.id})" if bench_song else ", imports only)"))
+        for b, timing in report["coldStart"].items():
+            print(f"  {b:<8} imports {timing['importSeconds']:.2f} s, first song done at {timing['firstSongSeconds']:.2f} s")
+        report["warm"] = warm_timings(songs)
+        if report["warm"]:
+            print("\nWarm per-song analysis (decode, features, tempo map, notes)")
+            for row in report["warm"]:
+                print(f"  {row['song']:<28} librosa {row['librosa']:.2f} s  numpy {row['numpy']:.2f} s  ({row['speedup']:.1f}x)")
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+    failed = [r["track"] for r in rows if not r["pass"]]
+    print(f"\n{'❌ Parity failed: ' + ', '.join(failed) if failed else '✅ Backends agree on every track'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,4 @@ cp "${SRC}/day_n_nite.json" "${DEST}/day_n_nite.json"
 cp "${SRC}/crazy_train.mp3" "${DEST}/crazy_train.mp3"
 cp "${SRC}/day_n_nite.mp3" "${DEST}/day_n_nite.mp3"
 
-# Visuals
-cp "${SRC}/revenge_overlay.png" "${DEST}/revenge_overlay.png"
-
 echo "Copied resources to app bundle"
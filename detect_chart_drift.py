@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Detect chart-vs-audio drift and correct it with a piecewise-linear time warp.
+
+- Renders each chart as an impulse train on the audio's onset-envelope frame grid.
+- Cross-correlates chart and audio in sliding windows (all windows and lags in one
+  vectorized product) to estimate the local lag of the chart against the music.
+- Fits a monotonic piecewise-linear warp through the confident windows and, with
+  --apply, re-times every note (and hold end) in one vectorized pass.
+- Writes a drift report per song to reports/drift/<song id>.json.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import gaussian_filter1d, median_filter
+
+from audio_features import Features, load_features
+from chart_io import add_note_index, write_chart
+from song_registry import ALL_SONGS, ROOT, Song, find_song
+
+REPORT_DIR = ROOT / "reports" / "drift"
+
+WINDOW_SECONDS = 8.0
+HOP_SECONDS = 2.0
+MAX_LAG_SECONDS = 0.25
+MIN_NOTES_PER_WINDOW = 6
+MIN_CONFIDENCE = 0.15
+# Largest local tempo deviation the warp may apply (0.05 = 5% faster or slower).
+MAX_STRETCH = 0.05
+# Viterbi cost per frame of lag change between neighbouring windows.
+JUMP_PENALTY = 0.05
+
+
+@dataclass
+class WindowLags:
+    centers: np.ndarray
+    lags: np.ndarray
+    confidence: np.ndarray
+    note_counts: np.ndarray
+
+
+def chart_envelope(times: np.ndarray, n_frames: int, frame_rate: float, sigma_frames: float = 1.5) -> np.ndarray:
+    """Impulse train of note onsets, blurred so near-misses still correlate."""
+    frames = np.round(times * frame_rate).astype(int)
+    frames = frames[(frames >= 0) & (frames < n_frames)]
+    env = np.bincount(frames, minlength=n_frames).astype(float)
+    return gaussian_filter1d(env, sigma_frames)
+
+
+def window_lags(audio_env: np.ndarray, chart_env: np.ndarray, note_frames: np.ndarray, frame_rate: float) -> WindowLags:
+    """Best lag (chart -> audio, seconds) per sliding window.
+
+    A positive lag means the music happens later than the chart says.
+    """
+    win = int(round(WINDOW_SECONDS * frame_rate))
+    hop = max(int(round(HOP_SECONDS * frame_rate)), 1)
+    max_lag = int(round(MAX_LAG_SECONDS * frame_rate))
+    n_frames = min(audio_env.size, chart_env.size)
+    if n_frames < win + 2 * max_lag:
+        empty = np.empty(0)
+        return WindowLags(empty, empty, empty, np.empty(0, dtype=int))
+
+    # Whitened audio, zero-padded so every window can be shifted by +/- max_lag.
+    audio = (audio_env[:n_frames] - audio_env[:n_frames].mean()) / (audio_env[:n_frames].std() + 1e-9)
+    audio = np.pad(audio, (max_lag, max_lag))
+    chart = chart_env[:n_frames]
+
+    starts = np.arange(0, n_frames - win + 1, hop)
+    chart_windows = sliding_window_view(chart, win)[starts]                      # (n_win, win)
+    chart_windows = chart_windows - chart_windows.mean(axis=1, keepdims=True)
+    audio_spans = sliding_window_view(audio, win + 2 * max_lag)[starts]         # (n_win, win + 2L)
+    shifted = sliding_window_view(audio_spans, win, axis=1)                      # (n_win, 2L + 1, win)
+    corr = np.einsum("nk,nlk->nl", chart_windows, shifted)
+
+    norms = np.linalg.norm(chart_windows, axis=1)[:, None] * np.linalg.norm(shifted, axis=2)
+    corr = corr / np.maximum(norms, 1e-9)
+
+    counts = np.searchsorted(note_frames, starts + win) - np.searchsorted(note_frames, starts)
+    best = track_lags(corr, counts >= MIN_NOTES_PER_WINDOW)
+    rows = np.arange(best.size)
+    # Parabolic interpolation around the peak for sub-frame precision.
+    left = corr[rows, np.clip(best - 1, 0, corr.shape[1] - 1)]
+    mid = corr[rows, best]
+    right = corr[rows, np.clip(best + 1, 0, corr.shape[1] - 1)]
+    denom = left - 2 * mid + right
+    frac = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+    frac = np.clip(frac, -0.5, 0.5)
+    lag_frames = best - max_lag + frac
+
+    confidence = mid - np.median(corr, axis=1)
+    centers = (starts + win / 2.0) / frame_rate
+    return WindowLags(centers, lag_frames / frame_rate, confidence, counts)
+
+
+def track_lags(corr: np.ndarray, usable: np.ndarray) -> np.ndarray:
+    """Pick one lag per window with a Viterbi pass that penalises lag jumps.
+
+    Rhythmic music correlates almost equally well at every beat subdivision, so the
+    per-window argmax hops between 8th-note aliases; real drift moves slowly.
+    """
+    n_win, n_lags = corr.shape
+    lag_idx = np.arange(n_lags)
+    transition = JUMP_PENALTY * np.abs(lag_idx[:, None] - lag_idx[None, :])   # (to, from)
+    score = np.where(usable[0], corr[0], 0.0)
+    back = np.zeros((n_win, n_lags), dtype=int)
+    for n in range(1, n_win):
+        candidates = score[None, :] - transition
+        back[n] = np.argmax(candidates, axis=1)
+        score = candidates[lag_idx, back[n]] + (corr[n] if usable[n] else 0.0)
+    path = np.empty(n_win, dtype=int)
+    path[-1] = int(np.argmax(score))
+    for n in range(n_win - 1, 0, -1):
+        path[n - 1] = back[n, path[n]]
+    return path
+
+
+def confident_windows(lags: WindowLags) -> np.ndarray:
+    """Windows with enough notes and a clear enough correlation peak to anchor the warp."""
+    return (lags.note_counts >= MIN_NOTES_PER_WINDOW) & (lags.confidence >= MIN_CONFIDENCE)
+
+
+def fit_warp(lags: WindowLags) -> tuple[np.ndarray, np.ndarray]:
+    """Monotonic piecewise-linear warp as (chart anchor times, lag at each anchor).
+
+    Without a confident window the warp is the identity (one anchor at 0 s, no lag).
+    """
+    keep = confident_windows(lags)
+    x = lags.centers[keep]
+    if x.size == 0:
+        return np.array([0.0]), np.array([0.0])
+    y = median_filter(lags.lags[keep], size=5, mode="nearest") if x.size >= 5 else lags.lags[keep]
+    if x.size == 1:
+        return x, y
+
+    # Bound the local slope of audio time vs chart time so the warp stays monotonic
+    # and cannot introduce implausible tempo jumps, then re-anchor to the measured lags.
+    dx = np.diff(x)
+    slopes = np.clip(1.0 + np.diff(y) / dx, 1.0 - MAX_STRETCH, 1.0 + MAX_STRETCH)
+    warped = x[0] + np.concatenate(([0.0], np.cumsum(slopes * dx)))
+    fitted = warped - x
+    fitted += np.median(y - fitted)
+    return x, fitted
+
+
+def apply_warp(times: np.ndarray, anchors: np.ndarray, anchor_lags: np.ndarray) -> np.ndarray:
+    """Map chart times to audio times; lags are held constant beyond the anchors."""
+    return times + np.interp(times, anchors, anchor_lags)
+
+
+def retime_chart(chart: dict, anchors: np.ndarray, anchor_lags: np.ndarray) -> dict:
+    notes = chart.get("notes", [])
+    if not notes:
+        return chart
+    starts = np.array([float(n["time"]) for n in notes])
+    durations = np.array([float(n.get("duration") or 0.0) for n in notes])
+    new_starts = apply_warp(starts, anchors, anchor_lags)
+    new_ends = apply_warp(starts + durations, anchors, anchor_lags)
+    for note, start, end, duration in zip(notes, new_starts, new_ends, durations):
+        note["time"] = round(float(start), 3)
+        if duration > 0:
+            note["duration"] = round(float(end - start), 3)
+    notes.sort(key=lambda n: (n["time"], n["lane"]))
+    return add_note_index(chart)
+
+
+def residual_ms(audio_env: np.ndarray, times: np.ndarray, features: Features) -> float:
+    """Median distance (ms) from each note to the strongest audio onset within 100 ms."""
+    frame_rate = features.frame_rate
+    radius = int(round(0.1 * frame_rate))
+    frames = np.round(times * frame_rate).astype(int)
+    frames = frames[(frames >= radius) & (frames < audio_env.size - radius)]
+    if frames.size == 0:
+        return float("nan")
+    neighbourhoods = sliding_window_view(audio_env, 2 * radius + 1)[frames - radius]
+    offsets = np.argmax(neighbourhoods, axis=1) - radius
+    return float(np.median(np.abs(offsets)) / frame_rate * 1000.0)
+
+
+def analyze_chart(path: Path, features: Features) -> dict:
+    chart = json.loads(path.read_text())
+    times = np.sort(np.array([float(n["time"]) for n in chart.get("notes", [])]))
+    n_frames = features.onset_env.size
+    audio_env = features.onset_env.astype(float)
+    chart_env = chart_envelope(times, n_frames, features.frame_rate)
+    note_frames = np.round(times * features.frame_rate).astype(int)
+
+    lags = window_lags(audio_env, chart_env, note_frames, features.frame_rate)
+    anchors, anchor_lags = fit_warp(lags)
+    corrected = apply_warp(times, anchors, anchor_lags)
+
+    drift_ppm = 0.0
+    if anchors.size >= 2:
+        drift_ppm = float(np.polyfit(anchors, anchor_lags, 1)[0] * 1e6)
+
+    return {
+        "chart": path.name,
+        "notes": int(times.size),
+        "windows": int(lags.centers.size),
+        "confidentWindows": int(np.count_nonzero(confident_windows(lags))),
+        "globalOffset": round(float(np.median(anchor_lags)), 4),
+        "driftRange": round(float(anchor_lags.max() - anchor_lags.min()), 4),
+        "driftPpm": round(drift_ppm, 1),
+        "medianErrorMsBefore": round(residual_ms(audio_env, times, features), 1),
+        "medianErrorMsAfter": round(residual_ms(audio_env, corrected, features), 1),
+        "warp": [[round(float(a), 3), round(float(l), 4)] for a, l in zip(anchors, anchor_lags)],
+    }
+
+
+def process_song(song: Song, difficulties: List[str] | None, apply: bool) -> dict | None:
+    charts = song.chart_paths()
+    if difficulties:
+        charts = {d: p for d, p in charts.items() if d in difficulties}
+    if not charts or not song.audio_path.exists():
+        print(f"  Skipping {song.title}: {'no charts' if not charts else 'missing audio'}")
+        return None
+
+    print(f"\nAnalyzing {song.title} ({song.audio_path.name})...")
+    features = load_features(song)
+    report = {"song": song.id, "title": song.title, "audio": song.audio_path.name, "charts": {}}
+    for difficulty, path in charts.items():
+        entry = analyze_chart(path, features)
+        report["charts"][difficulty] = entry
+        print(
+            f"  {difficulty:<8} offset {entry['globalOffset']:+.3f}s  drift {entry['driftRange'] * 1000:.0f}ms "
+            f"({entry['driftPpm']:+.0f} ppm)  error {entry['medianErrorMsBefore']}ms -> {entry['medianErrorMsAfter']}ms"
+        )
+        if apply and entry["confidentWindows"] > 0:
+            chart = json.loads(path.read_text())
+            anchors = np.array([a for a, _ in entry["warp"]])
+            anchor_lags = np.array([l for _, l in entry["warp"]])
+            write_chart(path, retime_chart(chart, anchors, anchor_lags))
+            print(f"    Re-timed {entry['notes']} notes -> {path.name}")
+        elif apply:
+            print(f"    Not re-timed: no confident windows in {path.name}")
+
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    report_path = REPORT_DIR / f"{song.id}.json"
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"  Report -> {report_path.relative_to(ROOT)}")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--song", action="append", help="song id to analyze (default: all with audio)")
+    parser.add_argument("--difficulty", action="append", help="limit to these difficulties")
+    parser.add_argument("--apply", action="store_true", help="rewrite charts with the fitted warp")
+    args = parser.parse_args()
+
+    songs = [find_song(s) for s in args.song] if args.song else ALL_SONGS
+    for song in songs:
+        process_song(song, args.difficulty, args.apply)
+
+
+if __name__ == "__main__":
+    main()
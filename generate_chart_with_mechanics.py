@@ -12,6 +12,9 @@ from librosa.onset import onset_detect
 from scipy.signal import butter, sosfilt
 import os
 
+from audio_features import HOP_LENGTH, compute_band_energy
+from hold_notes import apply_holds, detect_holds, lane_envelopes
+
 AUDIO_FILE = "Resources/track.wav"
 OUTPUT_FILE = "Resources/chart.json"
 
@@ -87,7 +90,7 @@ def generate_chart():
             })
             lane_idx = (lane_idx + 1) % 3
     
-    # Add snare notes (mostly singles, some shakes)
+    # Add snare notes (mostly singles, some shakes; holds are detected below)
     snare_step = 1
     for i, onset_time in enumerate(snare_onsets[1::snare_step]):  # Skip first
         # Occasionally make shake notes (every 6th snare)
@@ -99,18 +102,6 @@ def generate_chart():
                 "lane": lane,
                 "type": "shake"
             })
-        # Occasionally make hold notes
-        elif i % 8 == 5:
-            lane = lane_rotation[lane_idx % 3]
-            # Hold for 0.3-0.5 seconds
-            hold_duration = 0.4
-            notes.append({
-                "id": str(uuid.uuid4()),
-                "time": float(onset_time),
-                "lane": lane,
-                "type": "hold",
-                "duration": hold_duration
-            })
         else:
             lane = lane_rotation[lane_idx % 3]
             notes.append({
@@ -132,6 +123,12 @@ def generate_chart():
     final_notes = filtered_notes[:1000]
     final_notes.sort(key=lambda n: n["time"])
     
+    # Hold notes where the lane's band energy sustains after the attack
+    times = np.array([n["time"] for n in final_notes])
+    note_lanes = np.array([n["lane"] for n in final_notes])
+    envelopes = lane_envelopes(compute_band_energy(y, sr), 3)
+    apply_holds(final_notes, detect_holds(times, note_lanes, envelopes, sr / HOP_LENGTH))
+    
     # Create chart
     chart = {
         "songName": "Track 3",
@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 """
 Generate all difficulty charts for Hallelujah
+
+Each difficulty starts from its hand-tuned note_step (keep every n-th onset)
+and minimum gap; both are then calibrated against the difficulty's average and
+peak NPS target (see nps_calibration.py). Pass --hand-tuned to skip that, or
+--target DIFFICULTY=AVG/PEAK to override a target.
 """
 
-import json
+import argparse
 import uuid
 import numpy as np
 from librosa import load
+from librosa.feature import spectral_centroid
 from librosa.onset import onset_detect
 from scipy.signal import butter, sosfilt
 import sys
 
+from audio_features import HOP_LENGTH, compute_band_energy
+from chart_io import write_chart
+from hold_notes import apply_holds, detect_holds, lane_envelopes
+from lane_assignment import DROPPED, assign_lanes, lane_preferences
+from nps_calibration import add_target_argument, calibrate, nps_targets
+
 def butter_filter(data, freq_range, sr):
     """Apply butterworth filter to isolate frequency band"""
     low_freq, high_freq = freq_range
@@ -31,21 +43,13 @@ def detect_onsets(audio, sr, freq_range=None):
     onset_frames = onset_detect(y=audio, sr=sr, units='time', backtrack=True)
     return onset_frames
 
-def generate_chart_for_difficulty(audio_file, bpm, lanes, difficulty_name, note_step):
-    """Generate a single chart for specific difficulty"""
-    
-    print(f"\nGenerating {difficulty_name} chart...")
-    y, sr = load(audio_file, sr=None)
-    duration = len(y) / sr
-    
-    # Detect bass (20-150 Hz) and snare/hi-hat (2000-8000 Hz)
-    bass_onsets = detect_onsets(y, sr, freq_range=(20, 150))
-    snare_onsets = detect_onsets(y, sr, freq_range=(2000, 8000))
-    
-    # Create notes
+def default_min_gap(difficulty_name):
+    return 0.15 if difficulty_name == "extreme" else 0.2
+
+def select_notes(bass_onsets, snare_onsets, lanes, difficulty_name, note_step, min_gap):
+    """Thin the band onsets to every note_step-th and drop notes closer than min_gap"""
+    # Create notes (lanes are assigned below, once the note set is final)
     notes = []
-    lane_rotation = list(range(lanes))
-    lane_idx = 0
     
     # Add bass notes (mostly taps)
     for i, onset_time in enumerate(bass_onsets[::note_step]):
@@ -53,71 +57,82 @@ def generate_chart_for_difficulty(audio_file, bpm, lanes, difficulty_name, note_
             continue
         
         # Every 4th bass note becomes a double-tap
-        if i % 4 == 0 and lanes > 1:
-            for j in range(min(2, lanes)):
-                lane = lane_rotation[(lane_idx + j) % lanes]
-                notes.append({
-                    "id": str(uuid.uuid4()),
-                    "time": float(onset_time),
-                    "lane": lane,
-                    "type": "tap"
-                })
-            lane_idx = (lane_idx + 2) % lanes
-        else:
-            lane = lane_rotation[lane_idx % lanes]
+        count = min(2, lanes) if i % 4 == 0 and lanes > 1 else 1
+        for _ in range(count):
             notes.append({
                 "id": str(uuid.uuid4()),
                 "time": float(onset_time),
-                "lane": lane,
+                "lane": 0,
                 "type": "tap"
             })
-            lane_idx = (lane_idx + 1) % lanes
     
-    # Add snare notes (mix of taps, shakes, holds)
+    # Add snare notes (mix of taps and shakes; holds are detected below)
     for i, onset_time in enumerate(snare_onsets[::note_step]):
         if onset_time < 0.5:
             continue
-            
-        lane = lane_rotation[lane_idx % lanes]
         
         # Vary note types for harder difficulties
-        if difficulty_name == "extreme" and i % 5 == 3:
-            # Shake notes
-            notes.append({
-                "id": str(uuid.uuid4()),
-                "time": float(onset_time),
-                "lane": lane,
-                "type": "shake"
-            })
-        elif difficulty_name in ["hard", "extreme"] and i % 7 == 5:
-            # Hold notes
-            notes.append({
-                "id": str(uuid.uuid4()),
-                "time": float(onset_time),
-                "lane": lane,
-                "type": "hold",
-                "duration": 0.4
-            })
-        else:
-            # Regular tap
-            notes.append({
-                "id": str(uuid.uuid4()),
-                "time": float(onset_time),
-                "lane": lane,
-                "type": "tap"
-            })
-        
-        lane_idx = (lane_idx + 1) % lanes
+        note_type = "shake" if difficulty_name == "extreme" and i % 5 == 3 else "tap"
+        notes.append({
+            "id": str(uuid.uuid4()),
+            "time": float(onset_time),
+            "lane": 0,
+            "type": note_type
+        })
     
     # Filter notes too close together
     filtered_notes = []
-    min_gap = 0.15 if difficulty_name == "extreme" else 0.2
     for note in sorted(notes, key=lambda n: n["time"]):
         if filtered_notes and abs(note["time"] - filtered_notes[-1]["time"]) < min_gap:
             continue
         filtered_notes.append(note)
     
     filtered_notes.sort(key=lambda n: n["time"])
+    return filtered_notes
+
+def calibrate_knobs(bass_onsets, snare_onsets, lanes, difficulty_name, note_step, min_gap, target):
+    """note_step and min_gap whose notes best meet the NPS target"""
+    def build(step_offset, gap_scale):
+        notes = select_notes(bass_onsets, snare_onsets, lanes, difficulty_name,
+                             max(1, note_step + step_offset), min_gap * gap_scale)
+        return [n["time"] for n in notes]
+
+    calibration = calibrate(build, target, range(1 - note_step, 9))
+    print(f"  Calibrated: {calibration.describe(target)}")
+    return max(1, note_step + calibration.step_offset), round(min_gap * calibration.gap_scale, 4)
+
+def generate_chart_for_difficulty(audio_file, bpm, lanes, difficulty_name, note_step, target=None):
+    """Generate a single chart for specific difficulty (calibrated to target when given)"""
+    
+    print(f"\nGenerating {difficulty_name} chart...")
+    y, sr = load(audio_file, sr=None)
+    duration = len(y) / sr
+    
+    # Detect bass (20-150 Hz) and snare/hi-hat (2000-8000 Hz)
+    bass_onsets = detect_onsets(y, sr, freq_range=(20, 150))
+    snare_onsets = detect_onsets(y, sr, freq_range=(2000, 8000))
+    
+    min_gap = default_min_gap(difficulty_name)
+    if target is not None:
+        note_step, min_gap = calibrate_knobs(bass_onsets, snare_onsets, lanes, difficulty_name, note_step, min_gap, target)
+        print(f"  note_step {note_step}, min_gap {min_gap:g}")
+    filtered_notes = select_notes(bass_onsets, snare_onsets, lanes, difficulty_name, note_step, min_gap)
+    
+    # Lanes follow the spectral centroid, with a DP pass that avoids jacks and big jumps
+    times = np.array([n["time"] for n in filtered_notes])
+    centroid = spectral_centroid(y=y, sr=sr, hop_length=HOP_LENGTH)[0]
+    frames = np.minimum(np.round(times * sr / HOP_LENGTH).astype(int), centroid.size - 1)
+    lane_choice = assign_lanes(times, lane_preferences(centroid[frames], lanes), lanes)
+    for note, lane in zip(filtered_notes, lane_choice):
+        note["lane"] = int(lane)
+    filtered_notes = [n for n in filtered_notes if n["lane"] != DROPPED]
+    times = times[lane_choice != DROPPED]
+    
+    # Hold notes where the lane's band energy actually sustains (hard/extreme only)
+    if difficulty_name in ["hard", "extreme"]:
+        note_lanes = np.array([n["lane"] for n in filtered_notes])
+        envelopes = lane_envelopes(compute_band_energy(y, sr), lanes)
+        apply_holds(filtered_notes, detect_holds(times, note_lanes, envelopes, sr / HOP_LENGTH))
     
     # Create chart
     chart = {
@@ -129,10 +144,9 @@ def generate_chart_for_difficulty(audio_file, bpm, lanes, difficulty_name, note_
         "notes": filtered_notes
     }
     
-    # Write to file
+    # Write to file (stamped with the trim of the normalized audio)
     output_file = f"Resources/hallelujah_{difficulty_name}.json"
-    with open(output_file, 'w') as f:
-        json.dump(chart, f, indent=2)
+    write_chart(output_file, chart, "hallelujah")
     
     # Print statistics
     tap_count = sum(1 for n in filtered_notes if n.get("type") == "tap")
@@ -147,6 +161,12 @@ def generate_chart_for_difficulty(audio_file, bpm, lanes, difficulty_name, note_
     return len(filtered_notes)
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate the Hallelujah charts.")
+    parser.add_argument("--hand-tuned", action="store_true", help="use note_step 5/3/2/1 as written, without NPS calibration")
+    add_target_argument(parser)
+    args = parser.parse_args()
+    targets = {} if args.hand_tuned else nps_targets(args.target)
+    
     audio_file = "Resources/hallelujah.wav"
     bpm = 110
     lanes = 3
@@ -157,14 +177,14 @@ def main():
     print(f"Lanes: {lanes}")
     
     # Generate all difficulties
-    # note_step controls density: higher = fewer notes
-    generate_chart_for_difficulty(audio_file, bpm, lanes, "easy", note_step=5)
-    generate_chart_for_difficulty(audio_file, bpm, lanes, "medium", note_step=3)
-    generate_chart_for_difficulty(audio_file, bpm, lanes, "hard", note_step=2)
-    generate_chart_for_difficulty(audio_file, bpm, lanes, "extreme", note_step=1)
+    # note_step controls density: higher = fewer notes (the calibration's starting point)
+    generate_chart_for_difficulty(audio_file, bpm, lanes, "easy", note_step=5, target=targets.get("easy"))
+    generate_chart_for_difficulty(audio_file, bpm, lanes, "medium", note_step=3, target=targets.get("medium"))
+    generate_chart_for_difficulty(audio_file, bpm, lanes, "hard", note_step=2, target=targets.get("hard"))
+    generate_chart_for_difficulty(audio_file, bpm, lanes, "extreme", note_step=1, target=targets.get("extreme"))
     
     # Also update the base chart
-    generate_chart_for_difficulty(audio_file, bpm, lanes, "medium", note_step=3)
+    generate_chart_for_difficulty(audio_file, bpm, lanes, "medium", note_step=3, target=targets.get("medium"))
     import shutil
     shutil.copy("Resources/hallelujah_medium.json", "Resources/hallelujah.json")
     
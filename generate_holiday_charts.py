@@ -1,36 +1,126 @@
 #!/usr/bin/env python3
-"""Generate Holiday charts for all difficulties using frequency-band onsets."""
+"""Generate Holiday charts for all difficulties using frequency-band onsets.
+
+Each difficulty's profile picks the bands and their lanes; its thinning steps
+and minimum gaps are then calibrated against the difficulty's average and peak
+NPS target (see nps_calibration.py; --target DIFFICULTY=AVG/PEAK overrides
+one). Pass --hand-tuned to use the profile values as written.
+
+Band onsets come from band-pass filtered audio, or with --hpss from the band's
+frequency range in its harmonic/percussive component (see hpss.py), so cymbals
+no longer leak into guitar layers nor vocals into the snare.
+
+Notes are spread by the song's sections (see song_sections.py): quiet intros
+and breakdowns keep fewer of their notes than the loudest choruses, and the
+calibration then meets the NPS target with that shape. Pass --uniform-density
+to treat the song as one stream. The sections are written into every chart.
+"""
 
 from __future__ import annotations
 
-import json
+import argparse
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 import librosa
 import numpy as np
 from scipy.signal import butter, sosfilt
 
+from chart_io import add_note_index, write_chart
+from hpss import Stems, load_stems
+from nps_calibration import Calibration, NpsTarget, add_target_argument, calibrate, nps_targets
+from song_registry import find_song
+from song_sections import Section, segment, thin_to_sections
+from tempo_map import TempoMap, extract_tempo_map, quantize as snap_to_grid
+
 ROOT = Path(__file__).resolve().parent
 RESOURCES = ROOT / "Resources"
+AUDIO_NAME = "Green Day - Holiday [Official Music Video]"
+HOLIDAY_ID = "green_day_holiday"
+START_BPM = 146.0
+SNAP_TOLERANCE = 0.12
 
 
 @dataclass(frozen=True)
 class Band:
     name: str
     freq: Tuple[float, float]
+    component: str    # HPSS component the band's instrument lives in
 
 
 BANDS = {
-    "kick": Band("kick", (20.0, 120.0)),
-    "snare": Band("snare", (1500.0, 5000.0)),
-    "hats": Band("hats", (6000.0, 12000.0)),
-    "rhythm": Band("rhythm", (200.0, 1200.0)),
-    "bass": Band("bass", (60.0, 250.0)),
-    "fills": Band("fills", (800.0, 2500.0)),
-    "lead": Band("lead", (1200.0, 3800.0)),
+    "kick": Band("kick", (20.0, 120.0), "percussive"),
+    "snare": Band("snare", (1500.0, 5000.0), "percussive"),
+    "hats": Band("hats", (6000.0, 12000.0), "percussive"),
+    "rhythm": Band("rhythm", (200.0, 1200.0), "harmonic"),
+    "bass": Band("bass", (60.0, 250.0), "harmonic"),
+    "fills": Band("fills", (800.0, 2500.0), "percussive"),
+    "lead": Band("lead", (1200.0, 3800.0), "harmonic"),
+}
+
+
+@dataclass(frozen=True)
+class Layer:
+    """Onsets of one band, thinned to every `step`-th and placed on `lane`."""
+    band: str
+    step: int
+    lane: int
+    min_gap: float
+    alternate_lanes: Tuple[int, int] | None = None
+
+
+@dataclass(frozen=True)
+class Profile:
+    layers: Tuple[Layer, ...]
+    dedupe_gap: float
+
+    @property
+    def bands(self) -> Tuple[str, ...]:
+        return tuple(sorted({layer.band for layer in self.layers}))
+
+    def scaled(self, step_offset: int, gap_scale: float) -> "Profile":
+        """Every layer thinned `step_offset` steps further and all gaps scaled."""
+        layers = tuple(
+            replace(layer, step=max(1, layer.step + step_offset), min_gap=round(layer.min_gap * gap_scale, 4))
+            for layer in self.layers
+        )
+        return Profile(layers, round(self.dedupe_gap * gap_scale, 4))
+
+
+PROFILES = {
+    # Easy: kick + snare only.
+    "easy": Profile((
+        Layer("kick", 3, 0, 0.28),
+        Layer("snare", 3, 1, 0.28),
+    ), dedupe_gap=0.26),
+    # Medium: add hats + rhythm guitar.
+    "medium": Profile((
+        Layer("kick", 3, 0, 0.24),
+        Layer("snare", 3, 1, 0.24),
+        Layer("hats", 4, 2, 0.22),
+        Layer("rhythm", 3, 3, 0.22),
+    ), dedupe_gap=0.22),
+    # Hard: add bass + fills.
+    "hard": Profile((
+        Layer("kick", 2, 0, 0.2),
+        Layer("snare", 2, 1, 0.2),
+        Layer("hats", 3, 2, 0.18),
+        Layer("rhythm", 3, 3, 0.18),
+        Layer("bass", 3, 0, 0.18),
+        Layer("fills", 2, 2, 0.18),
+    ), dedupe_gap=0.18),
+    # Extreme: lead riffs, syncopation, quick alternation.
+    "extreme": Profile((
+        Layer("kick", 2, 0, 0.16),
+        Layer("snare", 2, 1, 0.16),
+        Layer("hats", 2, 2, 0.14),
+        Layer("rhythm", 2, 3, 0.14),
+        Layer("bass", 2, 0, 0.14),
+        Layer("fills", 2, 2, 0.14),
+        Layer("lead", 2, 3, 0.14, alternate_lanes=(2, 3)),
+    ), dedupe_gap=0.14),
 }
 
 
@@ -49,42 +139,15 @@ def onset_times(y: np.ndarray, sr: int, band: Band) -> np.ndarray:
     return librosa.frames_to_time(frames, sr=sr)
 
 
-def build_grid(beat_times: np.ndarray, bpm: float, duration: float) -> np.ndarray:
-    if beat_times.size < 2:
-        beat_period = 60.0 / max(bpm, 1e-6)
-        beat_times = np.arange(0, duration + beat_period, beat_period)
-    step_times: List[float] = []
-    last_interval = None
-    for i, bt in enumerate(beat_times):
-        if i + 1 < len(beat_times):
-            next_bt = beat_times[i + 1]
-        else:
-            last_interval = beat_times[-1] - beat_times[-2] if len(beat_times) > 1 else 60.0 / max(bpm, 1e-6)
-            next_bt = bt + last_interval
-        interval = max(next_bt - bt, 1e-6)
-        subdiv = interval / 4.0
-        for k in range(4):
-            step_times.append(bt + k * subdiv)
-        last_interval = interval
-    if last_interval is None:
-        last_interval = 60.0 / max(bpm, 1e-6)
-    extend_bt = beat_times[-1] if beat_times.size else 0.0
-    while extend_bt < duration + last_interval:
-        extend_bt += last_interval
-        subdiv = last_interval / 4.0
-        for k in range(4):
-            step_times.append(extend_bt + k * subdiv)
-    return np.array(step_times, dtype=float)
+def stem_onset_times(stems: Stems, band: Band) -> np.ndarray:
+    onset_env = stems.onset_env(band.component, *band.freq)
+    frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=stems.sr, hop_length=stems.hop_length, backtrack=True)
+    return librosa.frames_to_time(frames, sr=stems.sr, hop_length=stems.hop_length)
 
 
 def quantize(times: Iterable[float], grid: np.ndarray, tolerance: float) -> List[float]:
-    snapped: List[float] = []
-    for t in times:
-        idx = int(np.argmin(np.abs(grid - t)))
-        q = float(grid[idx])
-        if abs(q - t) <= tolerance:
-            snapped.append(q)
-    return snapped
+    snapped, keep = snap_to_grid(np.fromiter(times, dtype=float), grid, tolerance)
+    return snapped[keep].tolist()
 
 
 def sample_times(times: List[float], step: int) -> List[float]:
@@ -144,71 +207,102 @@ def limit_simultaneous_notes(notes: List[dict], max_notes: int = 2) -> List[dict
     return sorted(filtered, key=lambda n: (n["time"], n["lane"]))
 
 
-def main() -> None:
-    audio_name = "Green Day - Holiday [Official Music Video]"
-    audio_path = RESOURCES / f"{audio_name}.mp3"
+def decode(audio_path: Path) -> Tuple[np.ndarray, int]:
     if not audio_path.exists():
         raise FileNotFoundError(f"Missing audio: {audio_path}")
-
     y, sr = librosa.load(audio_path.as_posix(), sr=44100)
+    return y, sr
+
+
+def analyze_tempo(y: np.ndarray, sr: int) -> Tuple[TempoMap, float]:
+    """Tempo map of the full mix and its median BPM."""
     duration = len(y) / sr
     onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    bpm_raw, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, start_bpm=146.0)
-    bpm_val = float(bpm_raw.item()) if isinstance(bpm_raw, np.ndarray) else float(bpm_raw)
-    beat_times = librosa.frames_to_time(beat_frames, sr=sr)
-    grid = build_grid(beat_times, bpm_val, duration)
+    tempo = extract_tempo_map(onset_env, sr, 512, START_BPM, duration)
+    return tempo, float(np.median(60.0 / tempo.intervals))
 
-    raw = {name: onset_times(y, sr, band) for name, band in BANDS.items()}
-    snapped = {name: quantize(times, grid, tolerance=0.12) for name, times in raw.items()}
 
-    charts = {}
+def analyze_sections(tempo: TempoMap) -> List[Section]:
+    from audio_features import load_features
 
-    # Easy: kick + snare only.
-    easy_notes: List[dict] = []
-    add_notes(easy_notes, sample_times(snapped["kick"], 3), lane=0, min_gap=0.28)
-    add_notes(easy_notes, sample_times(snapped["snare"], 3), lane=1, min_gap=0.28)
-    charts["easy"] = limit_simultaneous_notes(dedupe_notes(easy_notes, min_gap=0.26))
+    return segment(load_features(find_song(HOLIDAY_ID)), tempo.beat_times)
 
-    # Medium: add hats + rhythm guitar.
-    medium_notes: List[dict] = []
-    add_notes(medium_notes, sample_times(snapped["kick"], 3), lane=0, min_gap=0.24)
-    add_notes(medium_notes, sample_times(snapped["snare"], 3), lane=1, min_gap=0.24)
-    add_notes(medium_notes, sample_times(snapped["hats"], 4), lane=2, min_gap=0.22)
-    add_notes(medium_notes, sample_times(snapped["rhythm"], 3), lane=3, min_gap=0.22)
-    charts["medium"] = limit_simultaneous_notes(dedupe_notes(medium_notes, min_gap=0.22))
 
-    # Hard: add bass + fills.
-    hard_notes: List[dict] = []
-    add_notes(hard_notes, sample_times(snapped["kick"], 2), lane=0, min_gap=0.2)
-    add_notes(hard_notes, sample_times(snapped["snare"], 2), lane=1, min_gap=0.2)
-    add_notes(hard_notes, sample_times(snapped["hats"], 3), lane=2, min_gap=0.18)
-    add_notes(hard_notes, sample_times(snapped["rhythm"], 3), lane=3, min_gap=0.18)
-    add_notes(hard_notes, sample_times(snapped["bass"], 3), lane=0, min_gap=0.18)
-    add_notes(hard_notes, sample_times(snapped["fills"], 2), lane=2, min_gap=0.18)
-    charts["hard"] = limit_simultaneous_notes(dedupe_notes(hard_notes, min_gap=0.18))
+def build_notes(profile: Profile, snapped: Dict[str, List[float]], sections: List[Section] | None = None) -> List[dict]:
+    notes: List[dict] = []
+    for layer in profile.layers:
+        add_notes(notes, sample_times(snapped[layer.band], layer.step), lane=layer.lane,
+                  min_gap=layer.min_gap, alternate_lanes=layer.alternate_lanes)
+    notes = limit_simultaneous_notes(dedupe_notes(notes, min_gap=profile.dedupe_gap))
+    return thin_to_sections(notes, sections) if sections else notes
 
-    # Extreme: lead riffs, syncopation, quick alternation.
-    extreme_notes: List[dict] = []
-    add_notes(extreme_notes, sample_times(snapped["kick"], 2), lane=0, min_gap=0.16)
-    add_notes(extreme_notes, sample_times(snapped["snare"], 2), lane=1, min_gap=0.16)
-    add_notes(extreme_notes, sample_times(snapped["hats"], 2), lane=2, min_gap=0.14)
-    add_notes(extreme_notes, sample_times(snapped["rhythm"], 2), lane=3, min_gap=0.14)
-    add_notes(extreme_notes, sample_times(snapped["bass"], 2), lane=0, min_gap=0.14)
-    add_notes(extreme_notes, sample_times(snapped["fills"], 2), lane=2, min_gap=0.14)
-    add_notes(extreme_notes, sample_times(snapped["lead"], 2), lane=3, min_gap=0.14, alternate_lanes=(2, 3))
-    charts["extreme"] = limit_simultaneous_notes(dedupe_notes(extreme_notes, min_gap=0.14))
-
-    for difficulty, notes in charts.items():
-        chart = {
-            "songName": "Holiday",
-            "artist": "Green Day",
-            "bpm": float(round(bpm_val, 2)),
-            "offset": 0.0,
-            "lanes": 4,
-            "notes": notes,
-        }
-        output_path = RESOURCES / f"green_day_holiday_{difficulty}.json"
-        output_path.write_text(json.dumps(chart, indent=2))
+
+def calibrate_profile(
+    profile: Profile,
+    snapped: Dict[str, List[float]],
+    target: NpsTarget,
+    sections: List[Section] | None = None,
+) -> Tuple[Profile, Calibration]:
+    """Scale `profile` until its notes meet `target`."""
+    lowest = min(layer.step for layer in profile.layers)
+
+    def build(step_offset: int, gap_scale: float) -> List[float]:
+        return [n["time"] for n in build_notes(profile.scaled(step_offset, gap_scale), snapped, sections)]
+
+    calibration = calibrate(build, target, range(1 - lowest, 9))
+    return profile.scaled(calibration.step_offset, calibration.gap_scale), calibration
+
+
+def build_chart(notes: List[dict], tempo: TempoMap, bpm: float, sections: List[Section] | None = None) -> dict:
+    chart = {
+        "songName": "Holiday",
+        "artist": "Green Day",
+        "bpm": float(round(bpm, 2)),
+        "offset": 0.0,
+        "lanes": 4,
+        "tempoMap": tempo.change_points(),
+        "notes": notes,
+    }
+    if sections:
+        chart["sections"] = [section.to_json() for section in sections]
+    return add_note_index(chart)
+
+
+def chart_path(difficulty: str) -> Path:
+    return RESOURCES / f"green_day_holiday_{difficulty}.json"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the Holiday charts.")
+    parser.add_argument("--hand-tuned", action="store_true", help="use the profiles as written, without NPS calibration")
+    parser.add_argument("--hpss", action="store_true", help="take band onsets from the harmonic/percussive components")
+    parser.add_argument("--uniform-density", action="store_true", help="same density rules in every section")
+    add_target_argument(parser)
+    args = parser.parse_args()
+    targets = nps_targets(args.target)
+
+    y, sr = decode(RESOURCES / f"{AUDIO_NAME}.mp3")
+    tempo, bpm = analyze_tempo(y, sr)
+    grid = tempo.grid(len(y) / sr)
+    sections = analyze_sections(tempo)
+    print("Sections: " + " ".join(f"{s.label}@{s.start:.0f}s" for s in sections))
+    density_sections = None if args.uniform_density else sections
+
+    if args.hpss:
+        stems = load_stems(find_song(HOLIDAY_ID))
+        raw = {name: stem_onset_times(stems, band) for name, band in BANDS.items()}
+    else:
+        raw = {name: onset_times(y, sr, band) for name, band in BANDS.items()}
+    snapped = {name: quantize(times, grid, tolerance=SNAP_TOLERANCE) for name, times in raw.items()}
+
+    for difficulty, profile in PROFILES.items():
+        if not args.hand_tuned:
+            profile, calibration = calibrate_profile(profile, snapped, targets[difficulty], density_sections)
+            print(f"Calibrated {difficulty}: {calibration.describe(targets[difficulty])}")
+            print("  " + ", ".join(f"{l.band} every {l.step} gap {l.min_gap:g}" for l in profile.layers) + f", dedupe {profile.dedupe_gap:g}")
+        notes = build_notes(profile, snapped, density_sections)
+        output_path = chart_path(difficulty)
+        write_chart(output_path, build_chart(notes, tempo, bpm, sections), AUDIO_NAME)
         print(f"Wrote {difficulty}: {len(notes)} notes -> {output_path.name}")
 
 
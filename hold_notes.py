@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Energy-driven hold-note detection.
+
+A note becomes a hold when the energy in its lane's frequency band stays within
+DECAY_DB of the level reached right after the attack. Sustain lengths for every
+note in a lane come from one vectorized run-length pass over the band envelope;
+ends are snapped to the grid and clamped so holds never overlap the next note in
+the same lane.
+"""
+from __future__ import annotations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import uniform_filter1d
+
+from tempo_map import quantize
+
+DECAY_DB = 6.0
+MIN_HOLD_SECONDS = 0.5
+MAX_HOLD_SECONDS = 4.0
+# Frames after a (backtracked) onset searched for the attack peak.
+ATTACK_FRAMES = 6
+# Space left between a hold's end and the next note in the same lane.
+RELEASE_GAP_SECONDS = 0.1
+
+
+def lane_envelopes(band_energy: np.ndarray, lanes: int) -> np.ndarray:
+    """Combine feature bands (low -> high) into one dB envelope per lane."""
+    n_bands = band_energy.shape[0]
+    edges = np.round(np.linspace(0, n_bands, lanes + 1)).astype(int)
+    combined = np.add.reduceat(band_energy, edges[:-1], axis=0)
+    return 10.0 * np.log10(np.maximum(combined, 1e-10))
+
+
+def sustain_frames(env_db: np.ndarray, onset_frames: np.ndarray, decay_db: float = DECAY_DB) -> np.ndarray:
+    """Frames each onset's energy stays within `decay_db` of its attack peak.
+
+    `onset_frames` must be sorted; a sustain never runs past the next onset.
+    """
+    n = env_db.size
+    if onset_frames.size == 0:
+        return np.zeros(0, dtype=int)
+    env = uniform_filter1d(env_db, size=3, mode="nearest")
+    onset_frames = np.clip(onset_frames, 0, n - 1)
+
+    padded = np.pad(env, (0, ATTACK_FRAMES), mode="edge")
+    attack_windows = sliding_window_view(padded, ATTACK_FRAMES + 1)[onset_frames]
+    peak_frames = onset_frames + np.argmax(attack_windows, axis=1)
+    attack_level = attack_windows.max(axis=1)
+
+    # Each frame is judged against the attack level of the onset that owns it.
+    owner = np.searchsorted(onset_frames, np.arange(n), side="right") - 1
+    threshold = np.where(owner >= 0, attack_level[np.maximum(owner, 0)] - decay_db, -np.inf)
+    breaks = np.flatnonzero(env < threshold)
+
+    next_onset = np.append(onset_frames[1:], n)
+    first_break = np.searchsorted(breaks, peak_frames)
+    ends = np.where(first_break < breaks.size, breaks[np.minimum(first_break, breaks.size - 1)], n)
+    ends = np.minimum(ends, next_onset)
+    return np.maximum(ends - onset_frames, 0)
+
+
+def snap_down(times: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Largest grid point <= each time (or the time itself when before the grid)."""
+    idx = np.searchsorted(grid, times, side="right") - 1
+    return np.where(idx >= 0, grid[np.maximum(idx, 0)], times)
+
+
+def detect_holds(
+    times: np.ndarray,
+    lanes: np.ndarray,
+    envelopes_db: np.ndarray,
+    frame_rate: float,
+    grid: np.ndarray | None = None,
+    decay_db: float = DECAY_DB,
+    min_hold: float = MIN_HOLD_SECONDS,
+) -> np.ndarray:
+    """Hold duration (seconds) for each note; 0 where the note should stay a tap.
+
+    `times` are audio times (without chart offset) and `envelopes_db` is the
+    per-lane output of `lane_envelopes`.
+    """
+    times = np.asarray(times, dtype=float)
+    lanes = np.asarray(lanes, dtype=int)
+    durations = np.zeros(times.size)
+    for lane in np.unique(lanes):
+        idx = np.flatnonzero(lanes == lane)
+        idx = idx[np.argsort(times[idx], kind="stable")]
+        starts = times[idx]
+        frames = np.round(starts * frame_rate).astype(int)
+        length = sustain_frames(envelopes_db[min(lane, envelopes_db.shape[0] - 1)], frames, decay_db)
+
+        ends = starts + np.minimum(length / frame_rate, MAX_HOLD_SECONDS)
+        latest = np.append(starts[1:], np.inf) - RELEASE_GAP_SECONDS
+        if grid is not None and grid.size:
+            ends = quantize(ends, grid, tolerance=np.inf)[0]
+            latest = snap_down(np.minimum(latest, grid[-1]), grid)
+        ends = np.minimum(ends, latest)
+
+        held = ends - starts
+        durations[idx] = np.where(held >= min_hold, held, 0.0)
+    return durations
+
+
+def apply_holds(notes: list[dict], durations: np.ndarray) -> int:
+    """Turn taps with a detected sustain into holds; returns how many changed."""
+    changed = 0
+    for note, duration in zip(notes, durations):
+        if duration > 0 and note.get("type", "tap") == "tap":
+            note["type"] = "hold"
+            note["duration"] = round(float(duration), 3)
+            changed += 1
+    return changed
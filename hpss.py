@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Harmonic/percussive separation of each song, cached by the audio content hash.
+
+Median filtering the STFT magnitude along time keeps sustained partials
+(harmonic: guitars, vocals, bass lines); along frequency it keeps broadband hits
+(percussive: kicks, snares, cymbals). Soft masks then split the spectrogram
+between the two, as librosa's `decompose.hpss` does with its defaults (31-bin
+kernels, margin 1, power 2).
+
+The stage runs at reduced resolution. Audio is decoded at HPSS_SR, half the
+feature rate, with the window and hop halved too. Frames therefore fall at the
+same times as the frames of audio_features, with the same 21.5 Hz bin spacing,
+but the STFT and the median filters only cover half the bins. Content above
+HPSS_SR / 2 (11 kHz) is dropped. Each component is stored under `.cache/hpss/`
+as a mel spectrogram in dB (float16). Onset envelopes (optionally limited to a
+frequency band) and spectral centroids are derived from it on demand.
+
+Run directly to time the stage against the feature analysis of every song with
+audio; the exit status is 1 when it costs more than HPSS_BUDGET times as much.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from analysis_backend import DEFAULT_BACKEND, N_MELS, Backend, get_backend, hz_to_mel, mel_filters, mel_to_hz, power_to_db
+from audio_features import HOP_LENGTH, N_FFT, SAMPLE_RATE, compute_features, file_digest
+from lane_assignment import lane_preferences
+from song_registry import ALL_SONGS, ROOT, Song
+
+HPSS_SR = SAMPLE_RATE // 2
+HPSS_N_FFT = N_FFT // 2
+HPSS_HOP = HOP_LENGTH // 2
+HPSS_KERNEL = 31
+HPSS_VERSION = 1
+MEDIAN_BUFFER = 1 << 21
+# The stage may cost at most this multiple of the regular feature analysis.
+HPSS_BUDGET = 3.0
+CACHE_DIR = ROOT / ".cache" / "hpss"
+COMPONENTS = ("harmonic", "percussive")
+
+
+@dataclass
+class Stems:
+    sr: int
+    hop_length: int
+    duration: float
+    mel_freqs: np.ndarray
+    harmonic_db: np.ndarray
+    percussive_db: np.ndarray
+
+    @property
+    def frame_rate(self) -> float:
+        return self.sr / self.hop_length
+
+    def component_db(self, component: str) -> np.ndarray:
+        if component not in COMPONENTS:
+            raise ValueError(f"Unknown component {component!r} (choose from {', '.join(COMPONENTS)})")
+        return getattr(self, f"{component}_db").astype(np.float32)
+
+    def onset_env(self, component: str, fmin: float = 0.0, fmax: float = np.inf) -> np.ndarray:
+        """Mel spectral-flux onset envelope of one component, from the mel bands in [fmin, fmax)."""
+        db = self.component_db(component)
+        inside = (self.mel_freqs >= fmin) & (self.mel_freqs < fmax)
+        if not inside.any():    # band narrower than a mel band: use the nearest one
+            inside[np.abs(self.mel_freqs - (fmin + min(fmax, self.sr / 2.0)) / 2.0).argmin()] = True
+        flux = np.maximum(0.0, np.diff(db[inside], axis=1)).mean(axis=0)
+        # Same alignment as the full-mix envelope: one lag frame plus half a window.
+        pad = 1 + HPSS_N_FFT // (2 * self.hop_length)
+        return np.concatenate((np.zeros(pad, dtype=flux.dtype), flux))[: db.shape[1]]
+
+    def centroid(self, component: str) -> np.ndarray:
+        """Spectral centroid (Hz) of one component per frame, over the mel bands."""
+        power = 10.0 ** (self.component_db(component) / 10.0)
+        return (self.mel_freqs @ power) / np.maximum(power.sum(axis=0), 1e-10)
+
+
+def soft_mask(x: np.ndarray, y: np.ndarray, power: float = 2.0) -> np.ndarray:
+    """x^p / (x^p + y^p), with 0 where both are (near) zero."""
+    z = np.maximum(x, y)
+    silent = z < np.finfo(z.dtype).tiny
+    z = np.where(silent, 1.0, z)
+    xp, yp = (x / z) ** power, (y / z) ** power
+    return np.where(silent, 0.0, xp / np.where(silent, 1.0, xp + yp)).astype(x.dtype)
+
+
+def median_rows(x: np.ndarray, kernel: int) -> np.ndarray:
+    """Running median along the last axis with reflected edges.
+
+    Same result as `scipy.ndimage.median_filter(x, size=(1, kernel), mode="reflect")`,
+    several times faster: rows are partially sorted a few at a time, so the copy
+    `np.partition` makes of their windows stays around MEDIAN_BUFFER bytes.
+    """
+    half = kernel // 2
+    padded = np.pad(x, ((0, 0), (half, half)), mode="symmetric")
+    out = np.empty_like(x)
+    rows = max(1, MEDIAN_BUFFER // (x.shape[1] * kernel * x.itemsize))
+    for start in range(0, x.shape[0], rows):
+        windows = np.lib.stride_tricks.sliding_window_view(padded[start : start + rows], kernel, axis=1)
+        out[start : start + rows] = np.partition(windows, half, axis=-1)[..., half]
+    return out
+
+
+def separate(magnitude: np.ndarray, kernel: int = HPSS_KERNEL) -> Tuple[np.ndarray, np.ndarray]:
+    """(harmonic, percussive) magnitudes of an STFT magnitude spectrogram."""
+    harmonic = median_rows(magnitude, kernel)
+    percussive = median_rows(np.ascontiguousarray(magnitude.T), kernel).T
+    mask = soft_mask(harmonic, percussive)
+    return magnitude * mask, magnitude * (1.0 - mask)
+
+
+def mel_centers(sr: int, n_mels: int = N_MELS) -> np.ndarray:
+    edges = mel_to_hz(np.linspace(hz_to_mel(np.array([0.0]))[0], hz_to_mel(np.array([sr / 2.0]))[0], n_mels + 2))
+    return edges[1:-1]
+
+
+def compute_stems(audio_path: Path, backend: Backend | None = None) -> Stems:
+    backend = backend or get_backend()
+    y, sr = backend.load(audio_path, HPSS_SR)
+    harmonic, percussive = separate(backend.stft_magnitude(y, HPSS_N_FFT, HPSS_HOP))
+    mel = mel_filters(sr, HPSS_N_FFT)
+    return Stems(
+        sr=sr,
+        hop_length=HPSS_HOP,
+        duration=len(y) / sr,
+        mel_freqs=mel_centers(sr),
+        harmonic_db=power_to_db(mel @ harmonic**2).astype(np.float16),
+        percussive_db=power_to_db(mel @ percussive**2).astype(np.float16),
+    )
+
+
+def cache_path(audio_path: Path, digest: str, backend: str = DEFAULT_BACKEND) -> Path:
+    suffix = "" if backend == DEFAULT_BACKEND else f"-{backend}"
+    return CACHE_DIR / f"{audio_path.stem}-{digest[:16]}-v{HPSS_VERSION}{suffix}.npz"
+
+
+def load_stems(song: Song, use_cache: bool = True, backend: Backend | None = None) -> Stems:
+    """Return cached stems for `song`, separating and storing them on a miss."""
+    audio_path = song.audio_path
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Missing audio for {song.title}: {audio_path}")
+
+    backend = backend or get_backend()
+    path = cache_path(audio_path, file_digest(audio_path), backend.name)
+    if use_cache and path.exists():
+        with np.load(path) as data:
+            values = {f.name: data[f.name] for f in fields(Stems)}
+        return Stems(**{k: v.item() if v.ndim == 0 else v for k, v in values.items()})
+
+    stems = compute_stems(audio_path, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **asdict(stems))
+    return stems
+
+
+def stem_onsets(stems: Stems, backend: Backend | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Onset times detected in the percussive and the harmonic component, sorted by time.
+
+    Returns the times and whether each onset is percussive; at equal times the
+    percussive onset comes first.
+    """
+    backend = backend or get_backend()
+    times, percussive = [], []
+    for component in ("percussive", "harmonic"):
+        frames = backend.onset_detect(stems.onset_env(component), stems.sr, stems.hop_length, backtrack=True)
+        times.append(backend.frames_to_time(frames, stems.sr, stems.hop_length))
+        percussive.append(np.full(frames.size, component == "percussive"))
+    times_all, percussive_all = np.concatenate(times), np.concatenate(percussive)
+    order = np.lexsort((~percussive_all, times_all))
+    return times_all[order], percussive_all[order]
+
+
+def stem_lane_preferences(stems: Stems, times: np.ndarray, percussive: np.ndarray, lanes: int) -> np.ndarray:
+    """Lane targets from each note's own component: drums by drum brightness, melody by pitch.
+
+    Percussive and harmonic notes are ranked separately, so a bright cymbal and a
+    bright guitar lick do not compete for the same lanes.
+    """
+    frames = np.clip(np.round(np.asarray(times) * stems.frame_rate).astype(int), 0, stems.harmonic_db.shape[1] - 1)
+    targets = np.empty(frames.size, dtype=float)
+    for component, selected in (("percussive", percussive), ("harmonic", ~percussive)):
+        if selected.any():
+            targets[selected] = lane_preferences(stems.centroid(component)[frames[selected]], lanes)
+    return targets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the HPSS stage against the regular feature analysis.")
+    parser.add_argument("songs", nargs="*", help="song ids (default: every song with audio)")
+    args = parser.parse_args()
+
+    songs = [s for s in ALL_SONGS if s.audio_path.exists() and (not args.songs or s.id in args.songs)]
+    if not songs:
+        print("No songs with audio")
+        return
+    backend = get_backend()
+    over = []
+    for song in songs:
+        start = time.perf_counter()
+        compute_features(song.audio_path, backend)
+        features_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_stems(song, use_cache=False, backend=backend)
+        hpss_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_stems(song, backend=backend)
+        cached_seconds = time.perf_counter() - start
+        ratio = hpss_seconds / features_seconds
+        if ratio > HPSS_BUDGET:
+            over.append(song.id)
+        print(
+            f"  {'✓' if ratio <= HPSS_BUDGET else '✗'} {song.id:<32} features {features_seconds:5.2f} s  "
+            f"hpss {hpss_seconds:5.2f} s ({ratio:.1f}x)  cached {cached_seconds * 1000:4.0f} ms"
+        )
+    print(f"\n{'❌ Over budget: ' + ', '.join(over) if over else f'✅ Within {HPSS_BUDGET:g}x of the feature analysis'}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
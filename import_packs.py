@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""Bulk-import zipped community beatmap packs into game-format chart sets.
+
+Every archive (`.zip` packs of song folders, osu! `.osz` files, or directories of
+them) is read in place, never extracted. Members are grouped by folder and each
+folder's format is detected from its files:
+
+- Clone Hero: `notes.chart` (+ `song.ini`); the Easy/Medium/Hard/Expert guitar
+  sections map to easy/medium/hard/extreme, ticks are timed through the
+  SyncTrack tempo changes, sustains become holds.
+- Beat Saber: `Info.dat` + difficulty `.dat` files (v2 `_notes` or v3
+  `colorNotes`, with BPM changes); the Standard beatmaps are ranked and the
+  hardest four become extreme, hard, medium, easy.
+- osu!mania: `.osu` files with `Mode: 3`, ranked by note count like Beat Saber;
+  columns are folded onto the four lanes, long notes become holds.
+
+A process pool parses and converts whole archives (one archive per task); the
+main process then assigns song ids, writes the charts with `chart_io.write_chart`
+and streams each audio member from its archive straight to `Resources/` on a
+thread pool. Audio the app cannot play (ogg, opus) is streamed to
+`.cache/imports/` and run through `normalize_audio` instead, which also shifts
+the new charts by the trimmed lead-in. Imported songs are recorded in
+`imported_packs.json` (loaded by `song_registry` as PACK_SONGS), and a
+SongLibrary.swift snippet goes to reports/imported_songs.swift; a difficulty a
+pack does not chart points at the nearest one it does. Re-importing an archive
+updates its songs in place. New ids avoid every registry song's id, chart name
+and audio name and any file already in `Resources/`, and audio the importer did
+not write is never replaced.
+"""
+from __future__ import annotations
+
+import argparse
+import configparser
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from chart_io import write_chart
+from hold_notes import MAX_HOLD_SECONDS, MIN_HOLD_SECONDS
+from song_registry import DIFFICULTIES, IMPORTED_SONGS, PACK_REGISTRY, RESOURCES, ROOT, SONGS
+
+STAGING_DIR = ROOT / ".cache" / "imports"
+SWIFT_SNIPPET = ROOT / "reports" / "imported_songs.swift"
+ARCHIVE_SUFFIXES = {".zip", ".osz"}
+LANES = 4
+MAX_CHORD = 2
+PLAYABLE_AUDIO = {".mp3", ".m4a", ".wav"}
+AUDIO_SUFFIXES = PLAYABLE_AUDIO | {".ogg", ".egg", ".opus"}
+CLONE_HERO_SECTIONS = {"EasySingle": "easy", "MediumSingle": "medium", "HardSingle": "hard", "ExpertSingle": "extreme"}
+CLONE_HERO_AUDIO = ("song", "guitar")
+CHART_LINE = re.compile(r"^\s*(\d+)\s*=\s*(\w+)\s+(.*?)\s*$")
+
+Reader = Callable[[str], Optional[str]]
+
+
+@dataclass
+class ChartData:
+    bpm: float
+    tempo_map: List[List[float]]
+    notes: List[dict]
+
+
+@dataclass
+class ParsedSong:
+    """One song folder of an archive, converted but not written yet."""
+
+    source: str
+    format: str
+    title: str
+    artist: str
+    bpm: float
+    charts: Dict[str, ChartData]
+    archive: str
+    audio_member: Optional[str]
+
+
+@dataclass
+class ArchiveResult:
+    archive: str
+    songs: List[ParsedSong] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+
+# -- shared conversion helpers ----------------------------------------------------------
+
+
+def beats_to_seconds(beats: np.ndarray, change_beats: np.ndarray, change_bpms: np.ndarray) -> np.ndarray:
+    """Piecewise-constant tempo: seconds of each beat position (changes sorted by beat)."""
+    if change_beats.size == 0 or change_beats[0] > 0:
+        change_beats = np.concatenate(([0.0], change_beats))
+        change_bpms = np.concatenate(([change_bpms[0] if change_bpms.size else 120.0], change_bpms))
+    starts = np.concatenate(([0.0], np.cumsum(np.diff(change_beats) * 60.0 / change_bpms[:-1])))
+    idx = np.clip(np.searchsorted(change_beats, beats, side="right") - 1, 0, None)
+    return starts[idx] + (beats - change_beats[idx]) * 60.0 / change_bpms[idx]
+
+
+def tempo_points(change_beats: np.ndarray, change_bpms: np.ndarray) -> List[List[float]]:
+    """`[time, bpm]` change points in the format of `TempoMap.change_points`."""
+    times = beats_to_seconds(change_beats, change_beats, change_bpms)
+    points: List[List[float]] = []
+    for t, bpm in zip(times, change_bpms):
+        if not points or round(float(bpm), 2) != points[-1][1]:
+            points.append([round(float(t), 3), round(float(bpm), 2)])
+    return points
+
+
+def game_notes(times: np.ndarray, lanes: np.ndarray, durations: np.ndarray) -> List[dict]:
+    """Sorted game notes: same-lane duplicates dropped, chords capped at MAX_CHORD."""
+    keep = times >= 0
+    times, lanes, durations = np.round(times[keep], 3), lanes[keep], durations[keep]
+    order = np.lexsort((lanes, times))
+    notes: List[dict] = []
+    chord_time, chord_lanes = None, set()
+    for i in order:
+        t, lane = float(times[i]), int(lanes[i])
+        if t != chord_time:
+            chord_time, chord_lanes = t, set()
+        if lane in chord_lanes or len(chord_lanes) >= MAX_CHORD:
+            continue
+        chord_lanes.add(lane)
+        note = {"id": str(uuid.uuid4()), "time": t, "lane": lane, "type": "tap"}
+        if durations[i] >= MIN_HOLD_SECONDS:
+            note["type"] = "hold"
+            note["duration"] = round(float(min(durations[i], MAX_HOLD_SECONDS)), 3)
+        notes.append(note)
+    return notes
+
+
+def rank_to_difficulties(maps: Sequence[Tuple[float, str]]) -> Dict[str, str]:
+    """The hardest four of (rank, key) pairs become extreme, hard, medium, easy."""
+    ranked = [key for _, key in sorted(maps)][-len(DIFFICULTIES):]
+    return dict(zip(reversed(DIFFICULTIES), reversed(ranked)))
+
+
+def pick_audio(members: Iterable[str], preferred_stems: Sequence[str] = ()) -> Optional[str]:
+    audio = [m for m in members if PurePosixPath(m).suffix.lower() in AUDIO_SUFFIXES]
+    for stem in preferred_stems:
+        for member in audio:
+            if PurePosixPath(member).stem.lower() == stem:
+                return member
+    return audio[0] if audio else None
+
+
+# -- Clone Hero ---------------------------------------------------------------------------
+
+
+def chart_sections(text: str) -> Dict[str, List[str]]:
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for raw in text.splitlines():
+        line = raw.strip().lstrip("﻿")
+        if line.startswith("[") and line.endswith("]"):
+            current = sections.setdefault(line[1:-1], [])
+        elif current is not None and line not in ("{", "}"):
+            current.append(line)
+    return sections
+
+
+def song_values(lines: List[str]) -> Dict[str, str]:
+    values = {}
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key.strip().lower()] = value.strip().strip('"')
+    return values
+
+
+def read_ini(text: str) -> Dict[str, str]:
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read_string(text.lstrip("﻿"))
+    except configparser.Error:
+        return {}
+    section = next((s for s in parser.sections() if s.lower() == "song"), None)
+    return dict(parser[section]) if section else {}
+
+
+def parse_clone_hero(chart_text: str, ini_text: str) -> Tuple[str, str, str, Dict[str, ChartData]]:
+    sections = chart_sections(chart_text)
+    song = song_values(sections.get("Song", []))
+    ini = read_ini(ini_text)
+    resolution = float(song.get("resolution", 192))
+    offset = float(song.get("offset", 0) or 0) + float(ini.get("delay", 0) or 0) / 1000.0
+
+    tempo = [(int(m[1]), int(m[3].split()[0])) for m in map(CHART_LINE.match, sections.get("SyncTrack", [])) if m and m[2] == "B"]
+    tempo.sort()
+    change_beats = np.array([tick for tick, _ in tempo], dtype=float) / resolution
+    change_bpms = np.array([milli for _, milli in tempo], dtype=float) / 1000.0
+    if change_bpms.size == 0:
+        change_beats, change_bpms = np.zeros(1), np.array([120.0])
+    points = [[round(t + offset, 3), bpm] for t, bpm in tempo_points(change_beats, change_bpms)]
+
+    charts = {}
+    for section, difficulty in CLONE_HERO_SECTIONS.items():
+        ticks, frets, sustains = [], [], []
+        for match in map(CHART_LINE.match, sections.get(section, [])):
+            if not match or match[2] != "N":
+                continue
+            fret, sustain = (int(v) for v in match[3].split()[:2])
+            if fret <= 4:    # 5/6 are forcing flags, 7 is an open note
+                ticks.append(int(match[1]))
+                frets.append(fret)
+                sustains.append(sustain)
+        if not ticks:
+            continue
+        start = np.array(ticks, dtype=float) / resolution
+        end = start + np.array(sustains, dtype=float) / resolution
+        times = beats_to_seconds(start, change_beats, change_bpms) + offset
+        durations = beats_to_seconds(end, change_beats, change_bpms) + offset - times
+        lanes = np.minimum(np.array(frets), LANES - 1)
+        charts[difficulty] = ChartData(float(change_bpms[0]), points, game_notes(times, lanes, durations))
+
+    title = ini.get("name") or song.get("name") or "Unknown"
+    artist = ini.get("artist") or song.get("artist") or "Unknown"
+    return title, artist, song.get("musicstream", ""), charts
+
+
+# -- Beat Saber ---------------------------------------------------------------------------
+
+
+def beat_saber_map(data: dict, bpm: float, offset: float) -> Optional[ChartData]:
+    if "colorNotes" in data:    # v3
+        notes = [(n.get("b", 0.0), n.get("x", 0)) for n in data["colorNotes"]]
+        changes = [(e.get("b", 0.0), e.get("m", bpm)) for e in data.get("bpmEvents", [])]
+    else:    # v2; bombs are type 3
+        notes = [(n.get("_time", 0.0), n.get("_lineIndex", 0)) for n in data.get("_notes", []) if n.get("_type") != 3]
+        changes = [(e.get("_time", 0.0), e.get("_BPM", bpm)) for e in data.get("_customData", {}).get("_BPMChanges", [])]
+    if not notes:
+        return None
+    changes = sorted(c for c in changes if c[1] > 0) or [(0.0, bpm)]
+    if changes[0][0] > 0:
+        changes.insert(0, (0.0, bpm))
+    change_beats = np.array([b for b, _ in changes], dtype=float)
+    change_bpms = np.array([m for _, m in changes], dtype=float)
+    beats = np.array([b for b, _ in notes], dtype=float)
+    lanes = np.clip(np.array([x for _, x in notes], dtype=int), 0, LANES - 1)
+    times = beats_to_seconds(beats, change_beats, change_bpms) + offset
+    points = [[round(t + offset, 3), bpm] for t, bpm in tempo_points(change_beats, change_bpms)]
+    return ChartData(float(change_bpms[0]), points, game_notes(times, lanes, np.zeros(times.size)))
+
+
+def parse_beat_saber(info: dict, read: Reader) -> Tuple[str, str, str, Dict[str, ChartData]]:
+    bpm = float(info.get("_beatsPerMinute", 120.0))
+    offset = float(info.get("_songTimeOffset", 0.0) or 0.0)
+    sets = info.get("_difficultyBeatmapSets", [])
+    standard = next((s for s in sets if s.get("_beatmapCharacteristicName") == "Standard"), sets[0] if sets else {})
+    maps = {m["_beatmapFilename"]: m.get("_difficultyRank", 0) for m in standard.get("_difficultyBeatmaps", [])}
+    charts = {}
+    for difficulty, filename in rank_to_difficulties([(rank, name) for name, rank in maps.items()]).items():
+        text = read(filename)
+        chart = beat_saber_map(json.loads(text), bpm, offset) if text else None
+        if chart is not None:
+            charts[difficulty] = chart
+    title = " ".join(filter(None, (info.get("_songName"), info.get("_songSubName")))) or "Unknown"
+    return title, info.get("_songAuthorName") or "Unknown", info.get("_songFilename", ""), charts
+
+
+# -- osu!mania ----------------------------------------------------------------------------
+
+
+def osu_sections(text: str) -> Dict[str, List[str]]:
+    sections: Dict[str, List[str]] = {}
+    current: List[str] = []
+    for raw in text.splitlines():
+        line = raw.strip().lstrip("﻿")
+        if not line or line.startswith("//"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            current = sections.setdefault(line[1:-1], [])
+        else:
+            current.append(line)
+    return sections
+
+
+def parse_osu(text: str) -> Optional[Tuple[dict, ChartData]]:
+    """Header values and the converted chart of one osu!mania difficulty (None for other modes)."""
+    sections = osu_sections(text)
+    header = {}
+    for name in ("General", "Metadata", "Difficulty"):
+        header.update(song_values([line.replace(":", "=", 1) for line in sections.get(name, [])]))
+    if header.get("mode") != "3":
+        return None
+    keys = max(int(float(header.get("circlesize", 4))), 1)
+
+    change_times, change_bpms = [], []
+    for line in sections.get("TimingPoints", []):
+        parts = line.split(",")
+        uninherited = len(parts) < 7 or parts[6] == "1"
+        if len(parts) >= 2 and uninherited and float(parts[1]) > 0:
+            change_times.append(float(parts[0]) / 1000.0)
+            change_bpms.append(60000.0 / float(parts[1]))
+
+    times, lanes, durations = [], [], []
+    for line in sections.get("HitObjects", []):
+        parts = line.split(",")
+        if len(parts) < 5:
+            continue
+        column = min(int(float(parts[0]) * keys / 512), keys - 1)
+        start = float(parts[2]) / 1000.0
+        end = start
+        if int(parts[3]) & 128 and len(parts) > 5:
+            end = float(parts[5].split(":")[0]) / 1000.0
+        times.append(start)
+        lanes.append(column * LANES // keys)
+        durations.append(end - start)
+    bpm = change_bpms[0] if change_bpms else 120.0
+    points = [[round(t, 3), round(b, 2)] for t, b in zip(change_times, change_bpms)]
+    chart = ChartData(bpm, points, game_notes(np.array(times), np.array(lanes, dtype=int), np.array(durations)))
+    return header, chart
+
+
+# -- archives ---------------------------------------------------------------------------
+
+def folder_members(names: Iterable[str]) -> Dict[str, List[str]]:
+    folders: Dict[str, List[str]] = {}
+    for name in names:
+        if not name.endswith("/") and not name.startswith("__MACOSX/"):
+            folders.setdefault(str(PurePosixPath(name).parent), []).append(name)
+    return folders
+
+
+def parse_folder(zf: zipfile.ZipFile, archive: str, folder: str, members: List[str]) -> Optional[ParsedSong]:
+    by_name = {PurePosixPath(m).name.lower(): m for m in members}
+
+    def read(name: str) -> Optional[str]:
+        member = by_name.get(name.lower())
+        return zf.read(member).decode("utf-8-sig", errors="replace") if member else None
+
+    source = f"{Path(archive).name}:{folder}" if folder != "." else Path(archive).name
+    if "notes.chart" in by_name:
+        title, artist, stream, charts = parse_clone_hero(read("notes.chart"), read("song.ini") or "")
+        audio = by_name.get(stream.lower()) or pick_audio(members, CLONE_HERO_AUDIO)
+        fmt = "clonehero"
+    elif "info.dat" in by_name:
+        title, artist, song_file, charts = parse_beat_saber(json.loads(read("info.dat")), read)
+        audio = by_name.get(song_file.lower()) or pick_audio(members)
+        fmt = "beatsaber"
+    elif any(name.endswith(".osu") for name in by_name):
+        parsed = [parse_osu(read(name)) for name in by_name if name.endswith(".osu")]
+        parsed = [p for p in parsed if p is not None and p[1].notes]
+        if not parsed:
+            return None
+        # Prefer maps that use exactly the game's lane count.
+        exact = [p for p in parsed if int(float(p[0].get("circlesize", 0))) == LANES] or parsed
+        by_rank = {str(i): p for i, p in enumerate(exact)}
+        assigned = rank_to_difficulties([(len(p[1].notes), key) for key, p in by_rank.items()])
+        charts = {difficulty: by_rank[key][1] for difficulty, key in assigned.items()}
+        header = exact[0][0]
+        title = header.get("titleunicode") or header.get("title") or "Unknown"
+        artist = header.get("artistunicode") or header.get("artist") or "Unknown"
+        audio = by_name.get(header.get("audiofilename", "").lower()) or pick_audio(members)
+        fmt = "osumania"
+    else:
+        return None
+    if not charts:
+        return None
+    bpm = next(iter(charts.values())).bpm
+    return ParsedSong(source, fmt, title, artist, round(bpm, 2), charts, archive, audio)
+
+
+def parse_archive(path: Path) -> ArchiveResult:
+    """Convert every song folder of one archive (runs in a worker process)."""
+    result = ArchiveResult(str(path))
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for folder, members in sorted(folder_members(zf.namelist()).items()):
+                try:
+                    song = parse_folder(zf, str(path), folder, members)
+                except (ValueError, KeyError, IndexError, json.JSONDecodeError, zipfile.BadZipFile) as exc:
+                    result.skipped.append(f"{folder}: {exc}")
+                    continue
+                if song is not None:
+                    result.songs.append(song)
+                elif any(m.lower().endswith("notes.mid") for m in members):
+                    result.skipped.append(f"{folder}: MIDI charts (notes.mid) are not supported")
+    except (OSError, zipfile.BadZipFile) as exc:
+        result.skipped.append(f"{path.name}: {exc}")
+    return result
+
+
+def find_archives(paths: Iterable[Path]) -> List[Path]:
+    archives = []
+    for path in paths:
+        if path.is_dir():
+            archives.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in ARCHIVE_SUFFIXES))
+        else:
+            archives.append(path)
+    return archives
+
+
+# -- writing ----------------------------------------------------------------------------
+
+
+def slugify(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", ascii_text.lower()).strip("_") or "song"
+
+
+def bundled_names() -> Set[str]:
+    """Ids, chart names and audio names of the songs that ship with the app."""
+    return {name for s in SONGS + IMPORTED_SONGS for name in (s.id, s.chart_name, s.audio_name)}
+
+
+def assign_ids(songs: List[ParsedSong], registry: List[dict], resources: Path = RESOURCES) -> List[str]:
+    """Stable ids: a source keeps its id on re-import, new sources avoid every taken id.
+
+    Taken are the ids, chart names and audio names of every registry song, and any
+    name with charts (`{id}_*.json`) or audio (`{id}.*`) already in `resources`.
+    """
+    bundled = bundled_names()
+    by_source = {entry["source"]: entry["id"] for entry in registry if entry["id"] not in bundled}
+    taken = bundled | {entry.get(key, entry["id"]) for entry in registry for key in ("id", "chart_name", "audio_name")}
+    ids = []
+    for song in songs:
+        song_id = by_source.get(song.source)
+        if song_id is None:
+            base = song_id = slugify(f"{song.artist} {song.title}")
+            n = 2
+            while song_id in taken or has_files(resources, song_id):
+                song_id, n = f"{base}_{n}", n + 1
+        taken.add(song_id)
+        ids.append(song_id)
+    return ids
+
+
+def has_files(resources: Path, name: str) -> bool:
+    """Whether `resources` already holds charts or audio under `name`."""
+    return any(resources.glob(f"{glob_escape(name)}_*.json")) or any(resources.glob(f"{glob_escape(name)}.*"))
+
+
+def glob_escape(name: str) -> str:
+    return re.sub(r"([\[\]*?])", r"[\1]", name)
+
+
+def stream_member(archive: str, member: str, destination: Path, force: bool = False, owned: bool = True) -> int:
+    """Copy one archive member to `destination` without a temporary extraction.
+
+    Audio the importer did not write (`owned` false) is never replaced.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        info = zf.getinfo(member)
+        if destination.exists() and not owned:
+            raise FileExistsError(f"{destination} was not written by the importer")
+        if not force and destination.exists() and destination.stat().st_size == info.file_size:
+            return 0
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial = destination.with_name(destination.name + ".part")
+        with zf.open(info) as src, partial.open("wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(partial, destination)
+        return info.file_size
+
+
+def registry_entry(song: ParsedSong, song_id: str, audio_ext: str) -> dict:
+    return {
+        "id": song_id,
+        "title": song.title,
+        "artist": song.artist,
+        "audio_name": song_id,
+        "audio_ext": audio_ext,
+        "chart_name": song_id,
+        "lanes": LANES,
+        "bpm": song.bpm,
+        "offset": 0.0,
+        "difficulties": [d for d in DIFFICULTIES if d in song.charts],
+        "source": song.source,
+        "format": song.format,
+    }
+
+
+def chart_for(difficulty: str, available: Sequence[str]) -> str:
+    """The charted difficulty closest to `difficulty` (ties go to the easier one)."""
+    rank = DIFFICULTIES.index(difficulty)
+    return min(available, key=lambda d: (abs(DIFFICULTIES.index(d) - rank), DIFFICULTIES.index(d)))
+
+
+def swift_entry(entry: dict) -> str:
+    available = entry.get("difficulties") or DIFFICULTIES
+    charts = ",\n".join(f'                {d}: "{entry["chart_name"]}_{chart_for(d, available)}"' for d in DIFFICULTIES)
+    return f"""        SongMetadata(
+            id: {json.dumps(entry["id"])},
+            title: {json.dumps(entry["title"])},
+            artist: {json.dumps(entry["artist"])},
+            audioName: {json.dumps(entry["audio_name"])},
+            audioExtension: {json.dumps(entry["audio_ext"])},
+            chartFiles: ChartFiles(
+{charts}
+            ),
+            lanes: {entry["lanes"]},
+            bpm: {float(entry["bpm"])},
+            primaryColors: [.purple, .black],
+            accent: .purple
+        ),"""
+
+
+def write_song(song: ParsedSong, song_id: str, resources: Path) -> List[Path]:
+    paths = []
+    for difficulty, chart in song.charts.items():
+        path = resources / f"{song_id}_{difficulty}.json"
+        write_chart(path, {
+            "songName": song.title,
+            "artist": song.artist,
+            "bpm": round(chart.bpm, 2),
+            "offset": 0.0,
+            "lanes": LANES,
+            "tempoMap": chart.tempo_map,
+            "notes": chart.notes,
+        })
+        paths.append(path)
+    return paths
+
+
+def normalize_imports(jobs: List[Tuple[Path, Path, List[Path]]], workers: Optional[int] = None) -> Dict[str, str]:
+    """Transcode staged audio into the bundle format and shift its charts by the lead trim.
+
+    A track that fails to decode does not stop the others: its charts are removed
+    and `{song id: reason}` is returned so the caller can skip the song.
+    """
+    from chart_io import record_audio_trims
+    from normalize_audio import normalize_file, shift_chart
+
+    failed: Dict[str, str] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(normalize_file, staged, output) for staged, output, _ in jobs]
+        for (staged, _, charts), future in zip(jobs, futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                failed[staged.stem] = f"audio could not be normalized ({str(exc) or type(exc).__name__})"
+                for path in charts:
+                    path.unlink(missing_ok=True)
+                continue
+            record_audio_trims({staged.stem: result.lead_trim})
+            for path in charts:
+                chart = json.loads(path.read_text())
+                shift_chart(chart, result.lead_trim)
+                write_chart(path, chart)
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import zipped Clone Hero, Beat Saber and osu!mania packs.")
+    parser.add_argument("packs", nargs="+", type=Path, help="archives (.zip, .osz) or folders containing them")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--resources", type=Path, default=RESOURCES, help="where charts and audio are written")
+    parser.add_argument("--registry", type=Path, default=PACK_REGISTRY, help="pack song registry to update")
+    parser.add_argument("--force", action="store_true", help="re-copy audio that is already in place")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    archives = find_archives(args.packs)
+    print(f"📦 {len(archives)} archives")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(parse_archive, archives, chunksize=max(1, len(archives) // 64)))
+    parsed = time.perf_counter()
+
+    registry = json.loads(args.registry.read_text())["songs"] if args.registry.exists() else []
+    songs = [song for result in results for song in result.songs]
+    ids = assign_ids(songs, registry, args.resources)
+    # Only audio of songs this importer registered before may be replaced.
+    owned = {entry["id"] for entry in registry} - bundled_names()
+    entries = {entry["id"]: entry for entry in registry if entry["id"] in owned}
+    streams, staged = [], []
+    args.resources.mkdir(parents=True, exist_ok=True)
+    for song, song_id in zip(songs, ids):
+        charts = write_song(song, song_id, args.resources)
+        suffix = PurePosixPath(song.audio_member).suffix.lower() if song.audio_member else ""
+        if suffix in PLAYABLE_AUDIO:
+            streams.append((song.archive, song.audio_member, args.resources / f"{song_id}{suffix}", song_id in owned))
+            audio_ext = suffix[1:]
+        elif song.audio_member:
+            from normalize_audio import output_extension
+
+            staging = STAGING_DIR / f"{song_id}{'.ogg' if suffix == '.egg' else suffix}"
+            streams.append((song.archive, song.audio_member, staging, True))
+            staged.append((staging, args.resources / song_id, charts))
+            audio_ext = output_extension()
+        else:
+            audio_ext = "mp3"
+            print(f"  ⚠️  {song.title}: no audio in {song.source}")
+        entries[song_id] = registry_entry(song, song_id, audio_ext)
+        counts = ", ".join(f"{d} {len(song.charts[d].notes)}" for d in DIFFICULTIES if d in song.charts)
+        print(f"  ✓ {song_id} [{song.format}]: {counts}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        copied = sum(pool.map(lambda job: stream_member(*job[:3], force=args.force, owned=job[3]), streams))
+    failed: Dict[str, str] = {}
+    if staged:
+        print(f"🎚  Normalizing {len(staged)} ogg/opus tracks...")
+        failed = normalize_imports(staged, args.workers)
+        for song_id in failed:
+            entries.pop(song_id, None)
+        ids = [song_id for song_id in ids if song_id not in failed]
+
+    args.registry.write_text(json.dumps({"songs": sorted(entries.values(), key=lambda e: e["id"])}, indent=2))
+    SWIFT_SNIPPET.parent.mkdir(parents=True, exist_ok=True)
+    SWIFT_SNIPPET.write_text("\n".join(swift_entry(entries[i]) for i in ids) + "\n")
+
+    for result in results:
+        for reason in result.skipped:
+            print(f"  ✗ {Path(result.archive).name}: {reason}")
+    for song_id, reason in failed.items():
+        print(f"  ✗ {song_id}: {reason}")
+    elapsed = time.perf_counter() - start
+    print(
+        f"\n✅ {len(ids)} songs from {len(archives)} archives in {elapsed:.1f} s "
+        f"(parse {parsed - start:.1f} s, {copied / 1e6:.0f} MB audio streamed; "
+        f"{len(archives) / max(elapsed, 1e-9) * 60:.0f} archives/min)"
+    )
+    print(f"Registry -> {args.registry.name}, SongLibrary entries -> {SWIFT_SNIPPET.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""Streaming analytics over exported per-note gameplay judgements.
+
+Exports are JSONL (optionally gzipped), one judgement per line as
+`GameScene.register(judgement:for:)` sees it:
+
+    {"chart": "madchild_chainsaw_hard", "session": "…", "note": "<note id>",
+     "time": 12.345, "lane": 1, "judgement": "great", "offset": 0.071}
+
+`chart` is the chart file name (with or without `.json`), `judgement` one of
+perfect/great/good/miss and `offset` the tap time minus the note time in seconds
+(positive = late; null for a miss without a tap). `time` and `lane` are only
+needed for charts that are not in Resources/.
+
+Lines are folded into per-chart aggregates as they are read: judgement counts,
+a histogram of hit offsets (OFFSET_BIN wide, within HIT_WINDOW) and per-note
+counts. Memory therefore grows with the number of notes charted, not with the
+size of the export. Files are split into CHUNK_BYTES byte ranges aligned to
+lines, so one large export is still read by every worker; the partial
+aggregates are merged in order.
+
+The report lists, per chart:
+- notes missed far more often than the rest of the chart (at least
+  MIN_NOTE_ATTEMPTS attempts);
+- the median hit offset against the median of the other charts' medians; a
+  chart that is consistently early or late compared with the others suggests a
+  wrong offset rather than player or device latency;
+- SECTION_SECONDS sections that are both dense and missed far more than the
+  chart as a whole, with their peak NPS against the difficulty's target.
+
+`--fixture` writes a synthetic export played on real charts, with a shifted
+chart and trap notes injected; `--self-test` checks that the report finds them.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from chart_io import chart_files, difficulty_of, load_chart, note_arrays
+from nps_calibration import NPS_TARGETS, nps
+from simulate_charts import HIT_WINDOW, MISS, SECTION_SECONDS, judge
+from song_registry import RESOURCES, ROOT
+
+REPORT_PATH = ROOT / "reports" / "judgement_analytics.json"
+
+JUDGEMENTS = ("perfect", "great", "good", "miss")
+JUDGEMENT_CODES = {name: code for code, name in enumerate(JUDGEMENTS)}
+OFFSET_BIN = 0.001
+OFFSET_BINS = int(round(HIT_WINDOW / OFFSET_BIN))
+CHUNK_BYTES = 16 << 20
+
+MIN_NOTE_ATTEMPTS = 20
+HIGH_MISS_RATE = 0.3
+MISS_RATE_RATIO = 2.0      # note or section miss rate vs. the chart's
+MIN_BIAS_HITS = 200
+BIAS_THRESHOLD = 0.015     # seconds of median offset beyond the other charts'
+DENSE_NPS_RATIO = 1.5      # section NPS vs. the chart's median section
+TOP_NOTES = 10
+
+
+@dataclass
+class NoteStats:
+    counts: List[int] = field(default_factory=lambda: [0] * len(JUDGEMENTS))
+    time: Optional[float] = None
+    lane: Optional[int] = None
+
+    @property
+    def attempts(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def miss_rate(self) -> float:
+        return self.counts[MISS] / max(self.attempts, 1)
+
+
+@dataclass
+class ChartStats:
+    counts: np.ndarray = field(default_factory=lambda: np.zeros(len(JUDGEMENTS), dtype=np.int64))
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(2 * OFFSET_BINS + 1, dtype=np.int64))
+    notes: Dict[str, NoteStats] = field(default_factory=dict)
+
+    def add(self, note_id: str, code: int, offset: Optional[float], note_time: Optional[float], lane: Optional[int]) -> None:
+        self.counts[code] += 1
+        if offset is not None and abs(offset) <= HIT_WINDOW:
+            self.offsets[int(round(offset / OFFSET_BIN)) + OFFSET_BINS] += 1
+        note = self.notes.get(note_id)
+        if note is None:
+            note = self.notes[note_id] = NoteStats(time=note_time, lane=lane)
+        note.counts[code] += 1
+
+    def merge(self, other: ChartStats) -> None:
+        self.counts += other.counts
+        self.offsets += other.offsets
+        for note_id, theirs in other.notes.items():
+            mine = self.notes.get(note_id)
+            if mine is None:
+                self.notes[note_id] = theirs
+                continue
+            mine.counts = [a + b for a, b in zip(mine.counts, theirs.counts)]
+            mine.time = mine.time if mine.time is not None else theirs.time
+            mine.lane = mine.lane if mine.lane is not None else theirs.lane
+
+    @property
+    def miss_rate(self) -> float:
+        return float(self.counts[MISS] / max(self.counts.sum(), 1))
+
+
+@dataclass
+class Aggregate:
+    charts: Dict[str, ChartStats] = field(default_factory=dict)
+    lines: int = 0
+    bad_lines: int = 0
+
+    def add_line(self, line: bytes) -> None:
+        self.lines += 1
+        try:
+            record = json.loads(line)
+            code = JUDGEMENT_CODES[record["judgement"]]
+            chart = Path(record["chart"]).stem
+            note_id = str(record["note"])
+            offset = record.get("offset")
+            offset = None if offset is None else float(offset)
+            note_time = record.get("time")
+            lane = record.get("lane")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.bad_lines += 1
+            return
+        stats = self.charts.get(chart)
+        if stats is None:
+            stats = self.charts[chart] = ChartStats()
+        stats.add(note_id, code, offset, None if note_time is None else float(note_time), lane)
+
+    def merge(self, other: Aggregate) -> None:
+        self.lines += other.lines
+        self.bad_lines += other.bad_lines
+        for chart, theirs in other.charts.items():
+            if chart in self.charts:
+                self.charts[chart].merge(theirs)
+            else:
+                self.charts[chart] = theirs
+
+
+Chunk = Tuple[Path, int, int]
+
+
+def split_chunks(paths: Iterable[Path], chunk_bytes: int = CHUNK_BYTES) -> List[Chunk]:
+    """Byte ranges of each file; gzipped files cannot be split and are one chunk."""
+    chunks = []
+    for path in paths:
+        size = path.stat().st_size
+        if path.suffix == ".gz" or size <= chunk_bytes:
+            chunks.append((path, 0, size))
+        else:
+            chunks.extend((path, start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes))
+    return chunks
+
+
+def chunk_lines(chunk: Chunk) -> Iterator[bytes]:
+    """Lines that start inside the chunk's byte range."""
+    path, start, end = chunk
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+    with path.open("rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()    # the line in progress belongs to the previous chunk
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line
+
+
+def aggregate_chunk(chunk: Chunk) -> Aggregate:
+    aggregate = Aggregate()
+    for line in chunk_lines(chunk):
+        if line.strip():
+            aggregate.add_line(line)
+    return aggregate
+
+
+def aggregate_logs(paths: Iterable[Path], workers: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES) -> Aggregate:
+    chunks = split_chunks(paths, chunk_bytes)
+    total = Aggregate()
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            total.merge(aggregate_chunk(chunk))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(aggregate_chunk, chunks):
+            total.merge(part)
+    return total
+
+
+def histogram_median(histogram: np.ndarray) -> Optional[float]:
+    """Median offset (seconds) of an offset histogram; None when it is empty."""
+    total = int(histogram.sum())
+    if total == 0:
+        return None
+    index = int(np.searchsorted(np.cumsum(histogram), (total + 1) / 2))
+    return (index - OFFSET_BINS) * OFFSET_BIN
+
+
+def chart_notes(chart: str, stats: ChartStats, resources: Path) -> Dict[str, Tuple[float, int]]:
+    """(time, lane) per note id, from the chart in `resources` or else from the log."""
+    path = resources / f"{chart}.json"
+    if path.exists():
+        notes = note_arrays(load_chart(path))
+        return {note_id: (float(t), int(lane)) for note_id, t, lane in zip(notes.ids, notes.times, notes.lanes)}
+    return {
+        note_id: (note.time, note.lane if note.lane is not None else -1)
+        for note_id, note in stats.notes.items()
+        if note.time is not None
+    }
+
+
+def troublesome_notes(stats: ChartStats, placed: Dict[str, Tuple[float, int]]) -> List[dict]:
+    """Notes missed at least HIGH_MISS_RATE and MISS_RATE_RATIO times the chart's rate, worst first."""
+    threshold = max(HIGH_MISS_RATE, MISS_RATE_RATIO * stats.miss_rate)
+    flagged = [
+        (note.miss_rate, note_id, note)
+        for note_id, note in stats.notes.items()
+        if note.attempts >= MIN_NOTE_ATTEMPTS and note.miss_rate >= threshold
+    ]
+    flagged.sort(key=lambda item: (-item[0], item[1]))
+    notes = []
+    for rate, note_id, note in flagged[:TOP_NOTES]:
+        note_time, lane = placed.get(note_id, (note.time, note.lane))
+        notes.append({
+            "note": note_id,
+            "time": None if note_time is None else round(note_time, 3),
+            "lane": lane,
+            "attempts": note.attempts,
+            "missRate": round(rate, 3),
+        })
+    return notes
+
+
+def dense_sections(chart: str, stats: ChartStats, placed: Dict[str, Tuple[float, int]]) -> List[dict]:
+    """Sections much denser than the chart's median section that are also missed far more."""
+    if not placed:
+        return []
+    ids = list(placed)
+    times = np.array([placed[note_id][0] for note_id in ids])
+    sections = (times // SECTION_SECONDS).astype(int)
+    misses = np.zeros(sections.max() + 1)
+    attempts = np.zeros(sections.max() + 1)
+    for note_id, section in zip(ids, sections):
+        note = stats.notes.get(note_id)
+        if note is not None:
+            misses[section] += note.counts[MISS]
+            attempts[section] += note.attempts
+    density = np.bincount(sections, minlength=misses.size) / SECTION_SECONDS
+    median_density = float(np.median(density[density > 0]))
+    miss_rate = misses / np.maximum(attempts, 1)
+    target = NPS_TARGETS.get(difficulty_of(Path(f"{chart}.json")))
+    found = []
+    for section in np.flatnonzero(
+        (density >= DENSE_NPS_RATIO * median_density) & (miss_rate >= MISS_RATE_RATIO * stats.miss_rate) & (attempts > 0)
+    ):
+        start = section * SECTION_SECONDS
+        inside = times[sections == section]
+        peak = nps(inside)[1]
+        found.append({
+            "start": round(float(start), 2),
+            "end": round(float(start + SECTION_SECONDS), 2),
+            "nps": round(float(density[section]), 2),
+            "peakNps": peak,
+            "targetPeak": target.peak if target else None,
+            "missRate": round(float(miss_rate[section]), 3),
+        })
+    return sorted(found, key=lambda s: -s["missRate"])
+
+
+def build_report(aggregate: Aggregate, resources: Path = RESOURCES) -> dict:
+    overall = np.sum([stats.offsets for stats in aggregate.charts.values()], axis=0) if aggregate.charts else np.zeros(1)
+    global_median = histogram_median(overall)
+    medians = {chart: histogram_median(stats.offsets) for chart, stats in aggregate.charts.items()}
+    charts = []
+    for chart in sorted(aggregate.charts):
+        stats = aggregate.charts[chart]
+        placed = chart_notes(chart, stats, resources)
+        hits = int(stats.offsets.sum())
+        median = medians[chart]
+        # Compare against the typical other chart, so shared device latency is not
+        # blamed on the chart and one shifted chart does not implicate the rest.
+        others = [m for other, m in medians.items() if other != chart and m is not None]
+        bias = None if median is None or not others else median - float(np.median(others))
+        charts.append({
+            "chart": chart,
+            "judgements": int(stats.counts.sum()),
+            "counts": dict(zip(JUDGEMENTS, stats.counts.tolist())),
+            "missRate": round(stats.miss_rate, 3),
+            "medianOffset": None if median is None else round(median, 3),
+            "relativeBias": None if bias is None else round(bias, 3),
+            "suspectOffset": bias is not None and hits >= MIN_BIAS_HITS and abs(bias) >= BIAS_THRESHOLD,
+            "troublesomeNotes": troublesome_notes(stats, placed),
+            "denseSections": dense_sections(chart, stats, placed),
+        })
+    return {
+        "lines": aggregate.lines,
+        "badLines": aggregate.bad_lines,
+        "medianOffset": None if global_median is None else round(global_median, 3),
+        "charts": charts,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['lines']} judgements ({report['badLines']} unreadable), median offset {report['medianOffset']} s\n")
+    for chart in report["charts"]:
+        print(f"  {chart['chart']:<52} {chart['judgements']:>8} judged  miss {chart['missRate']:.1%}  median {chart['medianOffset']} s")
+        if chart["suspectOffset"]:
+            direction = "late" if chart["relativeBias"] > 0 else "early"
+            print(f"    ⚠️  hits are {abs(chart['relativeBias']) * 1000:.0f} ms {direction} against other charts: check the offset")
+        for note in chart["troublesomeNotes"]:
+            print(f"    ✗ note {note['note']} at {note['time']} s lane {note['lane']}: {note['missRate']:.0%} missed of {note['attempts']}")
+        for section in chart["denseSections"]:
+            print(
+                f"    ▲ {section['start']:.0f}-{section['end']:.0f} s: {section['nps']} NPS (peak {section['peakNps']:g}"
+                f", target {section['targetPeak']}), {section['missRate']:.0%} missed"
+            )
+
+
+# Fixture -------------------------------------------------------------------
+
+FIXTURE_BIAS = 0.045
+FIXTURE_TRAPS = 5
+FIXTURE_TRAP_MISS = 0.6
+
+
+@dataclass
+class Fixture:
+    paths: List[Path]
+    shifted_chart: str
+    traps: Dict[str, List[str]]
+
+
+def write_fixture(directory: Path, plays: int = 40, seed: int = 0, charts: Optional[List[Path]] = None) -> Fixture:
+    """Synthetic exports of `plays` sessions per chart, split over a plain and a gzipped file.
+
+    Players have their own latency and jitter, and jitter grows with the local
+    note density. The first chart's hits are shifted by FIXTURE_BIAS and every
+    chart has FIXTURE_TRAPS notes that are missed FIXTURE_TRAP_MISS of the time.
+    """
+    rng = np.random.default_rng(seed)
+    charts = charts or [p for p in chart_files() if difficulty_of(p) in ("medium", "extreme")][:4]
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = [directory / "judgements-0.jsonl", directory / "judgements-1.jsonl.gz"]
+    traps: Dict[str, List[str]] = {}
+    with paths[0].open("w") as plain, gzip.open(paths[1], "wt") as zipped:
+        for index, chart_path in enumerate(charts):
+            chart = chart_path.stem
+            notes = note_arrays(load_chart(chart_path))
+            n = len(notes)
+            local_nps = (np.searchsorted(notes.times, notes.times + 0.5) - np.searchsorted(notes.times, notes.times - 0.5)).astype(float)
+            trap_index = rng.choice(n, size=min(FIXTURE_TRAPS, n), replace=False)
+            traps[chart] = [notes.ids[i] for i in trap_index]
+            for play in range(plays):
+                latency = rng.normal(0.01, 0.01) + (FIXTURE_BIAS if index == 0 else 0.0)
+                jitter = rng.uniform(0.02, 0.04) * (1.0 + 0.08 * np.maximum(local_nps - 4.0, 0.0))
+                offsets = rng.normal(latency, jitter)
+                codes = judge(offsets)
+                no_tap = (rng.random(n) < 0.02) | (codes == MISS)
+                trapped = np.zeros(n, dtype=bool)
+                trapped[trap_index] = rng.random(trap_index.size) < FIXTURE_TRAP_MISS
+                codes[trapped] = MISS
+                no_tap |= trapped
+                codes[no_tap] = MISS
+                out = plain if play % 2 == 0 else zipped
+                session = f"{chart}-{play}"
+                for i in range(n):
+                    out.write(json.dumps({
+                        "chart": chart,
+                        "session": session,
+                        "note": notes.ids[i],
+                        "time": round(float(notes.times[i]), 3),
+                        "lane": int(notes.lanes[i]),
+                        "judgement": JUDGEMENTS[codes[i]],
+                        "offset": None if no_tap[i] else round(float(offsets[i]), 4),
+                    }, separators=(",", ":")) + "\n")
+    return Fixture(paths, charts[0].stem, traps)
+
+
+def self_test(workers: Optional[int]) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = write_fixture(Path(tmp))
+        with fixture.paths[0].open("a") as f:
+            f.write("not json\n{\"chart\": \"x\"}\n")
+        results = []
+
+        def check(name: str, ok: bool) -> None:
+            results.append(ok)
+            print(f"  {'✓' if ok else '✗'} {name}")
+
+        start = time.perf_counter()
+        aggregate = aggregate_logs(fixture.paths, workers, chunk_bytes=1 << 20)
+        seconds = time.perf_counter() - start
+        report = build_report(aggregate)
+        print(f"    {aggregate.lines} lines in {seconds:.2f} s ({aggregate.lines / seconds:,.0f} lines/s)")
+        serial = build_report(aggregate_logs(fixture.paths, workers=1, chunk_bytes=1 << 40))
+        check("chunked parallel read matches a serial read", serial == report)
+        check("unreadable lines are counted", report["badLines"] == 2)
+
+        by_chart = {c["chart"]: c for c in report["charts"]}
+        suspects = sorted(c["chart"] for c in report["charts"] if c["suspectOffset"])
+        check(f"shifted chart flagged ({by_chart[fixture.shifted_chart]['relativeBias']} s)", suspects == [fixture.shifted_chart])
+        found = sum(
+            note["note"] in fixture.traps[chart]
+            for chart, stats in by_chart.items()
+            for note in stats["troublesomeNotes"]
+        )
+        expected = sum(len(ids) for ids in fixture.traps.values())
+        check(f"trap notes reported ({found}/{expected})", found >= 0.8 * expected)
+        check("dense sections found", any(c["denseSections"] for c in report["charts"]))
+        memory = sum(len(stats.notes) for stats in aggregate.charts.values())
+        check(f"state is per note ({memory} notes for {aggregate.lines} lines)", memory == sum(
+            len(load_chart(RESOURCES / f"{chart}.json")["notes"]) for chart in aggregate.charts
+        ))
+    print(f"\n{'✅ All checks passed' if all(results) else '❌ Some checks failed'}")
+    return all(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report missed notes, offset bias and dense sections from judgement logs.")
+    parser.add_argument("logs", nargs="*", type=Path, help="JSONL judgement exports (.jsonl or .jsonl.gz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", type=Path, default=REPORT_PATH)
+    parser.add_argument("--fixture", type=Path, metavar="DIR", help="write a synthetic export to DIR instead")
+    parser.add_argument("--plays", type=int, default=40, help="sessions per chart in the fixture")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--self-test", action="store_true", help="analyse a fixture and check the findings")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test(args.workers) else 1)
+    if args.fixture:
+        fixture = write_fixture(args.fixture, args.plays, args.seed)
+        print(f"🎯 Fixture -> {', '.join(str(p) for p in fixture.paths)}")
+        print(f"   shifted chart: {fixture.shifted_chart}; {sum(map(len, fixture.traps.values()))} trap notes")
+        return
+    if not args.logs:
+        parser.error("no judgement logs given")
+
+    start = time.perf_counter()
+    report = build_report(aggregate_logs(args.logs, args.workers))
+    print(f"📊 Read in {time.perf_counter() - start:.1f} s")
+    print_report(report)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nReport -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
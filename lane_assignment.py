@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Pattern-constrained lane assignment.
+
+- Lane preferences for every note come from one array operation: notes are ranked
+  by spectral centroid within the song, so dark sounds lean to lane 0 and bright
+  sounds to the top lane while all lanes get used.
+- Notes at the same time form a chord; chords only use lane combinations that two
+  thumbs can hit (any pair on 3 lanes, one lane per hand on 4 lanes). Notes beyond
+  MAX_CHORD_NOTES at one time get the lane DROPPED and callers leave them out.
+- A Viterbi pass over the note groups picks the lane sequence minimising pitch fit
+  + jack penalty + hand-travel penalty. Cost is O(notes * states^2) with at most
+  8 states, i.e. linear in the chart length.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import combinations
+from typing import List, Tuple
+
+import numpy as np
+
+W_PITCH = 1.0
+W_JACK = 2.5
+W_TRAVEL = 1.0
+# Same-lane repeats closer than this are penalised (linearly less as the gap grows).
+JACK_WINDOW = 0.3
+# Moves at or below this gap count as full-speed hand travel.
+FAST_GAP = 0.2
+# Two thumbs (simulate_charts.MAX_FINGERS).
+MAX_CHORD_NOTES = 2
+DROPPED = -1
+
+
+def lane_preferences(centroid: np.ndarray, lanes: int) -> np.ndarray:
+    """Continuous target lane (0..lanes-1) per note from its centroid rank in the song."""
+    centroid = np.asarray(centroid, dtype=float)
+    if centroid.size < 2:
+        return np.full(centroid.shape, (lanes - 1) / 2.0)
+    ranks = np.argsort(np.argsort(centroid, kind="stable"), kind="stable")
+    # Equal-width rank bins per lane, expressed as a continuous lane position.
+    return (ranks + 0.5) / centroid.size * lanes - 0.5
+
+
+def chord_allowed(chord: Tuple[int, ...], lanes: int) -> bool:
+    if len(chord) != 2 or lanes != 4:
+        return True
+    # Four lanes are played as two per thumb: a pair needs one lane from each side.
+    return (chord[0] < 2) != (chord[1] < 2)
+
+
+@lru_cache(maxsize=None)
+def lane_states(lanes: int) -> Tuple[Tuple[int, ...], ...]:
+    states = []
+    for size in range(1, min(lanes, MAX_CHORD_NOTES) + 1):
+        states.extend(c for c in combinations(range(lanes), size) if chord_allowed(c, lanes))
+    return tuple(states)
+
+
+@lru_cache(maxsize=None)
+def state_tables(lanes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-state size and centre, plus shared-lane and travel-distance matrices."""
+    states = lane_states(lanes)
+    sizes = np.array([len(s) for s in states])
+    centers = np.array([np.mean(s) for s in states])
+    masks = np.array([[lane in s for lane in range(lanes)] for s in states], dtype=float)
+    overlap = masks @ masks.T
+    travel = np.maximum(np.abs(centers[:, None] - centers[None, :]) - 1.0, 0.0)
+    return sizes, centers, overlap, travel
+
+
+def assign_lanes(times: np.ndarray, targets: np.ndarray, lanes: int) -> np.ndarray:
+    """Choose a lane for every note; notes sharing a time are assigned as a chord."""
+    times = np.asarray(times, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    if times.size == 0:
+        return np.zeros(0, dtype=int)
+    if lanes <= 1:
+        return np.zeros(times.size, dtype=int)
+
+    order = np.lexsort((targets, times))
+    group_times, group_of, group_sizes = np.unique(times[order], return_inverse=True, return_counts=True)
+    group_sizes = np.minimum(group_sizes, min(lanes, MAX_CHORD_NOTES))
+    group_targets = np.bincount(group_of, weights=targets[order]) / np.bincount(group_of)
+
+    sizes, centers, overlap, travel = state_tables(lanes)
+    emission = W_PITCH * (centers[None, :] - group_targets[:, None]) ** 2
+    emission[sizes[None, :] != group_sizes[:, None]] = np.inf
+
+    gaps = np.diff(group_times)
+    jack_weight = W_JACK * np.clip(1.0 - gaps / JACK_WINDOW, 0.0, 1.0)
+    travel_weight = W_TRAVEL * np.clip(FAST_GAP / np.maximum(gaps, 1e-3), 0.0, 1.0)
+
+    # All transition costs up front; the recursion itself is one add + argmin per group.
+    transition = jack_weight[:, None, None] * overlap + travel_weight[:, None, None] * travel
+    n_groups, n_states = emission.shape
+    columns = np.arange(n_states)
+    back = np.zeros((n_groups, n_states), dtype=np.intp)
+    score = emission[0]
+    for n in range(1, n_groups):
+        candidates = transition[n - 1] + score[:, None]
+        best = candidates.argmin(axis=0)
+        back[n] = best
+        score = candidates[best, columns] + emission[n]
+
+    path = np.empty(n_groups, dtype=int)
+    path[-1] = int(np.argmin(score))
+    for n in range(n_groups - 1, 0, -1):
+        path[n - 1] = back[n, path[n]]
+
+    # Within a chord, lower-target notes take the lower lanes of the chosen state;
+    # notes beyond MAX_CHORD_NOTES (rare) are dropped.
+    states = lane_states(lanes)
+    width = min(lanes, MAX_CHORD_NOTES)
+    table = np.array([s + (DROPPED,) * (width - len(s)) for s in states])
+    rank_in_group = np.arange(order.size) - np.searchsorted(group_of, group_of)
+    result = np.empty(times.size, dtype=int)
+    result[order] = np.where(rank_in_group < width, table[path[group_of], np.minimum(rank_in_group, width - 1)], DROPPED)
+    problems = chord_problems(times, result)
+    if problems:
+        raise ValueError(f"Unplayable chords assigned: {'; '.join(problems[:3])}")
+    return result
+
+
+def chord_problems(times: np.ndarray, lanes: np.ndarray) -> List[str]:
+    """Chords (notes sharing a time, DROPPED ones excluded) with too many notes or a doubled lane."""
+    kept = np.asarray(lanes) != DROPPED
+    times, lanes = np.asarray(times, dtype=float)[kept], np.asarray(lanes)[kept]
+    problems = []
+    for t in np.unique(times):
+        chord = lanes[times == t]
+        if chord.size > MAX_CHORD_NOTES or np.unique(chord).size != chord.size:
+            problems.append(f"{chord.size} notes on lanes {sorted(chord.tolist())} at {t:.3f} s")
+    return problems
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Audio normalization stage for song assets.
+
+Every source (GarageBand WAV mixdowns, m4a, mp3 at any rate/loudness) is turned
+into a bundle-ready file:
+- resampled to TARGET_SR,
+- leading/trailing silence trimmed (the lead trim is returned so charts can be shifted),
+- integrated loudness (ITU-R BS.1770, K-weighted and gated) normalized to TARGET_LUFS,
+  with the gain capped so the sample peak stays under PEAK_CEILING_DB,
+- encoded as MP3 when libsndfile supports it (WAV otherwise).
+
+Results are cached under `.cache/normalized/` by source content hash, so unchanged
+songs are skipped; `normalize_all` runs the misses across a process pool.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from audio_features import file_digest
+from chart_io import note_index
+from song_registry import ROOT
+
+TARGET_SR = 44100
+TARGET_LUFS = -14.0
+PEAK_CEILING_DB = -1.0
+# Frames quieter than this (dBFS RMS) at either end of the track count as silence.
+SILENCE_DB = -60.0
+SILENCE_FRAME = 1024
+# Silence kept before the first sound so the attack isn't clipped.
+TRIM_PAD_SECONDS = 0.02
+NORMALIZE_VERSION = 1
+CACHE_DIR = ROOT / ".cache" / "normalized"
+
+# BS.1770 block gating.
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+@dataclass
+class NormalizeResult:
+    source: str
+    output: str
+    digest: str
+    sample_rate: int
+    duration: float
+    lead_trim: float
+    tail_trim: float
+    loudness: float
+    gain_db: float
+    cached: bool = False
+
+
+def output_extension() -> str:
+    import soundfile as sf
+
+    return "mp3" if "MP3" in sf.available_formats() else "wav"
+
+
+def k_weighting(sr: int) -> np.ndarray:
+    """BS.1770 pre-filter (high shelf + RLB high-pass) as second-order sections."""
+    # High shelf: +4 dB above ~1.5 kHz.
+    gain, q, fc = 4.0, 1.0 / np.sqrt(2.0), 1500.0
+    a = 10.0 ** (gain / 40.0)
+    w0 = 2.0 * np.pi * fc / sr
+    alpha = np.sin(w0) / (2.0 * q)
+    cos, root = np.cos(w0), 2.0 * np.sqrt(a) * alpha
+    shelf = [
+        a * ((a + 1) + (a - 1) * cos + root), -2 * a * ((a - 1) + (a + 1) * cos), a * ((a + 1) + (a - 1) * cos - root),
+        (a + 1) - (a - 1) * cos + root, 2 * ((a - 1) - (a + 1) * cos), (a + 1) - (a - 1) * cos - root,
+    ]
+    # High-pass at ~38 Hz.
+    q, fc = 0.5, 38.0
+    w0 = 2.0 * np.pi * fc / sr
+    alpha, cos = np.sin(w0) / (2.0 * q), np.cos(w0)
+    highpass = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2, 1 + alpha, -2 * cos, 1 - alpha]
+    sos = np.array([shelf, highpass], dtype=float)
+    return sos / sos[:, 3:4]
+
+
+def integrated_loudness(y: np.ndarray, sr: int) -> float:
+    """Gated integrated loudness (LUFS) of a (channels, samples) signal."""
+    from scipy.signal import sosfilt
+
+    weighted = sosfilt(k_weighting(sr), y, axis=-1)
+    block = int(BLOCK_SECONDS * sr)
+    step = int(BLOCK_STEP_SECONDS * sr)
+    if weighted.shape[-1] < block:
+        power = np.mean(weighted ** 2, axis=-1).sum()
+        return float(-0.691 + 10.0 * np.log10(max(power, 1e-12)))
+
+    # Mean square of every 400 ms block (75% overlap) from one cumulative sum.
+    cumulative = np.concatenate((np.zeros((weighted.shape[0], 1)), np.cumsum(weighted ** 2, axis=-1)), axis=-1)
+    starts = np.arange(0, weighted.shape[-1] - block + 1, step)
+    power = ((cumulative[:, starts + block] - cumulative[:, starts]) / block).sum(axis=0)
+    loudness = -0.691 + 10.0 * np.log10(np.maximum(power, 1e-12))
+
+    gated = power[loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return ABSOLUTE_GATE_LUFS
+    relative_gate = -0.691 + 10.0 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = power[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+    return float(-0.691 + 10.0 * np.log10(gated.mean()))
+
+
+def silence_bounds(y: np.ndarray, sr: int) -> Tuple[int, int]:
+    """Sample range [start, end) that holds everything louder than SILENCE_DB."""
+    n_frames = y.shape[-1] // SILENCE_FRAME
+    if n_frames == 0:
+        return 0, y.shape[-1]
+    frames = y[:, : n_frames * SILENCE_FRAME].reshape(y.shape[0], n_frames, SILENCE_FRAME)
+    rms_db = 10.0 * np.log10(np.maximum(np.mean(frames ** 2, axis=(0, 2)), 1e-12))
+    loud = np.flatnonzero(rms_db > SILENCE_DB)
+    if loud.size == 0:
+        return 0, y.shape[-1]
+    pad = int(TRIM_PAD_SECONDS * sr)
+    start = max(loud[0] * SILENCE_FRAME - pad, 0)
+    end = y.shape[-1] if loud[-1] == n_frames - 1 else min((loud[-1] + 1) * SILENCE_FRAME + pad, y.shape[-1])
+    return start, end
+
+
+def cache_entry(source: Path, digest: str) -> Tuple[Path, Path]:
+    stem = f"{source.stem}-{digest[:16]}-v{NORMALIZE_VERSION}"
+    return CACHE_DIR / f"{stem}.{output_extension()}", CACHE_DIR / f"{stem}.json"
+
+
+def normalize_file(source: Path, output: Path, use_cache: bool = True) -> NormalizeResult:
+    """Normalize one file into `output` (its suffix is replaced by the output format)."""
+    source, output = Path(source), Path(output).with_suffix(f".{output_extension()}")
+    digest = file_digest(source)
+    cached_audio, cached_meta = cache_entry(source, digest)
+    if use_cache and cached_audio.exists() and cached_meta.exists():
+        result = NormalizeResult(**json.loads(cached_meta.read_text()))
+        if not output.exists() or output.stat().st_mtime != cached_audio.stat().st_mtime:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(cached_audio, output)
+        result.output, result.cached = str(output), True
+        return result
+
+    import librosa
+    import soundfile as sf
+
+    y, sr = librosa.load(str(source), sr=TARGET_SR, mono=False)
+    y = np.atleast_2d(y)
+    total = y.shape[-1]
+    start, end = silence_bounds(y, sr)
+    y = y[:, start:end]
+
+    loudness = integrated_loudness(y, sr)
+    peak_db = 20.0 * np.log10(max(float(np.abs(y).max()), 1e-9))
+    gain_db = min(TARGET_LUFS - loudness, PEAK_CEILING_DB - peak_db)
+    y = y * 10.0 ** (gain_db / 20.0)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    sf.write(str(cached_audio), y.T, sr)
+    result = NormalizeResult(
+        source=str(source),
+        output=str(output),
+        digest=digest,
+        sample_rate=sr,
+        duration=round(y.shape[-1] / sr, 3),
+        lead_trim=round(float(start) / sr, 4),
+        tail_trim=round(float(total - end) / sr, 4),
+        loudness=round(loudness, 2),
+        gain_db=round(gain_db, 2),
+    )
+    cached_meta.write_text(json.dumps(asdict(result), indent=2))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(cached_audio, output)
+    return result
+
+
+def normalize_all(jobs: Sequence[Tuple[Path, Path]], workers: Optional[int] = None) -> List[NormalizeResult]:
+    """Normalize `(source, output)` pairs in parallel; cache hits only hash the source."""
+    if not jobs:
+        return []
+    sources, outputs = zip(*jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(normalize_file, sources, outputs))
+
+
+def shift_chart(chart: dict, lead_trim: float) -> float:
+    """Move every timed field of a chart to match audio trimmed by `lead_trim` seconds.
+
+    Notes, `tempoMap` change points and `sections` all move. Notes that would land
+    before the start of the trimmed audio are dropped rather than stacked at 0;
+    the tempo point in force at 0 moves forward by whole beats so the grid keeps
+    its phase, and the first section is cut at 0. The trim already applied is
+    stored as `audioTrim` in the chart, so running the stage again only shifts by
+    the difference; charts generated from the trimmed audio get the same stamp from
+    `chart_io.write_chart`. Returns the shift applied.
+    """
+    shift = lead_trim - float(chart.get("audioTrim", 0.0))
+    chart["audioTrim"] = round(lead_trim, 4)
+    if not shift:
+        return shift
+    notes = [dict(note, time=round(float(note["time"]) - shift, 3)) for note in chart.get("notes", [])]
+    chart["notes"] = [note for note in notes if note["time"] >= 0.0]
+    if "tempoMap" in chart:
+        chart["tempoMap"] = shift_change_points(chart["tempoMap"], shift)
+    if "sections" in chart:
+        chart["sections"] = shift_sections(chart["sections"], shift)
+    if "noteIndex" in chart:
+        chart["noteIndex"] = note_index(chart["notes"])
+    return shift
+
+
+def shift_change_points(points: List[List[float]], shift: float) -> List[List[float]]:
+    """`[time, bpm]` points moved by `shift`; the one in force at 0 is kept on its beat grid."""
+    moved = [[float(t) - shift, bpm] for t, bpm in points]
+    before = [point for point in moved if point[0] < 0.0]
+    kept = [point for point in moved if point[0] >= 0.0]
+    if before:
+        t, bpm = before[-1]
+        period = 60.0 / max(bpm, 1e-6)
+        t += np.ceil(-t / period) * period
+        if not kept or t < kept[0][0]:
+            kept.insert(0, [t, bpm])
+    return [[round(float(t), 3), bpm] for t, bpm in kept]
+
+
+def shift_sections(sections: List[dict], shift: float) -> List[dict]:
+    """Sections moved by `shift`; those entirely before 0 are dropped, the first starts at 0 at the earliest."""
+    moved = [dict(s, start=round(float(s["start"]) - shift, 3), end=round(float(s["end"]) - shift, 3)) for s in sections]
+    kept = [s for s in moved if s["end"] > 0.0]
+    if kept:
+        kept[0]["start"] = max(kept[0]["start"], 0.0)
+    return kept
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Calibrate a generator's density knobs to notes-per-second targets.
+
+A chart's density is judged by two numbers: its average NPS (notes over the span
+from the first to the last note) and its peak NPS (the most notes starting in
+any PEAK_WINDOW-second window). NPS_TARGETS holds both per difficulty.
+
+`calibrate` searches two knobs of a generator: an integer offset added to its
+thinning steps (keep every n-th onset) and a scale applied to its minimum note
+gaps. For every step offset it bisects the gap scale until the average NPS
+lands on target, then keeps the offset whose peak is closest to its target.
+The `build` callback only re-thins analysis the caller already has in memory,
+so a search step needs no re-analysis. It still builds the generator's note
+dicts in Python, so a step costs milliseconds, not microseconds: about 2 ms for
+Hallelujah's two layers and 4-16 ms for Holiday's easy to extreme profiles,
+with 25-60 steps per difficulty. `Calibration.describe` prints the measured
+cost per step.
+
+Both generators take `--target DIFFICULTY=AVG/PEAK` to override a target.
+
+Run directly to print the NPS of existing charts against the targets.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PEAK_WINDOW = 1.0
+AVERAGE_TOLERANCE = 0.1    # relative
+PEAK_TOLERANCE = 1.0       # notes per second
+GAP_SCALE_RANGE = (0.25, 8.0)
+BISECT_ITERATIONS = 20
+TARGET_SPEC = re.compile(r"(?P<difficulty>\w+)=(?P<average>[\d.]+)/(?P<peak>[\d.]+)")
+
+
+@dataclass(frozen=True)
+class NpsTarget:
+    average: float
+    peak: float
+
+
+NPS_TARGETS: Dict[str, NpsTarget] = {
+    "easy": NpsTarget(1.2, 3.0),
+    "medium": NpsTarget(2.0, 5.0),
+    "hard": NpsTarget(3.5, 7.0),
+    "extreme": NpsTarget(5.0, 9.0),
+}
+
+
+def parse_target(spec: str) -> Tuple[str, NpsTarget]:
+    """`DIFFICULTY=AVG/PEAK` from the command line, e.g. `hard=3.2/6.5`."""
+    match = TARGET_SPEC.fullmatch(spec.strip())
+    if not match or match["difficulty"].lower() not in NPS_TARGETS:
+        raise argparse.ArgumentTypeError(f"expected DIFFICULTY=AVG/PEAK with one of {', '.join(NPS_TARGETS)}, got {spec!r}")
+    return match["difficulty"].lower(), NpsTarget(float(match["average"]), float(match["peak"]))
+
+
+def add_target_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--target", action="append", type=parse_target, default=[], metavar="DIFFICULTY=AVG/PEAK",
+        help="override a difficulty's NPS target (repeatable)",
+    )
+
+
+def nps_targets(overrides: Iterable[Tuple[str, NpsTarget]] = ()) -> Dict[str, NpsTarget]:
+    """NPS_TARGETS with `(difficulty, target)` overrides applied."""
+    return {**NPS_TARGETS, **dict(overrides)}
+
+
+def on_target(average: float, peak: float, target: NpsTarget) -> bool:
+    return abs(average - target.average) / target.average <= AVERAGE_TOLERANCE and abs(peak - target.peak) <= PEAK_TOLERANCE
+
+
+@dataclass
+class Calibration:
+    """Knobs chosen by `calibrate` and the density they produce."""
+
+    step_offset: int
+    gap_scale: float
+    average: float
+    peak: float
+    evaluations: int
+    seconds: float = 0.0
+
+    def average_error(self, target: NpsTarget) -> float:
+        return abs(self.average - target.average) / target.average
+
+    def within(self, target: NpsTarget) -> bool:
+        return on_target(self.average, self.peak, target)
+
+    def describe(self, target: NpsTarget) -> str:
+        mark = "✓" if self.within(target) else "✗"
+        return (
+            f"{mark} steps {self.step_offset:+d}, gaps x{self.gap_scale:.2f} -> "
+            f"avg {self.average:.2f} (target {target.average:g}), "
+            f"peak {self.peak:g} (target {target.peak:g}), {self.evaluations} evaluations "
+            f"at {self.seconds / max(self.evaluations, 1) * 1e6:.0f} µs"
+        )
+
+
+def nps(times: Sequence[float], window: float = PEAK_WINDOW) -> Tuple[float, float]:
+    """(average, peak) notes per second of note start times."""
+    t = np.sort(np.asarray(times, dtype=float))
+    if t.size < 2 or t[-1] <= t[0]:
+        return float(t.size), float(t.size)
+    counts = np.searchsorted(t, t + window, side="left") - np.arange(t.size)
+    return float(t.size / (t[-1] - t[0])), float(counts.max() / window)
+
+
+def bisect_gap_scale(
+    measure: Callable[[float], Tuple[float, float]],
+    target: float,
+    lo: float = GAP_SCALE_RANGE[0],
+    hi: float = GAP_SCALE_RANGE[1],
+    iterations: int = BISECT_ITERATIONS,
+) -> List[Tuple[float, float, float]]:
+    """Bisect (in log space) the gap scale whose average NPS meets `target`.
+
+    Larger gaps never add notes, so the average falls as the scale grows.
+    Returns every `(scale, average, peak)` evaluated.
+    """
+    tried = [(scale, *measure(scale)) for scale in (lo, hi)]
+    if not tried[0][1] > target > tried[1][1]:
+        return tried
+    for _ in range(iterations):
+        mid = math.sqrt(lo * hi)
+        average, peak = measure(mid)
+        tried.append((mid, average, peak))
+        if abs(average - target) <= target * AVERAGE_TOLERANCE / 4:
+            break
+        lo, hi = (mid, hi) if average > target else (lo, mid)
+    return tried
+
+
+def calibrate(
+    build: Callable[[int, float], Sequence[float]],
+    target: NpsTarget,
+    step_offsets: Iterable[int],
+) -> Calibration:
+    """Pick the step offset and gap scale whose notes best meet `target`.
+
+    `build(step_offset, gap_scale)` returns the note times generated with the knobs.
+    Candidates whose average is within tolerance are ranked by peak error; if none
+    is, the smallest average error wins.
+    """
+    start = time.perf_counter()
+    evaluations = 0
+    best: Optional[Tuple[Tuple[float, ...], Calibration]] = None
+    for offset in step_offsets:
+
+        def measure(scale: float, offset: int = offset) -> Tuple[float, float]:
+            nonlocal evaluations
+            evaluations += 1
+            return nps(build(offset, scale))
+
+        for scale, average, peak in bisect_gap_scale(measure, target.average):
+            candidate = Calibration(offset, round(scale, 4), round(average, 3), peak, 0)
+            error = candidate.average_error(target)
+            rank = (0.0, abs(peak - target.peak), error) if error <= AVERAGE_TOLERANCE else (1.0, error, 0.0)
+            if best is None or rank < best[0]:
+                best = (rank, candidate)
+    if best is None:
+        raise ValueError("No step offsets to search")
+    best[1].evaluations = evaluations
+    best[1].seconds = time.perf_counter() - start
+    return best[1]
+
+
+def main() -> None:
+    from chart_io import chart_files, difficulty_of, load_chart
+    from song_registry import RESOURCES
+
+    parser = argparse.ArgumentParser(description="Report chart NPS against the per-difficulty targets.")
+    parser.add_argument("charts", nargs="*", type=Path, help="chart files (default: every chart in Resources)")
+    add_target_argument(parser)
+    args = parser.parse_args()
+
+    targets = nps_targets(args.target)
+    for path in args.charts or chart_files(RESOURCES):
+        difficulty = difficulty_of(path)
+        target = targets[difficulty]
+        average, peak = nps([n["time"] for n in load_chart(path)["notes"]])
+        print(
+            f"  {'✓' if on_target(average, peak, target) else '·'} {path.name:<55} {difficulty:<8} avg {average:5.2f} / {target.average:g}"
+            f"  peak {peak:4g} / {target.peak:g}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Device-sized, recompressed variants of the large background images.
+
+For every full-screen image in `Resources/`:
+- @2x/@3x variants are sized to cover the largest iPhone screen of that scale
+  (never upscaled; identical variants collapse into one single-scale image),
+- each variant is encoded losslessly (optimized PNG) and lossy (JPEG at the lowest
+  quality whose luma SSIM stays >= SSIM_BUDGET, or a 256-colour PNG under the same
+  budget for images with alpha), and the smallest passing encoding wins,
+- results are cached under `.cache/images/` by content hash and built in parallel.
+
+`--install` writes the variants as asset-catalog image sets named after the file,
+so `UIImage(named:)` picks them up and App Thinning ships one scale per device.
+The report lists original vs. per-device bytes for each asset.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+from scipy.ndimage import uniform_filter
+
+from audio_features import file_digest
+from song_registry import RESOURCES, ROOT
+
+CACHE_DIR = ROOT / ".cache" / "images"
+ASSET_CATALOG = RESOURCES / "Assets.xcassets"
+REPORT_PATH = ROOT / "reports" / "images.json"
+IMAGE_VERSION = 1
+
+# Largest portrait iPhone screen (points) per display scale.
+SCREEN_POINTS = {2: (414, 896), 3: (430, 932)}
+# Images smaller than this on both sides are sprites, not backgrounds.
+MIN_BACKGROUND_SIDE = 1000
+SSIM_BUDGET = 0.98
+JPEG_QUALITY_RANGE = (50, 95)
+
+
+@dataclass
+class Variant:
+    scale: int
+    filename: str
+    size: Tuple[int, int]
+    bytes: int
+    encoding: str
+    ssim: float
+
+
+@dataclass
+class ImageResult:
+    name: str
+    original_bytes: int
+    variants: List[Variant] = field(default_factory=list)
+    cached: bool = False
+
+    @property
+    def device_bytes(self) -> int:
+        """Bytes a 3x device downloads after App Thinning."""
+        return next((v.bytes for v in self.variants if v.scale in (3, 0)), self.original_bytes)
+
+
+def background_images(resources: Path = RESOURCES) -> List[Path]:
+    paths = []
+    for path in sorted(resources.iterdir()):
+        if path.suffix.lower() in (".png", ".jpg", ".jpeg"):
+            with Image.open(path) as img:
+                if max(img.size) >= MIN_BACKGROUND_SIDE and min(img.size) >= MIN_BACKGROUND_SIDE / 2:
+                    paths.append(path)
+    return paths
+
+
+def ssim(a: np.ndarray, b: np.ndarray, window: int = 8) -> float:
+    """Mean SSIM of two luma images (float arrays in 0..255)."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = uniform_filter(a, window), uniform_filter(b, window)
+    var_a = uniform_filter(a * a, window) - mu_a ** 2
+    var_b = uniform_filter(b * b, window) - mu_b ** 2
+    cov = uniform_filter(a * b, window) - mu_a * mu_b
+    num = (2 * mu_a * mu_b + c1) * (2 * cov + c2)
+    den = (mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2)
+    return float(np.mean(num / den))
+
+
+def luma(img: Image.Image) -> np.ndarray:
+    return np.asarray(img.convert("L"), dtype=np.float64)
+
+
+def encode(img: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def best_encoding(img: Image.Image) -> Tuple[bytes, str, str, float]:
+    """Smallest encoding within the quality budget -> (data, extension, label, ssim)."""
+    reference = luma(img)
+    candidates = [(encode(img, "PNG", optimize=True), "png", "png", 1.0)]
+    has_alpha = img.mode == "RGBA" and img.getchannel("A").getextrema()[0] < 255
+
+    if has_alpha:
+        quantized = img.quantize(256, method=Image.Quantize.FASTOCTREE).convert("RGBA")
+        score = ssim(reference, luma(quantized))
+        if score >= SSIM_BUDGET:
+            candidates.append((encode(quantized, "PNG", optimize=True), "png", "png8", score))
+    else:
+        rgb = img.convert("RGB")
+        lo, hi = JPEG_QUALITY_RANGE
+        best = None
+        # Lowest quality that stays within budget (SSIM grows with quality).
+        while lo <= hi:
+            quality = (lo + hi) // 2
+            data = encode(rgb, "JPEG", quality=quality, optimize=True, progressive=True)
+            score = ssim(reference, luma(Image.open(io.BytesIO(data))))
+            if score >= SSIM_BUDGET:
+                best, hi = (data, "jpg", f"jpeg q{quality}", score), quality - 1
+            else:
+                lo = quality + 1
+        if best is not None:
+            candidates.append(best)
+    return min(candidates, key=lambda c: len(c[0]))
+
+
+def variant_size(size: Tuple[int, int], scale: int) -> Tuple[int, int]:
+    """Size that covers the screen at `scale` (aspect fill), never larger than `size`."""
+    width, height = SCREEN_POINTS[scale]
+    factor = min(1.0, max(width * scale / size[0], height * scale / size[1]))
+    return max(1, round(size[0] * factor)), max(1, round(size[1] * factor))
+
+
+def variant_dir(path: Path) -> Path:
+    return CACHE_DIR / f"{path.stem}-{file_digest(path)[:16]}-v{IMAGE_VERSION}"
+
+
+def optimize_image(path: Path, use_cache: bool = True) -> ImageResult:
+    out_dir = variant_dir(path)
+    meta_path = out_dir / "result.json"
+    if use_cache and meta_path.exists():
+        data = json.loads(meta_path.read_text())
+        variants = [Variant(**{**v, "size": tuple(v["size"])}) for v in data.pop("variants")]
+        data["cached"] = True
+        return ImageResult(**data, variants=variants)
+
+    img = Image.open(path)
+    img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    sizes = {scale: variant_size(img.size, scale) for scale in sorted(SCREEN_POINTS)}
+    # One image serves every scale when the variants would be identical.
+    if len(set(sizes.values())) == 1:
+        sizes = {0: sizes[max(sizes)]}
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+    result = ImageResult(path.name, path.stat().st_size)
+    for scale, size in sizes.items():
+        variant = img if size == img.size else img.resize(size, Image.Resampling.LANCZOS)
+        data, ext, label, score = best_encoding(variant)
+        filename = f"{path.stem}.{ext}" if scale == 0 else f"{path.stem}@{scale}x.{ext}"
+        (out_dir / filename).write_bytes(data)
+        result.variants.append(Variant(scale, filename, size, len(data), label, round(score, 4)))
+    meta_path.write_text(json.dumps(asdict(result), indent=2))
+    return result
+
+
+def install(path: Path, result: ImageResult) -> Path:
+    """Write the variants as `Assets.xcassets/<stem>.imageset`."""
+    source_dir = variant_dir(path)
+    imageset = ASSET_CATALOG / f"{path.stem}.imageset"
+    if imageset.exists():
+        shutil.rmtree(imageset)
+    imageset.mkdir(parents=True)
+    images = []
+    for variant in result.variants:
+        shutil.copy2(source_dir / variant.filename, imageset / variant.filename)
+        entry: Dict[str, str] = {"filename": variant.filename, "idiom": "universal"}
+        if variant.scale:
+            entry["scale"] = f"{variant.scale}x"
+        images.append(entry)
+    contents = {"images": images, "info": {"author": "xcode", "version": 1}}
+    (imageset / "Contents.json").write_text(json.dumps(contents, indent=2).replace('": ', '" : ') + "\n")
+    return imageset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build device-sized, recompressed background image variants.")
+    parser.add_argument("images", nargs="*", type=Path, help="images to optimize (default: every background in Resources)")
+    parser.add_argument("--install", action="store_true", help="write the variants into Assets.xcassets image sets")
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = args.images or background_images()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(optimize_image, paths, [not args.force] * len(paths)))
+
+    print(f"{'asset':<56} {'original':>10} {'device':>10} {'saved':>6}  encoding")
+    total_before = total_after = 0
+    for path, result in zip(paths, results):
+        saved = 1 - result.device_bytes / result.original_bytes
+        encodings = ", ".join(f"{v.encoding} {v.size[0]}x{v.size[1]}" for v in result.variants)
+        print(f"{result.name:<56} {result.original_bytes / 1024:>8.0f}KB {result.device_bytes / 1024:>8.0f}KB {saved:>6.0%}  {encodings}")
+        total_before += result.original_bytes
+        total_after += result.device_bytes
+        if args.install:
+            install(path, result)
+    if total_before:
+        print(f"\nTotal: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB per device ({1 - total_after / total_before:.0%} smaller)")
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps([{**asdict(r), "deviceBytes": r.device_bytes} for r in results], indent=2))
+    if args.install:
+        print("Installed image sets; the loose originals can be removed once nothing loads them by path.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""Inverted index of rhythm-and-lane patterns across every chart in Resources/.
+
+Each chart becomes a sequence of events, one per note time (notes at the same
+time form a chord). Each event is one uint16 token: the interval since the
+previous event, quantized to TICKS_PER_BEAT ticks per beat at the chart's BPM
+and snapped to the nearest 16th or 16th triplet (REST_TICKS for gaps of that
+length or longer), shifted left by four bits, and
+below it the bitmask of lanes played. Four lanes fit in the mask. The first
+event of an n-gram is keyed by its lanes only, so a pattern matches wherever it
+starts.
+
+The index (`.cache/pattern_index.npz`) holds the tokens and times of all
+events, per-event jack and trill run lengths, and for each size in NGRAM_SIZES
+the sorted 64-bit hashes of every n-gram with the event where it starts. A
+pattern query is a binary search on those hashes plus a check of the matched
+tokens. Run queries ("jacks of 5+ notes at 16ths") are a vectorized filter over
+the run lengths. Both take milliseconds. The index is rebuilt whenever a chart
+in Resources/ changes.
+
+    pattern_index.py --jacks 5 --step 16th --difficulty extreme
+    pattern_index.py --trills 8 --step 16th
+    pattern_index.py --ngram "0 1 0 2" --step 8th
+    pattern_index.py --motifs 8        # most repeated 8-event motifs across songs
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from chart_io import chart_files, difficulty_of, load_chart, note_arrays
+from song_registry import DIFFICULTIES, RESOURCES, ROOT
+
+INDEX_PATH = ROOT / ".cache" / "pattern_index.npz"
+INDEX_VERSION = 1
+TICKS_PER_BEAT = 12
+REST_TICKS = 127
+# Intervals snap to the nearest 16th or 16th-triplet multiple.
+GRID_TICKS = np.array([t for t in range(REST_TICKS + 1) if t % 2 == 0 or t % 3 == 0])
+LANE_BITS = 4
+NGRAM_SIZES = (4, 8)
+HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+CHORD_TOLERANCE = 0.001
+STEPS: Dict[str, int] = {"4th": 12, "8th": 6, "8th-triplet": 4, "16th": 3, "16th-triplet": 2}
+MAX_RESULTS = 20
+
+
+def token(ticks: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    return (np.minimum(ticks, REST_TICKS).astype(np.uint16) << LANE_BITS) | masks.astype(np.uint16)
+
+
+def snap_ticks(ticks: np.ndarray) -> np.ndarray:
+    """Nearest grid interval (ticks), REST_TICKS beyond the grid."""
+    upper = np.clip(np.searchsorted(GRID_TICKS, ticks), 1, GRID_TICKS.size - 1)
+    nearest = np.where(ticks - GRID_TICKS[upper - 1] <= GRID_TICKS[upper] - ticks, GRID_TICKS[upper - 1], GRID_TICKS[upper])
+    return np.where(ticks >= REST_TICKS, REST_TICKS, nearest).astype(np.int64)
+
+
+def chart_events(chart: dict) -> tuple:
+    """(times, tokens) of a chart's events."""
+    notes = note_arrays(chart)
+    if not len(notes):
+        return np.zeros(0), np.zeros(0, dtype=np.uint16)
+    starts = np.concatenate(([True], np.diff(notes.times) > CHORD_TOLERANCE))
+    event_of = np.cumsum(starts) - 1
+    masks = np.zeros(int(event_of[-1]) + 1, dtype=np.uint16)
+    np.bitwise_or.at(masks, event_of, (1 << np.clip(notes.lanes, 0, LANE_BITS - 1)).astype(np.uint16))
+    times = notes.times[starts]
+    beats = np.diff(times) * float(chart.get("bpm") or 120.0) / 60.0
+    ticks = np.concatenate(([REST_TICKS], snap_ticks(beats * TICKS_PER_BEAT)))
+    return times, token(ticks, masks)
+
+
+def single_lane(masks: np.ndarray) -> np.ndarray:
+    return (masks != 0) & ((masks & (masks - 1)) == 0)
+
+
+def run_lengths(tokens: np.ndarray, chart_start: np.ndarray) -> tuple:
+    """Length of the jack and of the trill ending at each event (0 for chords).
+
+    A jack repeats one lane, a trill alternates between two; both keep a
+    constant interval and neither spans a rest or a chart boundary.
+    """
+    ticks = (tokens >> LANE_BITS).astype(np.int64)
+    masks = (tokens & ((1 << LANE_BITS) - 1)).astype(np.int64)
+    single = single_lane(masks)
+    first = np.zeros(tokens.size, dtype=bool)
+    first[chart_start[:-1][chart_start[:-1] < tokens.size]] = True
+    jack = np.zeros(tokens.size, dtype=np.uint16)
+    trill = np.zeros(tokens.size, dtype=np.uint16)
+    for i in range(tokens.size):
+        if not single[i]:
+            continue
+        jack[i] = trill[i] = 1
+        if first[i] or ticks[i] >= REST_TICKS or not single[i - 1]:
+            continue
+        if masks[i] == masks[i - 1] and (jack[i - 1] == 1 or ticks[i] == ticks[i - 1]):
+            jack[i] = jack[i - 1] + 1
+        if masks[i] != masks[i - 1]:
+            if trill[i - 1] == 1:
+                trill[i] = 2
+            elif ticks[i] == ticks[i - 1] and masks[i] == masks[i - 2]:
+                trill[i] = trill[i - 1] + 1
+            else:
+                trill[i] = 2
+    return jack, trill
+
+
+def ngram_keys(tokens: np.ndarray, n: int) -> np.ndarray:
+    """Polynomial hash of the n tokens starting at each event (first token: lanes only)."""
+    count = tokens.size - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    keys = (tokens[:count] & ((1 << LANE_BITS) - 1)).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        for k in range(1, n):
+            keys = keys * HASH_BASE + tokens[k : k + count].astype(np.uint64)
+    return keys
+
+
+def pattern_key(pattern: np.ndarray) -> np.uint64:
+    return ngram_keys(pattern, pattern.size)[0]
+
+
+@dataclass
+class PatternIndex:
+    charts: List[str]
+    chart_start: np.ndarray
+    times: np.ndarray
+    tokens: np.ndarray
+    jack: np.ndarray
+    trill: np.ndarray
+    keys: Dict[int, np.ndarray]
+    postings: Dict[int, np.ndarray]
+    fingerprint: str
+
+    def chart_of(self, events: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.chart_start, events, side="right") - 1
+
+    def chart_mask(self, events: np.ndarray, difficulties: Optional[Sequence[str]]) -> np.ndarray:
+        if not difficulties:
+            return np.ones(events.size, dtype=bool)
+        wanted = np.array([difficulty_of(Path(f"{c}.json")) in difficulties for c in self.charts])
+        return wanted[self.chart_of(events)]
+
+    def runs(self, kind: str, min_length: int, step: Optional[int] = None, difficulties: Optional[Sequence[str]] = None) -> np.ndarray:
+        """End events of maximal jack/trill runs of at least `min_length` notes."""
+        lengths = self.jack if kind == "jack" else self.trill
+        following = np.append(lengths[1:], 0)
+        ends = np.flatnonzero((lengths >= min_length) & (following != lengths + 1))
+        if step is not None:
+            ends = ends[(self.tokens[ends] >> LANE_BITS) == step]
+        return ends[self.chart_mask(ends, difficulties)]
+
+    def find(self, pattern: np.ndarray, difficulties: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Start events of every occurrence of the token sequence `pattern`."""
+        n = pattern.size
+        lane_mask = (1 << LANE_BITS) - 1
+        sizes = [size for size in NGRAM_SIZES if size <= n]
+        if sizes:
+            size = max(sizes)
+            keys = self.keys[size]
+            key = pattern_key(pattern[:size])
+            lo, hi = np.searchsorted(keys, key, side="left"), np.searchsorted(keys, key, side="right")
+            starts = np.sort(self.postings[size][lo:hi])
+        else:
+            starts = np.flatnonzero((self.tokens[: self.tokens.size - n + 1] & lane_mask) == (pattern[0] & lane_mask))
+        starts = starts[starts + n <= self.tokens.size]
+        # Verify every token (hash collisions, patterns longer than the n-gram) and stay inside one chart.
+        ok = (self.tokens[starts] & lane_mask) == (pattern[0] & lane_mask)
+        for k in range(1, n):
+            ok &= self.tokens[starts + k] == pattern[k]
+        starts = starts[ok]
+        starts = starts[self.chart_of(starts) == self.chart_of(starts + n - 1)]
+        return starts[self.chart_mask(starts, difficulties)]
+
+    def motifs(self, n: int, top: int) -> List[dict]:
+        """The n-grams found in the most songs (then most often), skipping ones that span a rest."""
+        keys, postings = self.keys[n], self.postings[n]
+        if keys.size == 0:
+            return []
+        bounds = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1], [True])))
+        counts = np.diff(bounds)
+        firsts = postings[bounds[:-1]]
+        spans_rest = np.zeros(counts.size, dtype=bool)
+        for k in range(1, n):
+            spans_rest |= (self.tokens[firsts + k] >> LANE_BITS) >= REST_TICKS
+        song_names = [song_of(c) for c in self.charts]
+        song_ids = np.unique(song_names, return_inverse=True)[1]
+        group_of = np.repeat(np.arange(counts.size), counts)
+        pairs = np.unique(group_of.astype(np.int64) * (song_ids.max() + 1) + song_ids[self.chart_of(postings)])
+        songs = np.bincount(pairs // (song_ids.max() + 1), minlength=counts.size)
+        found = []
+        for group in np.lexsort((-counts, -songs)):
+            if len(found) >= top or counts[group] < 2:
+                break
+            if spans_rest[group]:
+                continue
+            starts = postings[bounds[group] : bounds[group + 1]]
+            found.append({
+                "pattern": describe(self.tokens[starts[0] : starts[0] + n]),
+                "occurrences": int(counts[group]),
+                "charts": int(np.unique(self.chart_of(starts)).size),
+                "songs": int(songs[group]),
+            })
+        return found
+
+    def describe_at(self, start: int, length: int) -> dict:
+        chart = self.chart_of(np.array([start]))[0]
+        return {
+            "chart": self.charts[chart],
+            "time": round(float(self.times[start]), 3),
+            "pattern": describe(self.tokens[start : start + length]),
+        }
+
+
+def song_of(chart: str) -> str:
+    for difficulty in DIFFICULTIES:
+        for suffix in (f"_{difficulty}", f"_{difficulty} 2"):
+            if chart.endswith(suffix):
+                return chart[: -len(suffix)]
+    return chart
+
+
+def lanes_of(mask: int) -> str:
+    return "".join(str(lane) for lane in range(LANE_BITS) if mask & (1 << lane))
+
+
+def describe(tokens: np.ndarray) -> str:
+    """Lanes of each event, with the interval before it when it changes (e.g. `0 1 /16th 0 2`)."""
+    names = {ticks: name for name, ticks in STEPS.items()}
+    parts, previous = [], None
+    for i, value in enumerate(tokens.tolist()):
+        ticks = value >> LANE_BITS
+        if i > 0 and ticks != previous:
+            parts.append(f"/{names.get(ticks, f'{ticks / TICKS_PER_BEAT:g}b')}")
+            previous = ticks
+        parts.append(lanes_of(value & ((1 << LANE_BITS) - 1)))
+    return " ".join(parts)
+
+
+def resources_fingerprint(resources: Path = RESOURCES) -> str:
+    stats = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in sorted(resources.glob("*.json"))]
+    return json.dumps([INDEX_VERSION, stats])
+
+
+def build_index(resources: Path = RESOURCES) -> PatternIndex:
+    names, times, tokens, starts = [], [], [], [0]
+    for path in chart_files(resources):
+        chart_times, chart_tokens = chart_events(load_chart(path))
+        names.append(path.stem)
+        times.append(chart_times)
+        tokens.append(chart_tokens)
+        starts.append(starts[-1] + chart_tokens.size)
+    all_tokens = np.concatenate(tokens) if tokens else np.zeros(0, dtype=np.uint16)
+    chart_start = np.array(starts, dtype=np.int32)
+    jack, trill = run_lengths(all_tokens, chart_start)
+    keys, postings = {}, {}
+    for n in NGRAM_SIZES:
+        # N-grams must not cross into the next chart.
+        valid = np.concatenate([np.arange(a, b - n + 1) for a, b in zip(starts[:-1], starts[1:]) if b - a >= n] or [np.zeros(0, dtype=int)])
+        hashes = ngram_keys(all_tokens, n)[valid]
+        order = np.argsort(hashes, kind="stable")
+        keys[n], postings[n] = hashes[order], valid[order].astype(np.int32)
+    return PatternIndex(
+        names, chart_start, np.concatenate(times).astype(np.float32) if times else np.zeros(0, dtype=np.float32),
+        all_tokens, jack, trill, keys, postings, resources_fingerprint(resources),
+    )
+
+
+def save_index(index: PatternIndex, path: Path = INDEX_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {f"keys{n}": index.keys[n] for n in NGRAM_SIZES}
+    arrays.update({f"postings{n}": index.postings[n] for n in NGRAM_SIZES})
+    np.savez_compressed(
+        path, charts=np.array(index.charts), chart_start=index.chart_start, times=index.times, tokens=index.tokens,
+        jack=index.jack, trill=index.trill, fingerprint=np.array(index.fingerprint), **arrays,
+    )
+
+
+def load_index(path: Path = INDEX_PATH, resources: Path = RESOURCES, rebuild: bool = False) -> PatternIndex:
+    """The stored index, rebuilt first when a chart changed since it was written."""
+    fingerprint = resources_fingerprint(resources)
+    if not rebuild and path.exists():
+        with np.load(path) as data:
+            if str(data["fingerprint"]) == fingerprint:
+                return PatternIndex(
+                    [str(c) for c in data["charts"]], data["chart_start"], data["times"], data["tokens"],
+                    data["jack"], data["trill"],
+                    {n: data[f"keys{n}"] for n in NGRAM_SIZES}, {n: data[f"postings{n}"] for n in NGRAM_SIZES},
+                    fingerprint,
+                )
+    index = build_index(resources)
+    save_index(index, path)
+    return index
+
+
+def parse_pattern(text: str, step: int) -> np.ndarray:
+    """Lane chords separated by spaces (`"0 1 02 1"`), every gap one `step`."""
+    masks = []
+    for chord in text.split():
+        mask = 0
+        for lane in chord:
+            if not lane.isdigit() or int(lane) >= LANE_BITS:
+                raise ValueError(f"Bad lane {lane!r} in {text!r}")
+            mask |= 1 << int(lane)
+        masks.append(mask)
+    ticks = np.array([REST_TICKS] + [step] * (len(masks) - 1))
+    return token(ticks, np.array(masks))
+
+
+def print_matches(index: PatternIndex, events: np.ndarray, lengths: np.ndarray, elapsed: float, label: str) -> None:
+    print(f"🔎 {events.size} {label} in {elapsed * 1000:.1f} ms")
+    per_chart = Counter(index.charts[c] for c in index.chart_of(events))
+    for chart, count in per_chart.most_common(MAX_RESULTS):
+        print(f"  {count:>5}  {chart}")
+    order = np.argsort(-lengths, kind="stable")[:MAX_RESULTS]
+    if order.size:
+        print("\n  Longest:" if np.any(lengths != lengths[0]) else "\n  First:")
+    for i in order:
+        match = index.describe_at(int(events[i]), int(lengths[i]))
+        print(f"    {match['chart']:<52} {match['time']:>8.2f} s  {match['pattern']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query lane-and-rhythm patterns across all charts.")
+    parser.add_argument("--jacks", type=int, metavar="N", help="jacks of at least N notes")
+    parser.add_argument("--trills", type=int, metavar="N", help="trills of at least N notes")
+    parser.add_argument("--ngram", metavar="LANES", help='lane sequence such as "0 1 0 2" (chords as "02")')
+    parser.add_argument("--motifs", type=int, metavar="N", choices=NGRAM_SIZES, help="most repeated N-event motifs")
+    parser.add_argument("--step", choices=STEPS, help="interval between events (required for --ngram)")
+    parser.add_argument("--difficulty", action="append", choices=DIFFICULTIES, help="limit to charts of this difficulty")
+    parser.add_argument("--top", type=int, default=MAX_RESULTS)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(rebuild=args.rebuild)
+    size = INDEX_PATH.stat().st_size
+    print(
+        f"📇 {len(index.charts)} charts, {index.tokens.size} events, index {size / 1024:.0f} KB "
+        f"(ready in {(time.perf_counter() - start) * 1000:.0f} ms)\n"
+    )
+    step = STEPS[args.step] if args.step else None
+
+    if args.jacks or args.trills:
+        kind, min_length = ("jack", args.jacks) if args.jacks else ("trill", args.trills)
+        start = time.perf_counter()
+        ends = index.runs(kind, min_length, step, args.difficulty)
+        elapsed = time.perf_counter() - start
+        lengths = (index.jack if kind == "jack" else index.trill)[ends].astype(int)
+        print_matches(index, ends - lengths + 1, lengths, elapsed, f"{kind}s of {min_length}+ notes")
+    elif args.ngram:
+        if step is None:
+            parser.error("--ngram needs --step")
+        pattern = parse_pattern(args.ngram, step)
+        start = time.perf_counter()
+        starts = index.find(pattern, args.difficulty)
+        elapsed = time.perf_counter() - start
+        print_matches(index, starts, np.full(starts.size, pattern.size), elapsed, f"matches of {describe(pattern)}")
+    elif args.motifs:
+        start = time.perf_counter()
+        motifs = index.motifs(args.motifs, args.top)
+        print(f"🔁 Most repeated {args.motifs}-event motifs ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        for motif in motifs:
+            print(f"  {motif['songs']:>3} songs {motif['charts']:>3} charts {motif['occurrences']:>5}x  {motif['pattern']}")
+    else:
+        parser.error("choose one of --jacks, --trills, --ngram or --motifs")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
 """
 Prepare songs for RhythmTap:
-1. Copy audio files to Resources
+1. Normalize audio files into Resources (rate, loudness, silence trim)
 2. Generate beatmaps based on BPM
 3. Create updated SongLibrary.swift
 """
 
 import json
-import shutil
 import uuid
 from pathlib import Path
 
+from chart_io import record_audio_trims, write_chart
+from normalize_audio import normalize_all, shift_chart
+
 MUSIC_LIBRARY = Path.home() / "Music"
 RESOURCES_DIR = Path("/Users/jonny/RhythmTap/RhythmTap/Resources")
 
@@ -129,24 +131,45 @@ SONGS_TO_ADD = [
 ]
 
 def copy_audio_files():
-    """Copy audio files from Music library to Resources"""
-    print("📁 Copying audio files...")
+    """Normalize audio files from the Music library into Resources (in parallel)"""
+    print("📁 Normalizing audio files...")
     RESOURCES_DIR.mkdir(exist_ok=True)
-    
+
+    jobs = []
     for song in SONGS_TO_ADD:
         if song["source"] == "existing":
             print(f"  ✓ {song['title']} (already exists)")
             continue
-        
+
         source_path = MUSIC_LIBRARY / song["source"]
         output_path = RESOURCES_DIR / f"{song['output_name']}.{song['extension']}"
-        
+
         if source_path.exists():
-            shutil.copy2(source_path, output_path)
-            print(f"  ✓ {song['title']}")
+            jobs.append((song, source_path, output_path))
         else:
             print(f"  ✗ {song['title']} - Source not found: {source_path}")
 
+    results = normalize_all([(source, output) for _, source, output in jobs])
+    # Charts generated later from the trimmed audio are stamped with these.
+    record_audio_trims({song["output_name"]: result.lead_trim for (song, _, _), result in zip(jobs, results)})
+    for (song, _, _), result in zip(jobs, results):
+        song["extension"] = Path(result.output).suffix.lstrip(".")
+        shifted = adjust_chart_offsets(song["output_name"], result.lead_trim)
+        status = "cached" if result.cached else f"{result.loudness:+.1f} LUFS, {result.gain_db:+.1f} dB"
+        print(f"  ✓ {song['title']} ({status}, trimmed {result.lead_trim:.3f}s, {shifted} charts shifted)")
+
+def adjust_chart_offsets(output_name: str, lead_trim: float) -> int:
+    """Shift existing charts of a song to match its trimmed leading silence"""
+    shifted = 0
+    for chart_path in sorted(RESOURCES_DIR.glob(f"{output_name}*.json")):
+        if chart_path.stem != output_name and not chart_path.stem.startswith(f"{output_name}_"):
+            continue
+        chart = json.loads(chart_path.read_text())
+        if shift_chart(chart, lead_trim):
+            write_chart(chart_path, chart)
+            shifted += 1
+    return shifted
+
 def generate_beatmap(song: dict, duration: float = 180) -> dict:
     """Generate a basic beatmap for a song based on BPM"""
     bpm = song["bpm"]
@@ -183,9 +206,7 @@ def create_beatmaps():
     for song in SONGS_TO_ADD:
         beatmap = generate_beatmap(song, duration=180)
         output_file = RESOURCES_DIR / f"{song['output_name']}.json"
-        
-        with open(output_file, "w") as f:
-            json.dump(beatmap, f, indent=2)
+        write_chart(output_file, beatmap, song["output_name"])
         
         print(f"  ✓ {song['title']} - {len(beatmap['notes'])} notes")
 
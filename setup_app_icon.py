@@ -1,71 +1,153 @@
 #!/usr/bin/env python3
 """
-Setup app icon from source image
-Generates all required iOS app icon sizes from a single source image
+Build the app icon set from a single source image.
+
+- Decodes `app_icon_source.png` once (flattened onto white: icons can't have alpha)
+- Makes every size from a halving pyramid (1024 -> 512 -> 256 ...), finishing each
+  icon with one small LANCZOS resize from the nearest larger level
+- Writes AppIcon.appiconset/Contents.json from ICON_SLOTS
+- Skips icons whose source hash and output are unchanged since the last build
 """
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+from typing import BinaryIO, Dict, List, Tuple
 
 from PIL import Image
-import os
 
-def setup_app_icon():
+from song_registry import ROOT, RESOURCES
+
+SOURCE_IMAGE = ROOT / "app_icon_source.png"
+ICON_DIR = RESOURCES / "Assets.xcassets" / "AppIcon.appiconset"
+MANIFEST_PATH = ROOT / ".cache" / "app_icon_manifest.json"
+ICON_VERSION = 1
+
+# (idiom, size in points, scale) for every slot in the asset catalog.
+ICON_SLOTS: List[Tuple[str, float, int]] = [
+    ("iphone", 20, 2), ("iphone", 20, 3),
+    ("iphone", 29, 1), ("iphone", 29, 2), ("iphone", 29, 3),
+    ("iphone", 40, 2), ("iphone", 40, 3),
+    ("iphone", 57, 1), ("iphone", 57, 2),
+    ("iphone", 60, 2), ("iphone", 60, 3),
+    ("ipad", 20, 1), ("ipad", 20, 2),
+    ("ipad", 29, 1), ("ipad", 29, 2),
+    ("ipad", 40, 1), ("ipad", 40, 2),
+    ("ipad", 76, 1), ("ipad", 76, 2),
+    ("ipad", 83.5, 2),
+    ("ios-marketing", 1024, 1),
+]
+
+
+def pixel_size(points: float, scale: int) -> int:
+    return int(round(points * scale))
+
+
+def icon_filename(pixels: int) -> str:
+    return f"{pixels}.png"
+
+
+def format_points(points: float) -> str:
+    return f"{points:g}x{points:g}"
+
+
+def contents_json() -> dict:
+    images = [
+        {
+            "filename": icon_filename(pixel_size(points, scale)),
+            "idiom": idiom,
+            "scale": f"{scale}x",
+            "size": format_points(points),
+        }
+        for idiom, points, scale in ICON_SLOTS
+    ]
+    return {"images": images, "info": {"author": "xcode", "version": 1}}
+
+
+def load_source(source: BinaryIO) -> Image.Image:
+    img = Image.open(source)
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        return background
+    return img.convert("RGB")
+
+
+def build_pyramid(img: Image.Image, smallest: int) -> List[Image.Image]:
+    """Source plus successive 2x box reductions down to just above `smallest`."""
+    levels = [img]
+    while min(levels[-1].size) // 2 >= smallest:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def resize_from_pyramid(levels: List[Image.Image], pixels: int) -> Image.Image:
+    level = next(l for l in reversed(levels) if min(l.size) >= pixels)
+    if level.size == (pixels, pixels):
+        return level
+    return level.resize((pixels, pixels), Image.Resampling.LANCZOS)
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def load_manifest() -> Dict:
+    try:
+        return json.loads(MANIFEST_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def setup_app_icon(force: bool = False) -> None:
     """Generate app icons in all required sizes"""
-    
-    # Source image - should be at least 1024x1024
-    source_image_path = "app_icon_source.png"
-    
-    if not os.path.exists(source_image_path):
-        print(f"Error: {source_image_path} not found")
+    if not SOURCE_IMAGE.exists():
+        print(f"Error: {SOURCE_IMAGE.name} not found")
         print("Please save your app icon image as 'app_icon_source.png' in the project root")
         return
-    
-    # Open source image
-    img = Image.open(source_image_path)
-    print(f"Loaded source image: {img.size}")
-    
-    # Ensure image is RGB (not RGBA) for better compatibility
-    if img.mode == 'RGBA':
-        # Create white background
-        background = Image.new('RGB', img.size, (255, 255, 255))
-        background.paste(img, mask=img.split()[3])  # Use alpha channel as mask
-        img = background
-    elif img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # Icon sizes required for iOS (size@multiplier -> pixel size)
-    icon_sizes = [
-        (20, 1, "20"),      # iPhone notification (2x/3x: 40x40, 60x60)
-        (20, 2, "20@2x"),
-        (20, 3, "20@3x"),
-        (29, 1, "29"),      # iPhone settings (2x/3x: 58x58, 87x87)
-        (29, 2, "29@2x"),
-        (29, 3, "29@3x"),
-        (40, 1, "40"),      # iPhone spotlight (2x/3x: 80x80, 120x120)
-        (40, 2, "40@2x"),
-        (40, 3, "40@3x"),
-        (60, 2, "60@2x"),   # iPhone app icon (2x/3x: 120x120, 180x180)
-        (60, 3, "60@3x"),
-        (1024, 1, "1024"),  # App store icon
-    ]
-    
-    icon_dir = "Resources/Assets.xcassets/AppIcon.appiconset"
-    os.makedirs(icon_dir, exist_ok=True)
-    
-    print(f"\nGenerating app icons in {icon_dir}...")
-    
-    for base_size, multiplier, name in icon_sizes:
-        size = base_size * multiplier
-        
-        # Resize image using high-quality resampling
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        
-        # Save icon
-        output_path = os.path.join(icon_dir, f"icon-{name}.png")
-        resized.save(output_path, 'PNG', quality=95)
-        
-        print(f"✓ Generated {size}x{size} icon: icon-{name}.png")
-    
-    print("\n✅ All app icons generated successfully!")
-    print("Your icons are ready in Resources/Assets.xcassets/AppIcon.appiconset/")
+
+    source_bytes = SOURCE_IMAGE.read_bytes()
+    source_digest = f"{digest(source_bytes)}-v{ICON_VERSION}"
+    manifest = load_manifest()
+    outputs: Dict[str, str] = manifest.get("outputs", {}) if manifest.get("source") == source_digest else {}
+
+    sizes = sorted({pixel_size(points, scale) for _, points, scale in ICON_SLOTS}, reverse=True)
+    pending = []
+    for pixels in sizes:
+        path = ICON_DIR / icon_filename(pixels)
+        if force or not path.exists() or outputs.get(path.name) != digest(path.read_bytes()):
+            pending.append(pixels)
+
+    ICON_DIR.mkdir(parents=True, exist_ok=True)
+    if pending:
+        img = load_source(io.BytesIO(source_bytes))
+        print(f"Loaded source image: {img.size}")
+        levels = build_pyramid(img, min(pending))
+        for pixels in pending:
+            buffer = io.BytesIO()
+            resize_from_pyramid(levels, pixels).save(buffer, "PNG", optimize=True)
+            path = ICON_DIR / icon_filename(pixels)
+            path.write_bytes(buffer.getvalue())
+            outputs[path.name] = digest(buffer.getvalue())
+            print(f"✓ Generated {pixels}x{pixels} icon: {path.name}")
+    print(f"{len(sizes) - len(pending)} icons unchanged")
+
+    # Same layout Xcode writes (`"key" : value`) so saving in Xcode doesn't churn the file.
+    contents = json.dumps(contents_json(), indent=2).replace('": ', '" : ') + "\n"
+    contents_path = ICON_DIR / "Contents.json"
+    if not contents_path.exists() or contents_path.read_text() != contents:
+        contents_path.write_text(contents)
+        print("✓ Updated Contents.json")
+
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST_PATH.write_text(json.dumps({"source": source_digest, "outputs": outputs}, indent=2))
+    print(f"\n✅ App icon set ready in {ICON_DIR.relative_to(ROOT)}/")
+
 
 if __name__ == "__main__":
-    setup_app_icon()
+    parser = argparse.ArgumentParser(description="Build AppIcon.appiconset from app_icon_source.png.")
+    parser.add_argument("--force", action="store_true", help="regenerate every icon")
+    setup_app_icon(parser.parse_args().force)
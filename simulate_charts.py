@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Headless playability and scoring simulator for charts.
+
+Models the rules in Sources/GameScene.swift and Sources/Models/GameState.swift:
+- Timing windows (perfect <= 60 ms, great <= 120 ms, good <= 160 ms, miss beyond).
+- Notes spawn 2.8 s ahead and scroll at 450 px/s on every difficulty (the game does
+  not apply Difficulty.noteSpeedMultiplier yet).
+- Holds are judged at their end (perfect if the lane is still held); a hold whose
+  start was never pressed is never judged, exactly as in the game.
+- Shake notes can be shaken or tapped, so they are judged like taps.
+- Score uses the combo multiplier (1 + combo / 10); 100 misses fail the song.
+
+A bot with Gaussian timing jitter plays every chart many times at once (trials x
+notes arrays); the report lists the perfect-play score, bot score and survival,
+the hardest sections and notes no player can hit. Charts are simulated in
+parallel across processes.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from chart_io import HOLD, NoteArrays, chart_files, difficulty_of, load_chart, note_arrays
+from song_registry import ROOT
+
+REPORT_PATH = ROOT / "reports" / "simulation.json"
+
+# GameScene.swift / GameState.swift
+SPAWN_LEAD = 2.8
+HIT_WINDOW = 0.16
+PERFECT_WINDOW = 0.06
+GREAT_WINDOW = 0.12
+NOTE_SPEED = 450.0
+NOTE_SIZE = {3: 69.0, 4: 58.0}
+JUDGEMENT_SCORES = np.array([1000, 600, 300, 0])
+PERFECT, GREAT, GOOD, MISS = range(4)
+NOT_JUDGED = -1
+MISS_LIMIT = 100
+HEALTH_PER_HIT = 0.01
+
+# Human limits used to flag impossible notes.
+MAX_FINGERS = 2
+MIN_JACK_INTERVAL = 0.09
+
+SECTION_SECONDS = 4.0
+TOP_SECTIONS = 3
+
+
+@dataclass
+class BotConfig:
+    jitter: float = 0.035
+    bias: float = 0.0
+    trials: int = 32
+    seed: int = 0
+
+
+def judge(offsets: np.ndarray) -> np.ndarray:
+    """Judgement code for each absolute timing offset (seconds)."""
+    return np.searchsorted(np.array([PERFECT_WINDOW, GREAT_WINDOW, HIT_WINDOW]), np.abs(offsets), side="left")
+
+
+def impossible_notes(notes: NoteArrays, lanes: int) -> Dict[str, np.ndarray]:
+    """Boolean masks (one per reason) of notes no player can hit."""
+    times, note_lanes = notes.times, notes.lanes
+    is_hold = notes.types == HOLD
+    reasons: Dict[str, np.ndarray] = {
+        "laneOutOfRange": (note_lanes < 0) | (note_lanes >= lanes),
+        "holdWithoutDuration": is_hold & (notes.durations <= 0),
+    }
+
+    # Simultaneous notes plus holds still being held elsewhere must fit on MAX_FINGERS.
+    hold_starts = np.sort(times[is_hold])
+    hold_ends = np.sort(times[is_hold] + notes.durations[is_hold])
+    held = np.searchsorted(hold_starts, times, side="left") - np.searchsorted(hold_ends, times, side="right")
+    _, chord_of, chord_sizes = np.unique(np.round(times, 3), return_inverse=True, return_counts=True)
+    reasons["tooManyFingers"] = chord_sizes[chord_of] + held > MAX_FINGERS
+
+    inside_hold = np.zeros(times.size, dtype=bool)
+    fast_jack = np.zeros(times.size, dtype=bool)
+    for lane in np.unique(note_lanes):
+        idx = np.flatnonzero(note_lanes == lane)
+        lane_times = times[idx]
+        gaps = np.diff(lane_times)
+        fast_jack[idx[1:]] = gaps < MIN_JACK_INTERVAL
+        # Any tap in a lane releases that lane's hold, so nothing may start inside one.
+        ends = np.where(is_hold[idx], lane_times + notes.durations[idx], -np.inf)
+        running_end = np.maximum.accumulate(ends)
+        inside_hold[idx[1:]] = lane_times[1:] < running_end[:-1]
+    reasons["sameLaneTooFast"] = fast_jack
+    reasons["insideHold"] = inside_hold
+    return reasons
+
+
+def score_runs(codes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Score, failure and health for each row of judgement codes (in judgement order)."""
+    judged = codes != NOT_JUDGED
+    miss = judged & (codes == MISS)
+    hit = judged & ~miss
+
+    misses = np.cumsum(miss, axis=1)
+    alive = (misses - miss) < MISS_LIMIT          # GameState ignores everything after failing
+    hits = np.cumsum(hit, axis=1)
+    hits_at_last_miss = np.maximum.accumulate(np.where(miss, hits, 0), axis=1)
+    combo_before = hits - hit - hits_at_last_miss
+    multiplier = 1 + combo_before // 10
+    values = JUDGEMENT_SCORES[np.clip(codes, 0, MISS)]
+    score = np.sum(np.where(judged & alive, values * multiplier, 0), axis=1)
+
+    base = 1.0 - misses / MISS_LIMIT
+    health = np.where(miss, base, np.minimum(1.0, base + HEALTH_PER_HIT * (hits - hits_at_last_miss)))
+    health = np.where(judged & alive, np.clip(health, 0.0, 1.0), 1.0)
+    return {
+        "score": score,
+        "failed": misses[:, -1] >= MISS_LIMIT if codes.shape[1] else np.zeros(codes.shape[0], dtype=bool),
+        "minHealth": health.min(axis=1) if codes.shape[1] else np.ones(codes.shape[0]),
+        "hits": hit.sum(axis=1),
+        "judged": judged.sum(axis=1),
+    }
+
+
+def hardest_sections(times: np.ndarray, miss_rate: np.ndarray) -> List[dict]:
+    """Top sections by bot miss rate (then density), over half-overlapping windows."""
+    if times.size == 0:
+        return []
+    starts = np.arange(0.0, times[-1] + 1e-9, SECTION_SECONDS / 2)
+    lo = np.searchsorted(times, starts)
+    hi = np.searchsorted(times, starts + SECTION_SECONDS)
+    counts = hi - lo
+    cum_miss = np.concatenate(([0.0], np.cumsum(miss_rate)))
+    section_miss = (cum_miss[hi] - cum_miss[lo]) / np.maximum(counts, 1)
+    order = np.lexsort((-counts, -section_miss))
+    sections = []
+    for i in order[:TOP_SECTIONS]:
+        if counts[i] == 0:
+            break
+        sections.append({
+            "start": round(float(starts[i]), 2),
+            "end": round(float(starts[i] + SECTION_SECONDS), 2),
+            "nps": round(float(counts[i] / SECTION_SECONDS), 2),
+            "missRate": round(float(section_miss[i]), 3),
+        })
+    return sections
+
+
+def simulate_chart(path: Path, config: BotConfig) -> dict:
+    chart = load_chart(path)
+    lanes = int(chart.get("lanes", 3))
+    difficulty = difficulty_of(path)
+    notes = note_arrays(chart)
+    n = len(notes)
+    rng = np.random.default_rng([config.seed, zlib.crc32(path.name.encode())])
+
+    reasons = impossible_notes(notes, lanes)
+    impossible = np.logical_or.reduce(list(reasons.values())) if n else np.zeros(0, dtype=bool)
+    is_hold = notes.types == HOLD
+
+    # Holds are judged when they end; everything else when it is hit.
+    judge_times = np.where(is_hold, notes.times + notes.durations, notes.times)
+    order = np.argsort(judge_times, kind="stable")
+
+    def play(offsets: np.ndarray) -> np.ndarray:
+        codes = judge(offsets)
+        codes[:, impossible] = MISS
+        # A hold starts only if pressed within the window; then the bot keeps it down.
+        hold_codes = np.where(codes[:, is_hold] < MISS, PERFECT, NOT_JUDGED)
+        hold_codes[:, impossible[is_hold]] = MISS
+        codes[:, is_hold] = hold_codes
+        return codes[:, order]
+
+    offsets = rng.normal(config.bias, config.jitter, size=(config.trials, n))
+    bot = score_runs(play(offsets))
+    perfect = score_runs(play(np.zeros((1, n))))
+
+    bot_codes = judge(offsets)
+    bot_codes[:, impossible] = MISS
+    miss_rate = (bot_codes == MISS).mean(axis=0) if n else np.zeros(0)
+
+    on_screen = np.searchsorted(notes.times, notes.times + SPAWN_LEAD) - np.arange(n)
+    unreadable = 0
+    for lane in np.unique(notes.lanes):
+        gaps = np.diff(notes.times[notes.lanes == lane])
+        unreadable += int(np.count_nonzero((gaps > 0) & (gaps * NOTE_SPEED < NOTE_SIZE.get(lanes, 64.0))))
+
+    max_score = int(perfect["score"][0])
+    return {
+        "chart": path.name,
+        "difficulty": difficulty,
+        "lanes": lanes,
+        "notes": n,
+        "duration": round(float(notes.times[-1]), 2) if n else 0.0,
+        "maxScore": max_score,
+        "botScore": int(np.mean(bot["score"])),
+        "botScorePct": round(float(np.mean(bot["score"]) / max(max_score, 1) * 100), 1),
+        "botAccuracy": round(float(np.mean(bot["hits"] / np.maximum(bot["judged"], 1))), 3),
+        "survival": round(float(1.0 - np.mean(bot["failed"])), 3),
+        "minHealth": round(float(np.mean(bot["minHealth"])), 3),
+        "maxOnScreen": int(on_screen.max()) if n else 0,
+        "overlappingSprites": unreadable,
+        "impossible": {reason: int(mask.sum()) for reason, mask in reasons.items() if mask.any()},
+        "impossibleTimes": [round(float(t), 3) for t in notes.times[impossible][:20]],
+        "hardestSections": hardest_sections(notes.times, miss_rate),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate charts headlessly and report playability.")
+    parser.add_argument("charts", nargs="*", type=Path, help="chart JSON files (default: every chart in Resources)")
+    parser.add_argument("--jitter", type=float, default=BotConfig.jitter, help="bot timing jitter, std dev in seconds")
+    parser.add_argument("--bias", type=float, default=BotConfig.bias, help="bot timing bias in seconds (+ = late)")
+    parser.add_argument("--trials", type=int, default=BotConfig.trials, help="bot plays per chart")
+    parser.add_argument("--seed", type=int, default=BotConfig.seed)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    config = BotConfig(args.jitter, args.bias, args.trials, args.seed)
+    paths = args.charts or chart_files()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(partial(simulate_chart, config=config), paths, chunksize=4))
+
+    print(f"{'chart':<56} {'notes':>5} {'max':>9} {'bot%':>6} {'surv':>5} {'imp':>4}")
+    for r in results:
+        print(
+            f"{r['chart']:<56} {r['notes']:>5} {r['maxScore']:>9} {r['botScorePct']:>6} "
+            f"{r['survival']:>5} {sum(r['impossible'].values()):>4}"
+        )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps({"bot": asdict(config), "charts": results}, indent=2))
+    print(f"\nReport -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Song registry shared by the chart generation and analysis tools.
+
+`SONGS` are the tracks whose charts `regenerate_charts.py` rebuilds from audio.
+`IMPORTED_SONGS` have charts converted from other games (or generated by their own
+scripts); analysis tools read them but `regenerate_charts.py` never overwrites them.
+`PACK_SONGS` are added by `import_packs.py` and listed in `imported_packs.json`.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent
+RESOURCES = ROOT / "Resources"
+PACK_REGISTRY = ROOT / "imported_packs.json"
+
+DIFFICULTIES = ("easy", "medium", "hard", "extreme")
+
+
+@dataclass
+class Song:
+    id: str
+    title: str
+    artist: str
+    audio_name: str
+    audio_ext: str
+    chart_name: str
+    lanes: int
+    bpm: float
+    offset: float = 0.0
+
+    @property
+    def audio_path(self) -> Path:
+        return RESOURCES / f"{self.audio_name}.{self.audio_ext}"
+
+    @property
+    def chart_path(self) -> Path:
+        return RESOURCES / f"{self.chart_name}.json"
+
+    def difficulty_chart_path(self, difficulty: str) -> Path:
+        return RESOURCES / f"{self.chart_name}_{difficulty}.json"
+
+    def chart_paths(self) -> Dict[str, Path]:
+        """Existing per-difficulty charts keyed by difficulty name."""
+        paths = {diff: self.difficulty_chart_path(diff) for diff in DIFFICULTIES}
+        return {diff: path for diff, path in paths.items() if path.exists()}
+
+
+SONGS: List[Song] = [
+    Song("hallelujah", "Hallelujah", "Jonny Thompson", "hallelujah", "wav", "hallelujah", 3, 110),
+    Song("crazy_train", "Crazy Train", "Ozzy Osbourne", "crazy_train", "mp3", "crazy_train", 4, 138),
+    Song("i_will_not_bow", "I Will Not Bow", "Breaking Benjamin", "i_will_not_bow", "mp3", "i_will_not_bow", 4, 92),
+    Song("day_n_nite", "Day 'N' Nite", "Kid Cudi", "day_n_nite", "mp3", "day_n_nite", 4, 139.67),
+    Song("blink182_see_you", "See You", "blink-182", "blink182_see_you", "mp3", "blink182_see_you", 3, 100),
+    Song("madchild_chainsaw", "Chainsaw", "Madchild ft. Slaine", "madchild_chainsaw", "mp3", "madchild_chainsaw", 3, 95),
+    Song("hippie_sabotage_high", "High Enough", "Hippie Sabotage", "hippie_sabotage_high", "m4a", "hippie_sabotage_high", 3, 110),
+    Song("mgk_dont_let_me_go", "Don't Let Me Go", "MGk", "mgk_dont_let_me_go", "mp3", "mgk_dont_let_me_go", 4, 120),
+    Song("bizzy_banks_fonem", "On Fonem Grave", "Bizzy Banks", "bizzy_banks_fonem", "mp3", "bizzy_banks_fonem", 3, 85),
+]
+
+IMPORTED_SONGS: List[Song] = [
+    Song("21_guns", "21 Guns", "Green Day", "Green Day - 21 Guns Official Music Video", "mp3", "21_guns", 4, 120),
+    Song("green_day_holiday", "Holiday", "Green Day", "Green Day - Holiday [Official Music Video]", "mp3", "green_day_holiday", 4, 147.66),
+    Song(
+        "dragonforce_ttfaf",
+        "Through The Fire and Flames",
+        "Dragonforce",
+        "dragonforce_through_the_fire_and_flames",
+        "mp3",
+        "dragonforce_through_the_fire_and_flames",
+        4,
+        200,
+        7.22,
+    ),
+]
+
+
+def load_pack_songs(path: Path = PACK_REGISTRY) -> List[Song]:
+    if not path.exists():
+        return []
+    names = {f.name for f in fields(Song)}
+    return [Song(**{k: v for k, v in entry.items() if k in names}) for entry in json.loads(path.read_text())["songs"]]
+
+
+PACK_SONGS: List[Song] = load_pack_songs()
+
+ALL_SONGS: List[Song] = SONGS + IMPORTED_SONGS + PACK_SONGS
+
+
+def find_song(song_id: str) -> Song:
+    for song in ALL_SONGS:
+        if song.id == song_id:
+            return song
+    raise KeyError(f"Unknown song id: {song_id}")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Song structure: section boundaries and labels from beat-synchronous features.
+
+The cached features (see audio_features.py) are averaged between consecutive
+beats of the tempo map, so a song becomes a few hundred beat frames instead of
+tens of thousands of STFT frames. Each beat frame has the four band levels,
+loudness, brightness and onset strength, standardized over the song. From
+those:
+
+- a cosine self-similarity matrix of the beat frames;
+- a novelty curve, from a Gaussian-tapered checkerboard kernel slid along the
+  diagonal (Foote);
+- boundaries at novelty peaks, snapped to bar lines (every BEATS_PER_BAR beats,
+  in the phase with the strongest onsets). Peaks are at least
+  MIN_SECTION_BEATS apart, or MIN_SECTION_SECONDS in whole bars for fast
+  songs, and the kernel reaches as far on either side;
+- labels: a section takes the label of the most similar earlier section when
+  that reaches LABEL_SIMILARITY, otherwise a new letter. Similarity is the
+  mean of their block of the matrix, normalized by their own blocks;
+- energy: each section's mean loudness, 0 for the quietest section and 1 for
+  the loudest.
+
+Generators write the sections into charts (`sections`) and use them to shape
+density. A section's share of notes scales with its energy (see
+`thin_to_sections`). Preview clips start at the loudest repeated section. Run
+directly to print the sections of songs with audio and the time segmentation
+takes.
+"""
+from __future__ import annotations
+
+import argparse
+import string
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from audio_features import Features, load_features
+from song_registry import ALL_SONGS, Song, find_song
+
+KERNEL_BEATS = 16
+MIN_SECTION_BEATS = 16
+# Fast songs get longer sections and kernels, in whole bars.
+MIN_SECTION_SECONDS = 8.0
+BEATS_PER_BAR = 4
+NOVELTY_THRESHOLD = 0.5     # standard deviations above the mean novelty
+LABEL_SIMILARITY = 0.8
+# Share of notes kept in the quietest section; the loudest keeps all of them.
+SECTION_DENSITY_FLOOR = 0.6
+
+
+@dataclass
+class Section:
+    start: float
+    end: float
+    label: str
+    energy: float
+
+    def to_json(self) -> dict:
+        return {key: round(value, 3) if isinstance(value, float) else value for key, value in asdict(self).items()}
+
+
+def beat_frames(features: Features, beat_times: np.ndarray) -> np.ndarray:
+    """Feature frame where each beat-synchronous frame starts (the first always at 0)."""
+    n = features.onset_env.size
+    frames = np.round(np.asarray(beat_times) * features.frame_rate).astype(int)
+    return np.unique(np.concatenate(([0], frames[(frames > 0) & (frames < n)])))
+
+
+def beat_features(features: Features, starts: np.ndarray) -> np.ndarray:
+    """(beats, 7) means between beats: band dB x4, loudness dB, log centroid, onset strength."""
+    n = min(features.onset_env.size, features.rms.size, features.centroid.size, features.band_energy.shape[1])
+    starts = starts[starts < n]
+    rows = np.vstack((
+        features.band_energy_db()[:, :n],
+        20.0 * np.log10(np.maximum(features.rms[:n], 1e-5)),
+        np.log2(np.maximum(features.centroid[:n], 20.0)),
+        features.onset_env[:n],
+    )).astype(np.float64)
+    sums = np.add.reduceat(rows, starts, axis=1)
+    means = sums / np.diff(np.append(starts, n))
+    return means.T
+
+
+def standardize(x: np.ndarray) -> np.ndarray:
+    return (x - x.mean(axis=0)) / np.maximum(x.std(axis=0), 1e-9)
+
+
+def self_similarity(x: np.ndarray) -> np.ndarray:
+    """Cosine similarity between every pair of rows."""
+    unit = x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-9)
+    return unit @ unit.T
+
+
+def checkerboard(half: int) -> np.ndarray:
+    offsets = np.arange(-half, half) + 0.5
+    taper = np.exp(-0.5 * (offsets / (half / 2.0)) ** 2)
+    return np.outer(np.sign(offsets) * taper, np.sign(offsets) * taper)
+
+
+def novelty(ssm: np.ndarray, half: int = KERNEL_BEATS) -> np.ndarray:
+    """Checkerboard-kernel novelty at each beat (high where the texture changes)."""
+    kernel = checkerboard(half)
+    padded = np.pad(ssm, half, mode="constant")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (2 * half, 2 * half))
+    diagonal = windows[np.arange(ssm.shape[0]), np.arange(ssm.shape[0])]
+    return np.einsum("bij,ij->b", diagonal, kernel)
+
+
+def pick_boundaries(curve: np.ndarray, phase: int, min_beats: int = MIN_SECTION_BEATS) -> List[int]:
+    """Beat indices of novelty peaks on bar lines, strongest first, at least `min_beats` apart."""
+    threshold = curve.mean() + NOVELTY_THRESHOLD * curve.std()
+    order = np.argsort(-curve, kind="stable")
+    chosen: List[int] = []
+    for beat in order:
+        if curve[beat] < threshold:
+            break
+        bar = phase + int(round((beat - phase) / BEATS_PER_BAR)) * BEATS_PER_BAR
+        if bar < min_beats or bar > curve.size - min_beats:
+            continue
+        if all(abs(bar - other) >= min_beats for other in chosen):
+            chosen.append(bar)
+    return sorted(chosen)
+
+
+def label_segments(ssm: np.ndarray, bounds: Sequence[int]) -> List[str]:
+    """A letter per segment; segments whose blocks are similar enough share one."""
+    n = len(bounds) - 1
+    block = np.array([[ssm[bounds[i] : bounds[i + 1], bounds[j] : bounds[j + 1]].mean() for j in range(n)] for i in range(n)])
+    # Normalized by each segment's own block, so loose and tight sections compare alike.
+    self_block = np.sqrt(np.maximum(np.diag(block), 1e-9))
+    similarity = block / np.outer(self_block, self_block)
+    labels: List[str] = []
+    for k in range(n):
+        best, label = -np.inf, None
+        for j in range(k):
+            if similarity[k, j] > best:
+                best, label = float(similarity[k, j]), labels[j]
+        if label is None or best < LABEL_SIMILARITY:
+            label = string.ascii_uppercase[len(set(labels)) % 26]
+        labels.append(label)
+    return labels
+
+
+def segment(features: Features, beat_times: np.ndarray) -> List[Section]:
+    """Sections of a song from its cached features and the beats of its tempo map."""
+    starts = beat_frames(features, beat_times)
+    raw = beat_features(features, starts)
+    if raw.shape[0] < 2 * MIN_SECTION_BEATS:
+        return [Section(0.0, features.duration, "A", 1.0)]
+    ssm = self_similarity(standardize(raw))
+    onsets = raw[:, -1]
+    phase = int(np.argmax([onsets[p::BEATS_PER_BAR].mean() for p in range(BEATS_PER_BAR)]))
+    beat_seconds = features.duration / raw.shape[0]
+    bars = int(np.ceil(MIN_SECTION_SECONDS / beat_seconds / BEATS_PER_BAR))
+    min_beats = max(MIN_SECTION_BEATS, bars * BEATS_PER_BAR)
+    bounds = [0] + pick_boundaries(novelty(ssm, max(KERNEL_BEATS, min_beats)), phase, min_beats) + [raw.shape[0]]
+    labels = label_segments(ssm, bounds)
+
+    times = np.append(starts / features.frame_rate, features.duration)
+    loudness = np.array([raw[a:b, 4].mean() for a, b in zip(bounds[:-1], bounds[1:])])
+    span = loudness.max() - loudness.min()
+    energy = (loudness - loudness.min()) / span if span > 0 else np.ones_like(loudness)
+    return [
+        Section(float(times[a]), float(times[b]), label, float(e))
+        for a, b, label, e in zip(bounds[:-1], bounds[1:], labels, energy)
+    ]
+
+
+def song_sections(song: Song) -> List[Section]:
+    """Sections of a registry song, on the beats of its regenerate_charts tempo map."""
+    import regenerate_charts
+
+    features = load_features(song)
+    return segment(features, regenerate_charts.extract_song_tempo(song, features).beat_times)
+
+
+def section_at(sections: Sequence[Section], t: float) -> int:
+    starts = np.array([s.start for s in sections])
+    return int(np.clip(np.searchsorted(starts, t, side="right") - 1, 0, len(sections) - 1))
+
+
+def thin_to_sections(notes: List[dict], sections: Sequence[Section], floor: float = SECTION_DENSITY_FLOOR) -> List[dict]:
+    """Keep `floor + (1 - floor) * energy` of each section's notes, evenly spread."""
+    if not sections:
+        return notes
+    kept: List[dict] = []
+    counts = [0] * len(sections)
+    for note in notes:
+        index = section_at(sections, float(note["time"]))
+        share = floor + (1.0 - floor) * sections[index].energy
+        seen = counts[index]
+        counts[index] += 1
+        # Keep the note when it advances the running count of kept notes.
+        if int((seen + 1) * share) > int(seen * share):
+            kept.append(note)
+    return kept
+
+
+def preview_section(sections: Sequence[Section], duration: float, search: Tuple[float, float]) -> Optional[Section]:
+    """The loudest section that repeats (usually the chorus) and starts inside `search` of the song."""
+    inside = [s for s in sections if search[0] * duration <= s.start <= search[1] * duration]
+    labels = [s.label for s in sections]
+    repeated = [s for s in inside if labels.count(s.label) > 1] or inside
+    return max(repeated, key=lambda s: s.energy, default=None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the sections of songs and time the segmentation.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    args = parser.parse_args()
+
+    import regenerate_charts
+
+    songs = [find_song(s) for s in args.song] if args.song else ALL_SONGS
+    for song in (s for s in songs if s.audio_path.exists()):
+        features = load_features(song)
+        beats = regenerate_charts.extract_song_tempo(song, features).beat_times
+        start = time.perf_counter()
+        sections = segment(features, beats)
+        elapsed = time.perf_counter() - start
+        print(f"🧩 {song.title}: {len(sections)} sections from {beats.size} beats in {elapsed * 1000:.0f} ms")
+        for section in sections:
+            bar = "█" * int(round(section.energy * 10))
+            print(f"    {section.label}  {section.start:6.1f}-{section.end:6.1f} s  {bar}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Variable-tempo maps for songs without a steady BPM.
+
+- Estimates a local tempo curve from a windowed autocorrelation tempogram of the
+  onset envelope, restricted to a band around the song's nominal BPM.
+- Smooths the curve with a Viterbi pass that penalises tempo jumps (in octaves), so
+  the estimate follows gradual rubato but ignores one-block outliers.
+- Places beats with the analysis backend's DP beat tracker driven by the per-frame tempo, and
+  exposes the result as a `TempoMap` that builds the 16th grid and quantizes onsets.
+"""
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+from scipy.ndimage import median_filter
+
+from analysis_backend import get_backend
+
+TEMPOGRAM_WINDOW = 384      # frames (~4.5 s at 44.1 kHz / 512 hop)
+BLOCK_SECONDS = 1.0         # tempo curve resolution before interpolation
+MIN_BPM, MAX_BPM = 40.0, 240.0
+# Viterbi cost per octave of tempo change between neighbouring blocks.
+OCTAVE_PENALTY = 4.0
+# Change points closer than this (BPM) are merged when the map is serialised.
+BPM_RESOLUTION = 0.5
+SMOOTHING_BEATS = 9
+
+
+@dataclass
+class TempoMap:
+    beat_times: np.ndarray
+
+    @classmethod
+    def constant(cls, bpm: float, duration: float, start: float = 0.0) -> "TempoMap":
+        period = 60.0 / max(bpm, 1e-6)
+        return cls(np.arange(start, duration + period, period))
+
+    @classmethod
+    def from_change_points(cls, points: List[Tuple[float, float]], duration: float) -> "TempoMap":
+        """Rebuild beats from serialised `[time, bpm]` change points."""
+        beats: List[float] = []
+        for i, (start, bpm) in enumerate(points):
+            end = points[i + 1][0] if i + 1 < len(points) else duration
+            period = 60.0 / max(bpm, 1e-6)
+            t = start
+            while t < end:
+                beats.append(t)
+                t += period
+        return cls(np.array(beats, dtype=float))
+
+    @property
+    def intervals(self) -> np.ndarray:
+        return np.diff(self.beat_times)
+
+    def bpm_at(self, times: np.ndarray) -> np.ndarray:
+        """Local tempo at each time, taken from the surrounding beat interval."""
+        if self.beat_times.size < 2:
+            return np.full(np.shape(times), np.nan)
+        idx = np.clip(np.searchsorted(self.beat_times, times, side="right") - 1, 0, self.intervals.size - 1)
+        return 60.0 / self.intervals[idx]
+
+    def extended_beats(self, duration: float) -> np.ndarray:
+        """Beats padded with the first/last interval so they cover [0, duration]."""
+        beats = self.beat_times
+        first, last = self.intervals[0], self.intervals[-1]
+        before = beats[0] - first * np.arange(int(np.ceil(beats[0] / first)), 0, -1)
+        after = beats[-1] + last * np.arange(1, int(np.ceil((duration - beats[-1]) / last)) + 2)
+        return np.concatenate((before, beats, after))
+
+    def grid(self, duration: float, subdivisions: int = 4) -> np.ndarray:
+        """Dense grid (16ths by default) following the local tempo across the whole track."""
+        beats = self.extended_beats(duration)
+        steps = beats[:-1, None] + np.diff(beats)[:, None] * (np.arange(subdivisions) / subdivisions)
+        return steps.ravel()
+
+    def change_points(self) -> List[List[float]]:
+        """Compact `[time, bpm]` list: one entry wherever the tempo moves by BPM_RESOLUTION.
+
+        Beat positions are frame-quantized, so the per-beat tempo is median-smoothed
+        over SMOOTHING_BEATS first; each change point still sits on a tracked beat.
+        """
+        if self.beat_times.size < 2:
+            return []
+        bpms = median_filter(60.0 / self.intervals, size=SMOOTHING_BEATS, mode="nearest")
+        points = [[round(float(self.beat_times[0]), 3), round(float(bpms[0]), 2)]]
+        for t, bpm in zip(self.beat_times[1:-1], bpms[1:]):
+            if abs(bpm - points[-1][1]) >= BPM_RESOLUTION:
+                points.append([round(float(t), 3), round(float(bpm), 2)])
+        return points
+
+
+def quantize(times: np.ndarray, grid: np.ndarray, tolerance: float = 0.12) -> Tuple[np.ndarray, np.ndarray]:
+    """Snap all times to their nearest grid point at once.
+
+    Returns the snapped times and a mask of which inputs were within `tolerance`.
+    """
+    times = np.asarray(times, dtype=float)
+    idx = np.clip(np.searchsorted(grid, times), 1, grid.size - 1)
+    left, right = grid[idx - 1], grid[idx]
+    snapped = np.where(times - left <= right - times, left, right)
+    return snapped, np.abs(snapped - times) <= tolerance
+
+
+def tempo_curve(onset_env: np.ndarray, sr: int, hop_length: int, start_bpm: float) -> np.ndarray:
+    """Smoothed per-frame BPM estimate from the onset envelope."""
+    tgram, bpms = get_backend().tempogram(onset_env, sr, hop_length, TEMPOGRAM_WINDOW)
+    band = (bpms >= max(MIN_BPM, start_bpm / 1.6)) & (bpms <= min(MAX_BPM, start_bpm * 1.6))
+    bpms, tgram = bpms[band], tgram[band]
+
+    # Average the tempogram into ~1 s blocks; the DP runs on blocks, not frames.
+    block = max(int(round(BLOCK_SECONDS * sr / hop_length)), 1)
+    n_blocks = max(tgram.shape[1] // block, 1)
+    blocks = tgram[:, : n_blocks * block].reshape(tgram.shape[0], n_blocks, -1).mean(axis=2)
+    blocks /= np.maximum(blocks.max(axis=0, keepdims=True), 1e-9)
+
+    # Log-normal prior around the nominal BPM keeps the curve off half/double-time.
+    prior = -0.5 * (np.log2(bpms / start_bpm) / 0.5) ** 2
+    octaves = np.log2(bpms)
+    transition = OCTAVE_PENALTY * np.abs(octaves[:, None] - octaves[None, :])
+    n_states = bpms.size
+    states = np.arange(n_states)
+    score = blocks[:, 0] + prior
+    back = np.zeros((n_blocks, n_states), dtype=int)
+    for n in range(1, n_blocks):
+        candidates = score[None, :] - transition
+        back[n] = np.argmax(candidates, axis=1)
+        score = candidates[states, back[n]] + blocks[:, n] + prior
+    path = np.empty(n_blocks, dtype=int)
+    path[-1] = int(np.argmax(score))
+    for n in range(n_blocks - 1, 0, -1):
+        path[n - 1] = back[n, path[n]]
+
+    centers = (np.arange(n_blocks) + 0.5) * block
+    return np.interp(np.arange(onset_env.size), centers, bpms[path])
+
+
+def extract_tempo_map(onset_env: np.ndarray, sr: int, hop_length: int, start_bpm: float, duration: float) -> TempoMap:
+    backend = get_backend()
+    bpm_frames = tempo_curve(onset_env, sr, hop_length, start_bpm)
+    beat_frames = backend.beat_track(onset_env, sr, hop_length, bpm_frames)
+    beat_times = backend.frames_to_time(beat_frames, sr, hop_length)
+    if beat_times.size < 2:
+        return TempoMap.constant(start_bpm, duration)
+    return TempoMap(beat_times)
+
+
+def main() -> None:
+    from audio_features import load_features
+    from song_registry import ALL_SONGS, find_song
+
+    parser = argparse.ArgumentParser(description="Print the tempo map extracted for each song.")
+    parser.add_argument("--song", action="append", help="song id (default: all with audio)")
+    args = parser.parse_args()
+
+    songs = [find_song(s) for s in args.song] if args.song else [s for s in ALL_SONGS if s.audio_path.exists()]
+    for song in songs:
+        features = load_features(song)
+        tempo = extract_tempo_map(features.onset_env, features.sr, features.hop_length, song.bpm, features.duration)
+        bpms = 60.0 / tempo.intervals
+        print(
+            f"{song.title}: {tempo.beat_times.size} beats, {len(tempo.change_points())} tempo changes, "
+            f"BPM {bpms.min():.1f}-{bpms.max():.1f} (median {np.median(bpms):.1f}, nominal {song.bpm})"
+        )
+
+
+if __name__ == "__main__":
+    main()
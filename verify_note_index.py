@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Check the `noteIndex` of every chart against its notes.
+
+For each chart the index must cover the notes as written: notes sorted by time
+and one bucket per BUCKET_SECONDS up to the last note, pointing at the first
+note at or after the bucket start. Charts written before the index existed are
+listed as unindexed; --fix (re)writes the index of every unindexed or stale chart
+in place. The exit status is 1 when a chart has a stale index (or, with --strict,
+none at all).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from chart_io import chart_files, check_note_index, load_chart, write_chart
+from song_registry import RESOURCES, ROOT
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verify the note index stored in each chart.")
+    parser.add_argument("charts", nargs="*", type=Path, help="chart files (default: every chart in Resources)")
+    parser.add_argument("--fix", action="store_true", help="rewrite missing or stale indices")
+    parser.add_argument("--strict", action="store_true", help="fail on charts without an index")
+    args = parser.parse_args()
+
+    paths = args.charts or chart_files(RESOURCES)
+    stale, unindexed = [], []
+    for path in paths:
+        chart = load_chart(path)
+        problems = check_note_index(chart)
+        name = path.resolve().relative_to(ROOT) if path.resolve().is_relative_to(ROOT) else path
+        if not problems:
+            buckets = len(chart["noteIndex"]["buckets"])
+            print(f"  ✓ {name}: {len(chart['notes'])} notes, {buckets} buckets")
+            continue
+        (unindexed if problems == ["no noteIndex"] else stale).append(path)
+        if args.fix:
+            write_chart(path, chart)
+            print(f"  ✎ {name}: indexed ({'; '.join(problems)})")
+        else:
+            print(f"  ✗ {name}: {'; '.join(problems)}")
+
+    current = len(paths) - len(stale) - len(unindexed)
+    if args.fix:
+        print(f"\n{current} up to date, {len(stale) + len(unindexed)} (re)indexed")
+    else:
+        print(f"\n{current} indexed, {len(stale)} stale, {len(unindexed)} unindexed")
+    failed = not args.fix and (stale or (args.strict and unindexed))
+    if failed:
+        print("❌ Run with --fix to rewrite the indices")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Watch audio and generator code, regenerating only the charts a change affects.
+
+The pipelines of `regenerate_charts.py` (registry songs) and
+`generate_holiday_charts.py` are split into stages (decode/features, tempo,
+band onsets, snapping, chart). Each stage result is kept in memory under a key
+built from its inputs: the audio file's mtime and size, the registry entry, the
+difficulty profile and its NPS target, the band settings and the code the stage
+runs (bytecode and constants of the generator functions, source of the helper
+modules). After a change only stages whose key differs rerun, so tweaking one
+Holiday profile rewrites one chart from in-memory onsets, and editing
+`hold_notes.py` reruns the note stage of each song but never decodes audio again.
+
+Holiday charts are built as `generate_holiday_charts.py` builds them by default
+(band-pass onsets, section-shaped density, NPS-calibrated profiles); pass
+`--hpss`, `--uniform-density` or `--hand-tuned` to watch with the same options
+that script takes.
+
+Watched files: the audio of every song in scope, the generator scripts, their
+helper modules (including `analysis_backend.py`) and `song_registry.py`. Changes are polled and debounced, so an
+editor's save burst triggers a single pass; generator modules are reloaded
+in-process. `audio_features.py` is not reloaded (restart after changing it).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import sys
+import time
+import traceback
+from dataclasses import astuple
+from pathlib import Path
+from types import CodeType, ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import analysis_backend
+import audio_features
+import chart_io
+import generate_holiday_charts
+import hold_notes
+import hpss
+import lane_assignment
+import nps_calibration
+import regenerate_charts
+import song_registry
+import song_sections
+import tempo_map
+
+# Reload order: a module comes after everything it imports.
+WATCHED_MODULES: Tuple[ModuleType, ...] = (
+    analysis_backend,
+    tempo_map,
+    hold_notes,
+    lane_assignment,
+    song_registry,
+    chart_io,
+    hpss,
+    nps_calibration,
+    song_sections,
+    regenerate_charts,
+    generate_holiday_charts,
+)
+HOLIDAY_ID = "green_day_holiday"
+POLL_INTERVAL = 0.1
+DEBOUNCE_SECONDS = 0.25
+
+Fingerprint = Optional[Tuple[int, int]]
+
+
+def fingerprint(path: Path) -> Fingerprint:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_key(module: ModuleType) -> str:
+    return hashlib.sha1(Path(module.__file__).read_bytes()).hexdigest()
+
+
+def _code_parts(code: CodeType) -> Iterator[bytes]:
+    yield code.co_code
+    yield repr(code.co_names).encode()
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from _code_parts(const)
+        else:
+            yield repr(const).encode()
+
+
+def code_key(*functions: Callable) -> str:
+    """Hash of what the functions execute; moving them around in the file keeps the key."""
+    digest = hashlib.sha1()
+    for function in functions:
+        for part in _code_parts(function.__code__):
+            digest.update(part)
+    return digest.hexdigest()
+
+
+class Memo:
+    """Stage results keyed by their inputs; a stage reruns only when its key changes."""
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, Tuple[Any, Any]] = {}
+        self.ran: List[str] = []
+
+    def get(self, stage: str, key: Any, compute: Callable[[], Any]) -> Any:
+        # Keys hold plain values (tuples, not dataclass instances): reloading a
+        # module creates new classes whose instances never compare equal.
+        entry = self.entries.get(stage)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        value = compute()
+        self.entries[stage] = (key, value)
+        self.ran.append(stage)
+        return value
+
+
+class ChartWatcher:
+    def __init__(
+        self,
+        song_ids: Optional[List[str]] = None,
+        hpss: bool = False,
+        uniform_density: bool = False,
+        hand_tuned: bool = False,
+    ) -> None:
+        self.song_ids = song_ids
+        self.hpss = hpss
+        self.uniform_density = uniform_density
+        self.hand_tuned = hand_tuned
+        self.memo = Memo()
+        self.missing: Set[Path] = set()
+
+    def waiting(self, title: str, audio_path: Path) -> Optional[str]:
+        """Report missing audio once, not on every pass."""
+        if audio_path in self.missing:
+            return None
+        self.missing.add(audio_path)
+        return f"  … {title}: waiting for {audio_path.name}"
+
+    def songs(self) -> List[Any]:
+        songs = song_registry.SONGS
+        if self.song_ids:
+            songs = [s for s in songs if s.id in self.song_ids]
+        return songs
+
+    def holiday_enabled(self) -> bool:
+        return not self.song_ids or HOLIDAY_ID in self.song_ids
+
+    def holiday_audio(self) -> Path:
+        return generate_holiday_charts.RESOURCES / f"{generate_holiday_charts.AUDIO_NAME}.mp3"
+
+    def watched_paths(self) -> Set[Path]:
+        paths = {Path(module.__file__) for module in WATCHED_MODULES}
+        paths.update(song.audio_path for song in self.songs())
+        if self.holiday_enabled():
+            paths.add(self.holiday_audio())
+        return paths
+
+    def snapshot(self) -> Dict[Path, Fingerprint]:
+        return {path: fingerprint(path) for path in self.watched_paths()}
+
+    # -- registry songs (regenerate_charts.py) -------------------------------------
+
+    def update_song(self, song: Any) -> Optional[str]:
+        audio = fingerprint(song.audio_path)
+        if audio is None:
+            return self.waiting(song.title, song.audio_path)
+        self.missing.discard(song.audio_path)
+        rc = regenerate_charts
+        features_key = (str(song.audio_path), audio)
+        features = self.memo.get(f"{song.id}/features", features_key, lambda: audio_features.load_features(song))
+
+        tempo_key = (features_key, song.bpm, code_key(rc.extract_song_tempo), file_key(tempo_map), file_key(analysis_backend))
+        tempo = self.memo.get(f"{song.id}/tempo", tempo_key, lambda: rc.extract_song_tempo(song, features))
+
+        sections_key = (tempo_key, file_key(song_sections))
+        sections = self.memo.get(f"{song.id}/sections", sections_key, lambda: song_sections.segment(features, tempo.beat_times))
+
+        chart_key = (
+            tempo_key,
+            sections_key,
+            astuple(song),
+            code_key(rc.build_notes, rc.build_grid, rc.build_chart),
+            file_key(chart_io),
+            file_key(hold_notes),
+            file_key(lane_assignment),
+        )
+
+        def write() -> str:
+            notes = rc.build_notes(song, features, tempo)
+            if not notes:
+                raise RuntimeError(f"No notes detected for {song.title}")
+            chart_io.write_chart(song.chart_path, rc.build_chart(song, tempo, notes, sections), song.audio_name)
+            return f"  ✓ {song.chart_path.name}: {len(notes)} notes"
+
+        stage = f"{song.id}/chart"
+        before = len(self.memo.ran)
+        message = self.memo.get(stage, chart_key, write)
+        return message if len(self.memo.ran) > before else None
+
+    # -- Holiday (generate_holiday_charts.py) --------------------------------------
+
+    def update_holiday(self) -> List[str]:
+        gh = generate_holiday_charts
+        audio_path = self.holiday_audio()
+        audio = fingerprint(audio_path)
+        if audio is None:
+            return [self.waiting("Holiday", audio_path)]
+        self.missing.discard(audio_path)
+        audio_key = (str(audio_path), audio)
+        y, sr = self.memo.get("holiday/audio", audio_key, lambda: gh.decode(audio_path))
+
+        tempo_key = (audio_key, gh.START_BPM, code_key(gh.analyze_tempo), file_key(tempo_map), file_key(analysis_backend))
+        tempo, bpm = self.memo.get("holiday/tempo", tempo_key, lambda: gh.analyze_tempo(y, sr))
+        grid = self.memo.get("holiday/grid", tempo_key, lambda: tempo.grid(len(y) / sr))
+        sections_key = (tempo_key, code_key(gh.analyze_sections), file_key(song_sections))
+        sections = self.memo.get("holiday/sections", sections_key, lambda: gh.analyze_sections(tempo))
+
+        if self.hpss:
+            stems_key = (audio_key, file_key(hpss), file_key(analysis_backend))
+            stems = self.memo.get("holiday/stems", stems_key, lambda: hpss.load_stems(song_registry.find_song(HOLIDAY_ID)))
+
+        snapped: Dict[str, List[float]] = {}
+        snapped_keys: Dict[str, Any] = {}
+        needed = {band for profile in gh.PROFILES.values() for band in profile.bands}
+        for name in sorted(needed):
+            band = gh.BANDS[name]
+            if self.hpss:
+                onset_key = (stems_key, astuple(band), code_key(gh.stem_onset_times))
+                raw = self.memo.get(f"holiday/onsets/{name}", onset_key, lambda: gh.stem_onset_times(stems, band))
+            else:
+                onset_key = (audio_key, astuple(band), code_key(gh.onset_times, gh.bandpass))
+                raw = self.memo.get(f"holiday/onsets/{name}", onset_key, lambda: gh.onset_times(y, sr, band))
+            snapped_keys[name] = (onset_key, tempo_key, gh.SNAP_TOLERANCE, code_key(gh.quantize))
+            snapped[name] = self.memo.get(
+                f"holiday/snapped/{name}",
+                snapped_keys[name],
+                lambda: gh.quantize(raw, grid, tolerance=gh.SNAP_TOLERANCE),
+            )
+
+        chart_code = (
+            code_key(gh.build_notes, gh.build_chart, gh.add_notes, gh.sample_times, gh.dedupe_notes, gh.limit_simultaneous_notes),
+            code_key(gh.calibrate_profile, gh.Profile.scaled),
+            file_key(chart_io),
+            file_key(nps_calibration),
+        )
+        density_sections = None if self.uniform_density else sections
+        options = (self.uniform_density, self.hand_tuned)
+        messages = []
+        for difficulty, profile in gh.PROFILES.items():
+            target = astuple(nps_calibration.NPS_TARGETS[difficulty])
+            key = (astuple(profile), target, tuple(snapped_keys[b] for b in profile.bands), tempo_key, sections_key, chart_code, options)
+
+            def write(difficulty: str = difficulty, profile: Any = profile) -> str:
+                if not self.hand_tuned:
+                    profile, _ = gh.calibrate_profile(profile, snapped, nps_calibration.NPS_TARGETS[difficulty], density_sections)
+                notes = gh.build_notes(profile, snapped, density_sections)
+                path = gh.chart_path(difficulty)
+                chart_io.write_chart(path, gh.build_chart(notes, tempo, bpm, sections), gh.AUDIO_NAME)
+                return f"  ✓ {path.name}: {len(notes)} notes"
+
+            before = len(self.memo.ran)
+            message = self.memo.get(f"holiday/chart/{difficulty}", key, write)
+            if len(self.memo.ran) > before:
+                messages.append(message)
+        return messages
+
+    # -- passes ---------------------------------------------------------------------
+
+    def reload_modules(self) -> bool:
+        for module in WATCHED_MODULES:
+            try:
+                importlib.reload(module)
+            except Exception as exc:
+                print(f"❌ Reloading {module.__name__} failed: {exc}")
+                return False
+        return True
+
+    def run(self, changed: Set[Path]) -> None:
+        start = time.perf_counter()
+        module_files = {Path(module.__file__) for module in WATCHED_MODULES}
+        if changed & module_files and not self.reload_modules():
+            return
+
+        self.memo.ran = []
+        messages: List[str] = []
+        jobs: List[Tuple[str, Callable[[], Any]]] = [(s.title, lambda s=s: [self.update_song(s)]) for s in self.songs()]
+        if self.holiday_enabled():
+            jobs.append(("Holiday", self.update_holiday))
+        for title, job in jobs:
+            try:
+                messages.extend(m for m in job() if m)
+            except Exception:
+                print(f"❌ {title}:")
+                traceback.print_exc(file=sys.stdout)
+
+        for message in messages:
+            print(message)
+        stages = ", ".join(self.memo.ran) or "nothing"
+        print(f"⏱  {time.perf_counter() - start:.2f} s (reran: {stages})")
+
+
+def watch(watcher: ChartWatcher, interval: float = POLL_INTERVAL, debounce: float = DEBOUNCE_SECONDS) -> None:
+    # Snapshot before the first pass so edits saved during it still trigger a pass.
+    snapshot = watcher.snapshot()
+    print("🎼 Initial analysis...")
+    watcher.run(set())
+    pending: Set[Path] = set()
+    last_change = 0.0
+    print("👀 Watching for changes (Ctrl-C to stop)...")
+    while True:
+        time.sleep(interval)
+        current = watcher.snapshot()
+        changed = {p for p in current.keys() | snapshot.keys() if current.get(p) != snapshot.get(p)}
+        if changed:
+            pending |= changed
+            snapshot = current
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= debounce:
+            names = ", ".join(sorted(p.name for p in pending))
+            print(f"\n🔁 Changed: {names}")
+            # Edits saved while the pass runs show up against the old snapshot next poll.
+            watcher.run(pending)
+            pending = set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate charts whenever audio or generator code changes.")
+    parser.add_argument("--song", action="append", help=f"song id to watch (default: all registry songs and {HOLIDAY_ID})")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="quiet time in seconds before a pass")
+    parser.add_argument("--hpss", action="store_true", help="Holiday: take band onsets from the harmonic/percussive components")
+    parser.add_argument("--uniform-density", action="store_true", help="Holiday: same density rules in every section")
+    parser.add_argument("--hand-tuned", action="store_true", help="Holiday: use the profiles as written, without NPS calibration")
+    args = parser.parse_args()
+
+    watcher = ChartWatcher(args.song, hpss=args.hpss, uniform_density=args.uniform_density, hand_tuned=args.hand_tuned)
+    if args.once:
+        watcher.run(set())
+        return
+    try:
+        watch(watcher, debounce=args.debounce)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()